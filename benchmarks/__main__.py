@@ -0,0 +1,51 @@
+import argparse
+import json
+import sys
+
+import pandas as pd
+
+from benchmarks import synthetic
+from benchmarks.run import DATA_ROOT, STAGES, compare, run
+
+
+# ----------------------------
+# COMMAND LINE
+# ----------------------------
+# python -m benchmarks --scales 10k 1m --output results.json
+# python -m benchmarks --scales 10k --compare results.json
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time the dashboard's data stages on synthetic data.")
+    parser.add_argument("--scales", nargs="+", default=["10k", "1m"], choices=list(synthetic.SCALES))
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=list(STAGES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-root", default=DATA_ROOT, help="where generated datasets are kept between runs")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON results to compare medians against")
+    args = parser.parse_args(argv)
+
+    def log(result):
+        print(
+            f"{result['scale']:>5} {result['stage']:<12} {result['name']:<26} "
+            f"median {result['median'] * 1000:10.2f} ms",
+            file=sys.stderr,
+        )
+
+    results = run(args.scales, args.stages, args.repeat, args.data_root, args.seed, log)
+    print(pd.DataFrame(results["memory"]).to_string(index=False), file=sys.stderr)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(compare(baseline, results).to_string(index=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import gc
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly.express as px
+
+from benchmarks import synthetic
+from utils import ingest, storage
+from utils.anomaly import RollingSpikeDetector
+from utils.charts import cached_figure_json, downsample, lttb_indices
+from utils.data_loader import DATASETS, clear_cache, load_data, load_versioned
+from utils.interning import memory_report
+from utils.kpi_calculations import calculate_kpis
+from utils.query import INDEXED_COLUMNS, FilterIndex
+from utils.retention import DonorTable
+from utils.rollups import build_donation_rollups, filter_rollups
+from utils.search import SearchIndex
+from utils.sketches import SKETCHED, Sketches
+
+DATA_ROOT = os.path.join(os.path.dirname(__file__), ".data")
+
+
+# ----------------------------
+# TIMING
+# ----------------------------
+def timed(fn, repeat, setup=None):
+    # Wall time of `repeat` calls; `setup` runs untimed before each one
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def _result(stage, name, scale, rows, times):
+    return {
+        "stage": stage,
+        "name": name,
+        "scale": scale,
+        "rows": rows,
+        "repeat": len(times),
+        "min": min(times),
+        "median": statistics.median(times),
+        "max": max(times),
+        "times": times,
+    }
+
+
+def dataset_dir(scale, data_root=DATA_ROOT, seed=0):
+    # Generated once per scale and seed, then reused between runs
+    directory = os.path.join(data_root, f"{scale}-seed{seed}")
+    if not all(os.path.exists(os.path.join(directory, f)) for f in DATASETS.values()):
+        synthetic.generate(directory, synthetic.SCALES[scale], seed)
+    return directory
+
+
+# ----------------------------
+# STAGES
+# ----------------------------
+def bench_load(data_dir, frames, repeat):
+    snapshots = os.path.join(data_dir, storage.SNAPSHOT_DIR)
+
+    def cold():
+        clear_cache()
+        shutil.rmtree(snapshots, ignore_errors=True)
+
+    yield "csv_parse", timed(lambda: load_data(data_dir), repeat, setup=cold)
+
+    # Donations alone through the process pool, whatever the file size,
+    # including the per-chunk rollup aggregation the pool does alongside
+    path = os.path.join(data_dir, DATASETS["donations"])
+    stat = os.stat(path)
+    yield "csv_parse_parallel", timed(
+        lambda: ingest.read_csv_table("donations", path, (stat.st_mtime_ns, stat.st_size), min_bytes=0),
+        repeat,
+    )
+    yield "snapshot", timed(lambda: load_data(data_dir), repeat, setup=clear_cache)
+    yield "cached", timed(lambda: load_data(data_dir), repeat)
+
+
+def bench_kpi(data_dir, frames, repeat):
+    donations, projects, volunteers = frames
+    yield "calculate_kpis", timed(lambda: calculate_kpis(donations, projects, volunteers), repeat)
+
+
+def bench_aggregation(data_dir, frames, repeat):
+    donations = frames[0]
+
+    # What pages/Donations.py computed per rerun before the rollups
+    def page_groupbys():
+        donations.groupby("date")["donation_amount"].sum()
+        donations.groupby("region", observed=True)["donation_amount"].sum()
+        donations.groupby("project", observed=True)["donation_amount"].sum()
+        donations.groupby("donor_name", observed=True)["donation_amount"].sum().nlargest(10)
+        donations.groupby("donor_name", observed=True)["date"].agg(["min", "max"])
+
+    yield "page_groupbys", timed(page_groupbys, repeat)
+    yield "rollups_full", timed(lambda: build_donation_rollups(donations), repeat)
+
+    rollups = build_donation_rollups(donations)
+    daily = rollups["daily"]
+    yield "spike_detection", timed(lambda: RollingSpikeDetector().update(daily), repeat)
+
+    # A cross-filter rerun: the middle half of the dates in two regions, from
+    # the cube, against masking and re-aggregating the rows it replaces
+    dates, regions = rollups["cube"].dates, list(rollups["cube"].regions[:2])
+    start, end = dates[len(dates) // 4], dates[len(dates) * 3 // 4]
+
+    def row_filter():
+        mask = donations["date"].between(start, end) & donations["region"].isin(regions)
+        build_donation_rollups(donations[mask])
+
+    yield "filter_rows", timed(row_filter, repeat)
+    yield "filter_cube", timed(lambda: filter_rollups(rollups, start, end, regions), repeat)
+
+    # Unique and top donors of the same slice: exact over the rows, against
+    # merging the per-bucket sketches
+    def row_donors():
+        mask = donations["date"].between(start, end) & donations["region"].isin(regions)
+        rows = donations[mask]
+        rows["donor_name"].nunique()
+        rows.groupby("donor_name", observed=True)["donation_amount"].sum().nlargest(10)
+
+    sketches = Sketches(**SKETCHED["donations"]).extend(donations)
+    yield "donors_rows", timed(row_donors, repeat)
+    yield "donors_sketch", timed(
+        lambda: (sketches.distinct(start, end, regions), sketches.top(10, start, end, regions)), repeat
+    )
+    yield "sketch_build", timed(lambda: Sketches(**SKETCHED["donations"]).extend(donations), repeat)
+
+    def donor_rows(rows):
+        return rows["donor_name"], rows["date"], rows["donation_amount"]
+
+    yield "donor_table_full", timed(lambda: DonorTable().extend(*donor_rows(donations)).cohorts(), repeat)
+    # Folding in the last 1% of rows, as after an append
+    split = len(donations) * 99 // 100
+    head = DonorTable().extend(*donor_rows(donations.iloc[:split]))
+    yield "donor_table_append", timed(lambda: head.extend(*donor_rows(donations.iloc[split:])).cohorts(), repeat)
+
+
+def query(index, filters, search=None, sort=None):
+    # What utils/tables does per rerun: match, count, and the first page
+    rows = index.positions(filters, search)
+    return index.page(rows, sort, 0, 50), index.count(rows)
+
+
+def bench_filter(data_dir, frames, repeat):
+    _, projects, volunteers = frames
+    for name, df in (("projects", projects), ("volunteers", volunteers)):
+        columns = INDEXED_COLUMNS[name]
+        yield f"{name}_index_build", timed(lambda: FilterIndex(df, columns), repeat)
+
+        index = FilterIndex(df, columns)
+        region = df["region"].cat.categories[0]
+        other = df[columns[1]].cat.categories[0]
+        filters = {"region": region, columns[1]: other}
+        yield f"{name}_filter", timed(lambda: query(index, filters), repeat)
+        yield f"{name}_filter_sorted", timed(lambda: query(index, filters, sort=(columns[0], False)), repeat)
+
+        index.search_index(columns[2])
+        search = (columns[2], "al")
+        yield f"{name}_search", timed(lambda: query(index, {}, search=search), repeat)
+
+    # Boolean masks over the raw frame, as the pages filtered before the index
+    def mask_filter():
+        mask = (projects["region"] == projects["region"].cat.categories[0]) & (
+            projects["status"] == projects["status"].cat.categories[0]
+        )
+        projects[mask].head(50)
+
+    yield "projects_mask_filter", timed(mask_filter, repeat)
+
+    donors = frames[0]["donor_name"]
+    yield "donor_search_build", timed(lambda: SearchIndex(donors), 1)
+    lookup = SearchIndex(donors)
+    yield "donor_search_query", timed(lambda: lookup.substring("mona al"), repeat)
+
+
+def bench_figure(data_dir, frames, repeat):
+    donations = frames[0]
+    daily = donations.groupby("date")["donation_amount"].sum().reset_index()
+    x = daily["date"].to_numpy().astype("datetime64[ns]").astype(np.int64)
+    y = daily["donation_amount"].to_numpy()
+
+    def build():
+        return px.line(downsample(daily, "date", "donation_amount"), x="date", y="donation_amount")
+
+    def build_full():
+        return px.line(daily, x="date", y="donation_amount")
+
+    yield "lttb", timed(lambda: lttb_indices(x, y, 500), repeat)
+    yield "trend_full_json", timed(lambda: build_full().to_json(), repeat)
+    yield "trend_downsampled_json", timed(lambda: build().to_json(), repeat)
+
+    version = load_versioned("donations", data_dir)[1]
+    cached_figure_json("bench_trend", version, build)
+    yield "trend_cached_json", timed(lambda: cached_figure_json("bench_trend", version, build), repeat)
+
+
+STAGES = {
+    "load": bench_load,
+    "kpi": bench_kpi,
+    "aggregation": bench_aggregation,
+    "filter": bench_filter,
+    "figure": bench_figure,
+}
+
+
+# ----------------------------
+# RUNNER
+# ----------------------------
+def _git_commit():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment():
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+    }
+
+
+def run(scales, stages=None, repeat=5, data_root=DATA_ROOT, seed=0, log=None):
+    stages = stages or list(STAGES)
+    results = []
+    memory = []
+    for scale in scales:
+        data_dir = dataset_dir(scale, data_root, seed)
+        rows = synthetic.SCALES[scale]
+
+        clear_cache()
+        frames = load_data(data_dir)
+        # Interned name columns vs. the same columns as object strings
+        report = memory_report(dict(zip(DATASETS, frames)))
+        memory.extend({"scale": scale, **record} for record in report.to_dict("records"))
+
+        for stage in stages:
+            for name, times in STAGES[stage](data_dir, frames, repeat):
+                result = _result(stage, name, scale, rows, times)
+                results.append(result)
+                if log is not None:
+                    log(result)
+
+    return {"environment": environment(), "results": results, "memory": memory}
+
+
+def compare(baseline, current):
+    # Median ratio current/baseline per (scale, stage, name) present in both
+    before = {(r["scale"], r["stage"], r["name"]): r["median"] for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        key = (r["scale"], r["stage"], r["name"])
+        if key in before:
+            rows.append({
+                "scale": r["scale"],
+                "stage": r["stage"],
+                "name": r["name"],
+                "baseline": before[key],
+                "current": r["median"],
+                "ratio": r["median"] / before[key] if before[key] else float("nan"),
+            })
+    return pd.DataFrame(rows)
@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# SYNTHETIC DATASETS
+# ----------------------------
+# Same columns as data/*.csv. Cardinalities follow the real files: a handful
+# of projects and regions, donors who mostly give a few times with a long tail
+# of frequent donors (Zipf), and volunteers drawn from the same pool of names.
+REGIONS = [
+    "Riyadh", "Jeddah", "Dammam", "Mecca", "Medina", "Tabuk", "Abha",
+    "Hail", "Jazan", "Najran", "Al Baha", "Al Jouf", "Qassim",
+]
+PROJECTS = [
+    "Clean Water", "Education", "Health", "Food Baskets", "Orphan Care",
+    "Shelter", "Winter Relief", "Mosque Maintenance", "Scholarships",
+    "Elderly Care", "Disaster Relief", "Ramadan Meals",
+]
+STATUSES = ["Ongoing", "Completed", "Planned"]
+FIRST_NAMES = [
+    "Mohammed", "Fatima", "Abdullah", "Sara", "Khalid", "Noura", "Omar",
+    "Laila", "Faisal", "Aisha", "Saleh", "Huda", "Turki", "Reem", "Yousef",
+    "Mona", "Sultan", "Hind", "Badr", "Lama", "Nasser", "Dana", "Majed", "Rana",
+]
+LAST_NAMES = [
+    "Alotaibi", "Alzahrani", "Alahmad", "Alassiri", "Alqahtani", "Almutairi",
+    "Alharbi", "Alshahri", "Alghamdi", "Aldosari", "Alshehri", "Almansour",
+    "Alothman", "Alabdullah", "Alshahrani", "Alsubaie",
+]
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+
+
+def _names(rng, count):
+    first = rng.choice(FIRST_NAMES, count)
+    last = rng.choice(LAST_NAMES, count)
+    # A numeric suffix keeps names distinct at large cardinalities
+    suffix = np.char.mod(" %d", np.arange(count))
+    return np.char.add(np.char.add(np.char.add(first, " "), last), suffix)
+
+
+def donations(rows, seed=0, days=3 * 365, start="2023-01-01"):
+    rng = np.random.default_rng(seed)
+    donors = _names(rng, max(rows // 8, 10))
+
+    # Zipf-distributed donor activity, capped to the pool
+    donor_ids = np.minimum(rng.zipf(1.3, rows) - 1, len(donors) - 1)
+    day = np.sort(rng.integers(0, days, rows))
+    dates = np.datetime64(start) + day.astype("timedelta64[D]")
+    amounts = np.round(rng.lognormal(5, 0.9, rows) / 5).astype(np.int64) * 5 + 5
+
+    return pd.DataFrame({
+        "date": np.datetime_as_string(dates, unit="D"),
+        "donor_name": donors[donor_ids],
+        "donation_amount": amounts,
+        "project": rng.choice(PROJECTS, rows, p=_weights(rng, len(PROJECTS))),
+        "region": rng.choice(REGIONS, rows, p=_weights(rng, len(REGIONS))),
+    })
+
+
+def projects(rows, seed=1):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        "project_name": rng.choice(PROJECTS, rows),
+        "beneficiaries": rng.integers(50, 2_000, rows) // 10 * 10,
+        "status": rng.choice(STATUSES, rows, p=[0.5, 0.4, 0.1]),
+        "region": rng.choice(REGIONS, rows),
+    })
+
+
+def volunteers(rows, seed=2):
+    rng = np.random.default_rng(seed)
+    people = _names(rng, max(rows // 2, 10))
+    return pd.DataFrame({
+        "volunteer_name": people[rng.integers(0, len(people), rows)],
+        "hours_contributed": rng.integers(1, 40, rows),
+        "project": rng.choice(PROJECTS, rows),
+        "region": rng.choice(REGIONS, rows),
+    })
+
+
+def _weights(rng, count):
+    weights = rng.dirichlet(np.full(count, 2.0))
+    return weights / weights.sum()
+
+
+def generate(directory, donation_rows, seed=0):
+    # Projects and volunteers scale with donations, at real-file proportions
+    os.makedirs(directory, exist_ok=True)
+    frames = {
+        "donations": donations(donation_rows, seed),
+        "projects": projects(max(donation_rows // 1_000, 50), seed + 1),
+        "volunteers": volunteers(max(donation_rows // 10, 50), seed + 2),
+    }
+    for name, frame in frames.items():
+        frame.to_csv(os.path.join(directory, f"{name}.csv"), index=False)
+    return {name: len(frame) for name, frame in frames.items()}
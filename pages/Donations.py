@@ -1,10 +1,19 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
 import datetime
-import os
 
+from utils.anomaly import METHODS, THRESHOLD, WINDOW, detect_spikes
+from utils.charts import downsample, lazy_section, render_chart
+from utils.kpi_calculations import get_kpis
+from utils.profiling import section, sidebar_panel, start_run
+from utils.refresher import ensure_refresher
+from utils.retention import get_donor_table
+from utils.rollups import filter_rollups, find_donors, get_donation_rollups
+from utils.sketches import get_sketches
+from utils.startup import lazy_import
+
+# Only needed to build a figure that is not cached yet
+px = lazy_import("plotly.express")
+go = lazy_import("plotly.graph_objects")
 
 
 # ----------------------------
@@ -12,18 +21,75 @@ import os
 # ----------------------------
 st.set_page_config(layout="wide")
 st.title("Donation Analytics Dashboard")
+start_run("Donations")
+
+# Data is reloaded and re-aggregated off the request path by a background
+# file watcher; reruns are served the last published version
+ensure_refresher()
 
 
-@st.cache_data(ttl=4)
-def load_data():
-    return pd.read_csv("data/donations.csv")
+# Load data: precomputed aggregates, rebuilt only when donations.csv changes
+with section("Load rollups") as load:
+    rollups = get_donation_rollups()
+    version = rollups["version"]
+    kpis = get_kpis("donations")
+    load.rows = version.rows
 
-df = load_data()
+# --------------------------------------------------------------
+#                     FILTERS
+# --------------------------------------------------------------
+# Date range, regions and projects cross-filter every date/region/project
+# chart below. Filtered tables come from the day x region x project cube in
+# the rollups, never from the donation rows.
+cube = rollups["cube"]
+first_day, last_day = (
+    (cube.dates[0].date(), cube.dates[-1].date()) if len(cube.dates) else (datetime.date.today(),) * 2
+)
 
+f1, f2, f3 = st.columns([1.2, 1, 1])
+
+with f1:
+    date_range = st.date_input(
+        "Date range", value=(first_day, last_day), min_value=first_day, max_value=last_day
+    )
+
+with f2:
+    regions = st.multiselect("Regions", list(cube.regions), placeholder="All regions")
+
+with f3:
+    projects = st.multiselect("Projects", list(cube.projects), placeholder="All projects")
+
+# Mid-selection the picker holds only a start date; cleared, it holds none
+if len(date_range) == 2:
+    start_day, end_day = date_range
+elif len(date_range) == 1:
+    start_day, end_day = date_range[0], last_day
+else:
+    start_day, end_day = first_day, last_day
+filtered = (start_day, end_day) != (first_day, last_day) or bool(regions) or bool(projects)
+
+with section("Filter rollups") as filtering:
+    if filtered:
+        view = filter_rollups(rollups, start_day, end_day, regions, projects)
+        # Figures are cached per filter as well as per data version
+        filter_state = (start_day, end_day, tuple(regions), tuple(projects))
+        filtering.rows = view["count"]
+    else:
+        view, filter_state = rollups, None
+
+# Approximate mode answers unique and top donors for the filtered slice by
+# merging per day x region x project sketches, with error bounds
+approximate = st.toggle(
+    "Approximate donor figures for the selection",
+    help="Unique donors (HyperLogLog) and top donors (Space-Saving) for the selected "
+         "dates, regions and projects, merged from per-bucket sketches.",
+)
 
-# Load data
-df = pd.read_csv("data/donations.csv")
-df["date"] = pd.to_datetime(df["date"])
+if approximate:
+    with section("Merge sketches"):
+        sketches = get_sketches("donations")
+        donor_slice = (start_day, end_day, regions, projects) if filtered else ()
+        unique_donors = sketches.distinct(*donor_slice)
 
 # --------------------------------------------------------------
 #                     KEY METRICS
@@ -80,48 +146,54 @@ st.markdown("""
 st.subheader("Key Insights for Donations")
 
 # WIDER COLUMNS
-c1, c2, c3, c4, c5 = st.columns([1.1, 1.1, 1.1, 1.1, 1.1])
-
-
-with c1:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">💰 Total Donations</div>
-        <div class="kpi-value">{df['donation_amount'].sum():,.0f} SAR</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c2:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">🧑‍🤝‍🧑 Unique Donors</div>
-        <div class="kpi-value">{df['donor_name'].nunique()}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c3:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">📦 Avg Donation</div>
-        <div class="kpi-value">{df['donation_amount'].mean():,.2f} SAR</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c4:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">📍 Top Region</div>
-        <div class="kpi-value">{df.groupby("region")["donation_amount"].sum().idxmax()}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c5:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">🎯 Top Project</div>
-        <div class="kpi-value">{df.groupby("project")["donation_amount"].sum().idxmax()}</div>
-    </div>
-    """, unsafe_allow_html=True)
+with section("KPI cards"):
+    c1, c2, c3, c4, c5 = st.columns([1.1, 1.1, 1.1, 1.1, 1.1])
+
+    with c1:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">💰 Total Donations</div>
+            <div class="kpi-value">{view["total"]:,.0f} SAR</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c2:
+        if approximate:
+            donors_title = "Unique Donors (approx.)"
+            donors_value = f"≈ {unique_donors.value:,.0f} ± {unique_donors.error:,.0f}"
+        else:
+            donors_title = f"Unique Donors{' (all dates)' if filtered else ''}"
+            donors_value = kpis.unique_donors
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">🧑‍🤝‍🧑 {donors_title}</div>
+            <div class="kpi-value">{donors_value}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c3:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">📦 Avg Donation</div>
+            <div class="kpi-value">{view["mean"]:,.2f} SAR</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c4:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">📍 Top Region</div>
+            <div class="kpi-value">{view["top_region"]}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c5:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">🎯 Top Project</div>
+            <div class="kpi-value">{view["top_project"]}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
 
 
@@ -130,13 +202,14 @@ with c5:
 # --------------------------------------------------------------
 st.subheader("📅 Daily Donation Trend")
 
-daily = df.groupby("date")["donation_amount"].sum().reset_index()
+daily = view["daily_df"]
 
-fig1 = px.line(
-    daily, x="date", y="donation_amount",
-    markers=True, title="Daily Donation Trend"
-)
-st.plotly_chart(fig1, use_container_width=True)
+with section("Daily Donation Trend", rows=len(daily)):
+    # Figures are cached per data version; long series are downsampled (LTTB)
+    render_chart("daily_trend", version, lambda: px.line(
+        downsample(daily, "date", "donation_amount"), x="date", y="donation_amount",
+        markers=True, title="Daily Donation Trend"
+    ), state=filter_state)
 
 st.markdown("---")
 
@@ -145,13 +218,42 @@ st.markdown("---")
 # --------------------------------------------------------------
 st.subheader("🔁 Donor Retention Rate")
 
-donor_counts = df.groupby("donor_name")["date"].nunique()
-repeat_donors = (donor_counts > 1).sum()
-retention_rate = repeat_donors / len(donor_counts) * 100
+with section("Donor Retention Rate"):
+    retention_rate = kpis.retention_rate
+
+    st.metric("Retention Rate (%)", f"{retention_rate:.1f}%")
+
+    st.caption("Percentage of donors who donated more than once.")
+
+if filtered and approximate:
+    st.caption("Retention, cohorts and donor lookup cover all donations.")
+elif filtered:
+    st.caption("Donor figures (retention, cohorts, top donors, lookup) cover all donations.")
+
+# Sections from here on open on demand: each one runs as a fragment behind a
+# toggle, so a closed section costs nothing and a widget inside one reruns
+# only that section. What they read is cached per data version (and filter).
+
+# Donors grouped by the month of their first donation; each cell is the share
+# of the cohort that gave again N months later. Read from the donor state
+# table, which is extended with appended donations instead of rescanned.
+def cohort_retention():
+    donors = get_donor_table()
+
+    with section("Cohort Retention", rows=donors.unique_donors):
+        curves = donors.retention_curves()
+
+        render_chart("cohort_retention", version, lambda: px.imshow(
+            curves,
+            aspect="auto",
+            text_auto=".0f",
+            color_continuous_scale="Greens",
+            labels=dict(x="Months since first donation", y="Cohort", color="% active"),
+            title="Cohort Retention (% of donors giving again)"
+        ))
 
-st.metric("Retention Rate (%)", f"{retention_rate:.1f}%")
 
-st.caption("Percentage of donors who donated more than once.")
+lazy_section("Cohort Retention", cohort_retention, "Show cohort retention")
 
 st.markdown("---")
 
@@ -160,15 +262,68 @@ st.markdown("---")
 # --------------------------------------------------------------
 st.subheader("🏆 Top 10 Donors")
 
-top_donors = df.groupby("donor_name")["donation_amount"].sum().nlargest(10).reset_index()
 
-fig2 = px.bar(
-    top_donors,
-    x="donor_name",
-    y="donation_amount",
-    title="Top 10 Donors",
-)
-st.plotly_chart(fig2, use_container_width=True)
+def top_donors_chart():
+    if approximate:
+        approximate_top_donors()
+        return
+    donors = get_donor_table()
+
+    with section("Top 10 Donors", rows=donors.unique_donors):
+        top_donors = donors.top_donors(10)
+
+        render_chart("top_donors", version, lambda: px.bar(
+            top_donors,
+            x="donor_name",
+            y="donation_amount",
+            title="Top 10 Donors",
+        ))
+
+
+def approximate_top_donors():
+    with section("Top 10 Donors (approx.)"):
+        top_donors = sketches.top(10, *donor_slice)
+
+        # Bars are lower bounds; the error bar reaches the most each could be
+        render_chart("top_donors_approx", version, lambda: px.bar(
+            top_donors.assign(below=0.0),
+            x="donor_name",
+            y="donation_amount",
+            error_y="error",
+            error_y_minus="below",
+            title="Top 10 Donors (approx.)",
+        ), state=(filter_state, sketches.top_k))
+
+        st.caption(
+            f"Each bar is at least the donor's total and at most the top of its error bar; "
+            f"donors not listed gave at most {sketches.unlisted_bound(*donor_slice):,.0f} SAR."
+        )
+
+
+lazy_section("Top 10 Donors", top_donors_chart)
+
+st.markdown("---")
+
+# --------------------------------------------------------------
+#                 DONOR LOOKUP
+# --------------------------------------------------------------
+st.subheader("🔎 Donor Lookup")
+
+
+def donor_lookup():
+    donor_keyword = st.text_input("Search Donor Name", "").strip()
+
+    with section("Donor Lookup") as lookup:
+        if donor_keyword:
+            # Name matches come from the prebuilt search index (or an indexed
+            # query on the SQLite backend), totals from the donor table
+            donor_matches = find_donors(donor_keyword, limit=50)
+            lookup.rows = len(donor_matches)
+            st.caption(f"{len(donor_matches)} matching donors (top 50 by amount)")
+            st.dataframe(donor_matches, use_container_width=True)
+
+
+lazy_section("Donor Lookup", donor_lookup, "Search donors")
 
 st.markdown("---")
 
@@ -178,19 +333,21 @@ st.markdown("---")
 # show the number of donations across months and regions
 st.subheader("🌡️ Donation Heatmap (Month × Region)")
 
-df["month"] = df["date"].dt.to_period("M").astype(str)
 
-heatmap = df.groupby(["month", "region"])["donation_amount"].sum().reset_index()
-pivot = heatmap.pivot(index="region", columns="month", values="donation_amount")
+def heatmap():
+    with section("Heatmap (Month × Region)"):
+        pivot = view["month_region_pivot"]
+
+        render_chart("month_region_heatmap", version, lambda: px.imshow(
+            pivot,
+            aspect="auto",
+            text_auto=True,
+            color_continuous_scale="Blues",
+            title="Donations by Month and Region"
+        ), state=filter_state)
 
-fig3 = px.imshow(
-    pivot,
-    aspect="auto",
-    text_auto=True,
-    color_continuous_scale="Blues",
-    title="Donations by Month and Region"
-)
-st.plotly_chart(fig3, use_container_width=True)
+
+lazy_section("Heatmap (Month × Region)", heatmap)
 
 st.markdown("---")
 
@@ -199,15 +356,20 @@ st.markdown("---")
 # --------------------------------------------------------------
 st.subheader("📈 Peak Donation Days")
 
-top_days = daily.nlargest(10, "donation_amount")
 
-fig4 = px.bar(
-    top_days,
-    x="date",
-    y="donation_amount",
-    title="Top Donation Days"
-)
-st.plotly_chart(fig4, use_container_width=True)
+def peak_days():
+    with section("Peak Donation Days"):
+        top_days = view["top_days_df"]
+
+        render_chart("peak_days", version, lambda: px.bar(
+            top_days,
+            x="date",
+            y="donation_amount",
+            title="Top Donation Days"
+        ), state=filter_state)
+
+
+lazy_section("Peak Donation Days", peak_days)
 
 st.markdown("---")
 
@@ -216,16 +378,21 @@ st.markdown("---")
 # --------------------------------------------------------------
 st.subheader("📆 Seasonal Trends (Monthly)")
 
-monthly = df.groupby(df["date"].dt.to_period("M").astype(str))["donation_amount"].sum().reset_index()
 
-fig5 = px.line(
-    monthly,
-    x="date",
-    y="donation_amount",
-    markers=True,
-    title="Monthly Donation Trend"
-)
-st.plotly_chart(fig5, use_container_width=True)
+def seasonal_trends():
+    with section("Seasonal Trends"):
+        monthly = view["monthly_df"]
+
+        render_chart("monthly_trend", version, lambda: px.line(
+            monthly,
+            x="date",
+            y="donation_amount",
+            markers=True,
+            title="Monthly Donation Trend"
+        ), state=filter_state)
+
+
+lazy_section("Seasonal Trends", seasonal_trends)
 
 st.markdown("---")
 
@@ -233,23 +400,29 @@ st.markdown("---")
 #             Donation DISTRIBUTION by region pie chart
 # --------------------------------------------------------------
 st.subheader("🌍 Donation Distribution by Region")
-region_dist = df.groupby("region")["donation_amount"].sum().reset_index()
-fig = px.pie(region_dist, values="donation_amount", names="region", title="Donation Distribution by Region")
-st.plotly_chart(fig, use_container_width=True)
+
+
+def region_distribution():
+    with section("Region Distribution"):
+        region_dist = view["region_df"]
+        render_chart("region_pie", version, lambda: px.pie(region_dist, values="donation_amount", names="region", title="Donation Distribution by Region"), state=filter_state)
+
+
+lazy_section("Region Distribution", region_distribution)
 
 # --------------------------------------------------------------
 #             Donation DISTRIBUTION by Project pie chart
 # --------------------------------------------------------------
 st.subheader("📁 Donation Distribution by Project")
-project_dist = df.groupby("project")["donation_amount"].sum().reset_index()
-fig = px.pie(project_dist, values="donation_amount", names="project", title="Donation Distribution by Project")
-st.plotly_chart(fig, use_container_width=True)
-
-
 
 
+def project_distribution():
+    with section("Project Distribution"):
+        project_dist = view["project_df"]
+        render_chart("project_pie", version, lambda: px.pie(project_dist, values="donation_amount", names="project", title="Donation Distribution by Project"), state=filter_state)
 
 
+lazy_section("Project Distribution", project_distribution)
 
 
 # --------------------------------------------------------------
@@ -257,47 +430,86 @@ st.plotly_chart(fig, use_container_width=True)
 # --------------------------------------------------------------
 st.subheader("⚠️ Anomaly Detection (Spikes)")
 
-mean_val = daily["donation_amount"].mean()
-std_val = daily["donation_amount"].std()
 
-# A spike = value > mean + 2*std
-daily["is_spike"] = daily["donation_amount"] > mean_val + 2 * std_val
+def spike_figure(spikes, spike_by):
+    fig6 = go.Figure()
+
+    # The lines are downsampled; every spike marker is kept
+    if spike_by is None:
+        lines = {"Donations": daily}
+    else:
+        wide = view[f"daily_by_{spike_by}"]
+        lines = {
+            group: wide[group].rename("donation_amount").rename_axis("date").reset_index()
+            for group in wide.columns
+        }
+
+    for name, series in lines.items():
+        line = downsample(series, "date", "donation_amount")
+        fig6.add_trace(
+            go.Scatter(
+                x=line["date"],
+                y=line["donation_amount"],
+                mode="lines+markers",
+                name=name,
+            )
+        )
+
+    fig6.add_trace(
+        go.Scatter(
+            x=spikes["date"],
+            y=spikes["donation_amount"],
+            mode="markers",
+            marker=dict(size=12, color="red"),
+            name="Spike",
+            text=spikes[spike_by] if spike_by else None,
+        )
+    )
 
-fig6 = go.Figure()
+    fig6.update_layout(title="Donation Spikes Detected")
+    return fig6
 
-fig6.add_trace(
-    go.Scatter(
-        x=daily["date"],
-        y=daily["donation_amount"],
-        mode="lines+markers",
-        name="Donations",
-    )
-)
 
-spikes = daily[daily["is_spike"]]
+def anomaly_detection():
+    a1, a2, a3, a4 = st.columns(4)
 
-fig6.add_trace(
-    go.Scatter(
-        x=spikes["date"],
-        y=spikes["donation_amount"],
-        mode="markers",
-        marker=dict(size=12, color="red"),
-        name="Spike",
-    )
-)
+    with a1:
+        spike_window = st.slider("Window (days)", 7, 90, WINDOW)
 
-fig6.update_layout(title="Donation Spikes Detected")
+    with a2:
+        spike_threshold = st.slider("Threshold (spreads)", 1.0, 4.0, THRESHOLD, step=0.5)
 
-st.plotly_chart(fig6, use_container_width=True)
+    with a3:
+        spike_method = st.selectbox(
+            "Baseline", list(METHODS),
+            format_func={"std": "Rolling mean / std", "mad": "Rolling median / MAD"}.get
+        )
+
+    with a4:
+        spike_by = st.selectbox("Breakdown", [None, "region", "project"], format_func=lambda v: (v or "overall").title())
+
+    # A spike = value > rolling baseline + threshold * spread over the previous
+    # `window` days. Detector state persists across reruns and only new days are scanned.
+    with section("Anomaly Detection", rows=len(daily)):
+        spikes = detect_spikes(view, spike_window, spike_threshold, spike_method, spike_by)
+    spike_state = (spike_window, spike_threshold, spike_method, spike_by, filter_state)
+
+    with section("Spike Chart"):
+        render_chart("spikes", version, lambda: spike_figure(spikes, spike_by), state=spike_state)
+
+        if len(spikes):
+            st.dataframe(spikes, use_container_width=True, hide_index=True)
+
+
+lazy_section("Anomaly Detection", anomaly_detection, "Detect spikes")
 
 
 # --------------------------------------------------------------
 #             LAST DASHBOARD UPDATE
 # --------------------------------------------------------------
-# Get the last modified time of the data file
-file_path = "data/donations.csv"
-last_modified_timestamp = os.path.getmtime(file_path)
-last_modified = datetime.datetime.fromtimestamp(last_modified_timestamp)
+# Modification time of the data version being served, which can trail the
+# file on disk while a refresh is in progress
+last_modified = datetime.datetime.fromtimestamp(version.mtime_ns / 1e9)
 
 # Format nicely
 formatted_time = last_modified.strftime('%b %d, %Y, %H:%M:%S')
@@ -315,7 +527,9 @@ st.markdown(
         z-index: 100;
     }}
     </style>
-    <div class="footer">🕒 Data last updated: {formatted_time}</div>
+    <div class="footer">🕒 Data last updated: {formatted_time} · version {version}</div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+sidebar_panel()
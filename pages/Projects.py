@@ -1,21 +1,39 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import datetime
-import os
+
+from utils.charts import render_chart
+from utils.data_loader import dataset_version
+from utils.impact import get_impact
+from utils.kpi_calculations import get_kpis
+from utils.profiling import section, sidebar_panel, start_run
+from utils.query import get_filter_index, label_counts, labels
+from utils.refresher import ensure_refresher
+from utils.startup import lazy_import
+from utils.tables import paginated_table
+
+# Only needed to build a figure that is not cached yet
+px = lazy_import("plotly.express")
 
 # ================
 #  PAGE CONFIG
 # ================
 st.set_page_config(layout="wide")
 st.title("Projects Dashboard")
+start_run("Projects")
+
+# Data is reloaded and re-aggregated off the request path by a background
+# file watcher; reruns are served the last published version
+ensure_refresher()
 
 # ======================
 # Load Data
 # ======================
 
 
-df = pd.read_csv("data/projects.csv")
+with section("Load data") as load:
+    version = dataset_version("projects")
+    kpis = get_kpis("projects")
+    load.rows = version.rows
 
 # ======================
 #  STYLING
@@ -45,31 +63,32 @@ st.markdown("""
 # ======================
 # KPIs
 # ======================
-c1, c2, c3 = st.columns(3)
-
-with c1:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Total Projects</div>
-        <div class="kpi-value">{len(df)}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c2:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Active Projects</div>
-        <div class="kpi-value">{(df['status'] == "Ongoing").sum()}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c3:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Total Beneficiaries</div>
-        <div class="kpi-value">{df['beneficiaries'].sum():,}</div>
-    </div>
-    """, unsafe_allow_html=True)
+with section("KPI cards"):
+    c1, c2, c3 = st.columns(3)
+
+    with c1:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">Total Projects</div>
+            <div class="kpi-value">{kpis.total_projects}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c2:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">Active Projects</div>
+            <div class="kpi-value">{kpis.active_projects}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c3:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">Total Beneficiaries</div>
+            <div class="kpi-value">{kpis.total_beneficiaries:,}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
 st.markdown("---")
 
@@ -83,42 +102,32 @@ col1, col2, col3 = st.columns(3)
 with col1:
     region_filter = st.selectbox(
         "Region",
-        ["All"] + sorted(df["region"].unique().tolist())
+        ["All"] + labels("projects", "region")
     )
 
 with col2:
     status_filter = st.selectbox(
         "Status",
-        ["All"] + sorted(df["status"].unique().tolist())
+        ["All"] + labels("projects", "status")
     )
 
 with col3:
     search_keyword = st.text_input("Search Project Name", "").strip().lower()
 
-# Apply filters
-filtered_df = df.copy()
-
-if region_filter != "All":
-    filtered_df = filtered_df[filtered_df["region"] == region_filter]
-
-if status_filter != "All":
-    filtered_df = filtered_df[filtered_df["status"] == status_filter]
-
-if search_keyword:
-    filtered_df = filtered_df[
-        filtered_df["project_name"].str.lower().str.contains(search_keyword)
-    ]
-
 # ======================
 # Display Table
 # ======================
 st.subheader("Project List")
 
-st.dataframe(
-    filtered_df,
-    use_container_width=True,
-    height=500
-)
+# Filters are answered from per-column inverted indexes and only the visible
+# page of rows is sent to the browser
+with section("Project List"):
+    paginated_table(
+        get_filter_index("projects"),
+        {"region": region_filter, "status": status_filter},
+        search=("project_name", search_keyword),
+        key="projects",
+    )
 
 st.markdown("---")
 
@@ -127,42 +136,106 @@ st.markdown("---")
 # ======================
 st.subheader("📍 Project Distribution by Region")
 
-region_count = df["region"].value_counts().reset_index()
-region_count.columns = ["region", "count"]
+# Counting runs only when the cached figure for this data version is missing
+def region_count_figure():
+    region_count = label_counts("projects", "region").reset_index()
+    region_count.columns = ["region", "count"]
+
+    return px.bar(
+        region_count,
+        x="region", y="count",
+        title="Projects Per Region",
+        text="count"
+    )
 
-fig = px.bar(
-    region_count,
-    x="region", y="count",
-    title="Projects Per Region",
-    text="count"
-)
 
-st.plotly_chart(fig, use_container_width=True)
+with section("Projects per Region"):
+    render_chart("projects_per_region", version, region_count_figure)
 
 # ======================
 # PROJECT STATUS DISTRIBUTION
 # ======================
 st.subheader("📊 Project Status Breakdown")
 
-status_count = df["status"].value_counts().reset_index()
-status_count.columns = ["status", "count"]
+def status_count_figure():
+    status_count = label_counts("projects", "status").reset_index()
+    status_count.columns = ["status", "count"]
+
+    return px.pie(
+        status_count,
+        names="status",
+        values="count",
+        title="Status Distribution"
+    )
 
-fig2 = px.pie(
-    status_count,
-    names="status",
-    values="count",
-    title="Status Distribution"
-)
 
-st.plotly_chart(fig2, use_container_width=True)
+with section("Status Breakdown"):
+    render_chart("project_status_pie", version, status_count_figure)
+
+# ======================
+# IMPACT
+# ======================
+st.subheader("🤝 Impact per Beneficiary")
+
+IMPACT_METRICS = {
+    "donations_per_beneficiary": "Donations per beneficiary (SAR)",
+    "hours_per_beneficiary": "Volunteer hours per beneficiary",
+    "sar_per_volunteer_hour": "SAR per volunteer-hour",
+}
+
+# Donations and volunteer hours are joined onto the projects once per data
+# version (utils/impact); the page only picks one of the small result tables
+with section("Impact") as impact_section:
+    impact = get_impact()
+    overall = impact["overall"]
+
+    i1, i2, i3 = st.columns(3)
+    for column, (metric, title) in zip((i1, i2, i3), IMPACT_METRICS.items()):
+        with column:
+            st.markdown(f"""
+            <div class="kpi-card">
+                <div class="kpi-title">{title}</div>
+                <div class="kpi-value">{overall[metric]:,.2f}</div>
+            </div>
+            """, unsafe_allow_html=True)
+
+    g1, g2 = st.columns(2)
+
+    with g1:
+        impact_by = st.radio(
+            "Group by", ["project", "region", "pair"], horizontal=True,
+            format_func={"project": "Project", "region": "Region", "pair": "Project × Region"}.get
+        )
+
+    with g2:
+        impact_metric = st.selectbox("Metric", list(IMPACT_METRICS), format_func=IMPACT_METRICS.get)
+
+    impact_table = impact[f"by_{impact_by}"]
+    impact_section.rows = len(impact_table)
+
+    render_chart("impact", impact["versions"], lambda: px.bar(
+        impact_table,
+        x="region" if impact_by == "region" else "project",
+        y=impact_metric,
+        color="region" if impact_by == "pair" else None,
+        barmode="group",
+        title=IMPACT_METRICS[impact_metric]
+    ), state=(impact_by, impact_metric))
+
+    st.dataframe(impact_table, use_container_width=True, hide_index=True)
+
+    if impact["unmatched_donations"] or impact["unmatched_hours"]:
+        st.caption(
+            f"Not attributed (no matching project and region in projects.csv): "
+            f"{impact['unmatched_donations']:,.0f} SAR, {impact['unmatched_hours']:,.0f} volunteer hours."
+        )
 
 # --------------------------------------------------------------
 #             LAST DASHBOARD UPDATE
 # --------------------------------------------------------------
-# Get the last modified time of the data file
-file_path = "data/projects.csv"
-last_modified_timestamp = os.path.getmtime(file_path)
-last_modified = datetime.datetime.fromtimestamp(last_modified_timestamp)
+# Modification time of the data version being served, which can trail the
+# file on disk while a refresh is in progress
+last_modified = datetime.datetime.fromtimestamp(version.mtime_ns / 1e9)
 
 # Format nicely
 formatted_time = last_modified.strftime('%b %d, %Y, %H:%M:%S')
@@ -180,7 +253,9 @@ st.markdown(
         z-index: 100;
     }}
     </style>
-    <div class="footer">🕒 Data last updated: {formatted_time}</div>
+    <div class="footer">🕒 Data last updated: {formatted_time} · version {version}</div>
     """,
     unsafe_allow_html=True
-)
\ No newline at end of file
+)
+
+sidebar_panel()
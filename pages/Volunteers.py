@@ -1,19 +1,37 @@
 import streamlit as st
-import pandas as pd
-import plotly.express as px
 import datetime
-import os
+
+from utils.charts import render_chart
+from utils.data_loader import dataset_version
+from utils.kpi_calculations import get_kpis
+from utils.profiling import section, sidebar_panel, start_run
+from utils.query import get_filter_index, label_totals, labels
+from utils.refresher import ensure_refresher
+from utils.sketches import get_sketches
+from utils.startup import lazy_import
+from utils.tables import paginated_table
+
+# Only needed to build a figure that is not cached yet
+px = lazy_import("plotly.express")
 
 # ======================
 # PAGE SETTINGS
 # ======================
 st.set_page_config(layout="wide")
 st.title(" Volunteers Dashboard")
+start_run("Volunteers")
+
+# Data is reloaded and re-aggregated off the request path by a background
+# file watcher; reruns are served the last published version
+ensure_refresher()
 
 # ======================
 # LOAD DATA
 # ======================
-df = pd.read_csv("data/volunteers.csv")
+with section("Load data") as load:
+    version = dataset_version("volunteers")
+    kpis = get_kpis("volunteers")
+    load.rows = version.rows
 # Columns needed:
 # volunteer_name, hours_contributed, project, region
 
@@ -46,31 +64,50 @@ st.markdown("""
 # ======================
 # KPI SECTION
 # ======================
-c1, c2, c3 = st.columns(3)
-
-with c1:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Total Volunteers</div>
-        <div class="kpi-value">{df['volunteer_name'].nunique()}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c2:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Total Volunteer Hours</div>
-        <div class="kpi-value">{df['hours_contributed'].sum():,}</div>
-    </div>
-    """, unsafe_allow_html=True)
-
-with c3:
-    st.markdown(f"""
-    <div class="kpi-card">
-        <div class="kpi-title">Avg Hours per Volunteer</div>
-        <div class="kpi-value">{df['hours_contributed'].mean():.1f}</div>
-    </div>
-    """, unsafe_allow_html=True)
+# Approximate mode counts volunteers and ranks the leaderboard for the
+# selected region and project by merging per region x project sketches
+approximate = st.toggle(
+    "Approximate volunteer figures",
+    help="Distinct volunteers (HyperLogLog) and top volunteers (Space-Saving), "
+         "merged from per-bucket sketches, with error bounds.",
+)
+
+if approximate:
+    with section("Merge sketches"):
+        sketches = get_sketches("volunteers")
+        total_volunteers = sketches.distinct()
+
+with section("KPI cards"):
+    c1, c2, c3 = st.columns(3)
+
+    with c1:
+        if approximate:
+            volunteers_title = "Total Volunteers (approx.)"
+            volunteers_value = f"≈ {total_volunteers.value:,.0f} ± {total_volunteers.error:,.0f}"
+        else:
+            volunteers_title, volunteers_value = "Total Volunteers", kpis.total_volunteers
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">{volunteers_title}</div>
+            <div class="kpi-value">{volunteers_value}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c2:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">Total Volunteer Hours</div>
+            <div class="kpi-value">{kpis.total_hours:,}</div>
+        </div>
+        """, unsafe_allow_html=True)
+
+    with c3:
+        st.markdown(f"""
+        <div class="kpi-card">
+            <div class="kpi-title">Avg Hours per Volunteer</div>
+            <div class="kpi-value">{kpis.avg_hours:.1f}</div>
+        </div>
+        """, unsafe_allow_html=True)
 
 st.markdown("---")
 
@@ -84,56 +121,46 @@ col1, col2, col3, col4 = st.columns(4)
 with col1:
     region_filter = st.selectbox(
         "Region",
-        ["All"] + sorted(df["region"].unique().tolist())
+        ["All"] + labels("volunteers", "region")
     )
 
 with col2:
     project_filter = st.selectbox(
         "Project",
-        ["All"] + sorted(df["project"].unique().tolist())
+        ["All"] + labels("volunteers", "project")
     )
 
 with col3:
     search_filter = st.text_input("Search Volunteer Name").strip().lower()
 
 # sort volunteers alphpabetically, working hrs descending, and working hrs ascending
+SORT_ORDERS = {
+    "Name (A-Z)": ("volunteer_name", True),
+    "Hours (High to Low)": ("hours_contributed", False),
+    "Hours (Low to High)": ("hours_contributed", True),
+}
+
 with col4:
     sort_option = st.selectbox(
         "Sort By",
-        ["Name (A-Z)", "Hours (High to Low)", "Hours (Low to High)"]
+        list(SORT_ORDERS)
     )
 
-if sort_option == "Name (A-Z)":
-    df = df.sort_values("volunteer_name", ascending=True)
-elif sort_option == "Hours (High to Low)":
-    df = df.sort_values("hours_contributed", ascending=False)
-elif sort_option == "Hours (Low to High)":
-    df = df.sort_values("hours_contributed", ascending=True)
-    
-# Apply filters
-filtered = df.copy()
-
-if region_filter != "All":
-    filtered = filtered[filtered["region"] == region_filter]
-
-if project_filter != "All":
-    filtered = filtered[filtered["project"] == project_filter]
-
-if search_filter:
-    filtered = filtered[
-        filtered["volunteer_name"].str.lower().str.contains(search_filter)
-    ]
-
 # ======================
 # VOLUNTEER TABLE
 # ======================
 st.subheader("Volunteer List")
 
-st.dataframe(
-    filtered,
-    use_container_width=True,
-    height=500
-)
+# Filter, then order only the matching rows by a precomputed sort order; only
+# the visible page of rows is sent to the browser
+with section("Volunteer List"):
+    paginated_table(
+        get_filter_index("volunteers"),
+        {"region": region_filter, "project": project_filter},
+        search=("volunteer_name", search_filter),
+        sort=SORT_ORDERS[sort_option],
+        key="volunteers",
+    )
 
 st.markdown("---")
 
@@ -142,22 +169,51 @@ st.markdown("---")
 # ======================
 st.subheader("🏆 Top Volunteers by Hours")
 
-leaderboard = (
-    df.groupby("volunteer_name")["hours_contributed"]
-      .sum()
-      .reset_index()
-      .sort_values("hours_contributed", ascending=False)
-)
+# Aggregation runs only when the cached figure for this data version is missing
+def leaderboard_figure():
+    leaderboard = (
+        label_totals("volunteers", "volunteer_name", "hours_contributed", top=10)
+          .rename_axis("volunteer_name")
+          .reset_index()
+    )
+
+    return px.bar(
+        leaderboard,
+        x="volunteer_name",
+        y="hours_contributed",
+        title="Top 10 Volunteers",
+        text="hours_contributed"
+    )
+
+
+# The approximate leaderboard follows the Region and Project filters above
+def approximate_leaderboard():
+    volunteer_slice = {
+        "regions": [region_filter] if region_filter != "All" else None,
+        "projects": [project_filter] if project_filter != "All" else None,
+    }
+    leaderboard = sketches.top(10, **volunteer_slice)
+
+    render_chart("top_volunteers_approx", version, lambda: px.bar(
+        leaderboard.assign(below=0.0),
+        x="volunteer_name",
+        y="hours_contributed",
+        error_y="error",
+        error_y_minus="below",
+        title="Top 10 Volunteers (approx.)",
+    ), state=(region_filter, project_filter, sketches.top_k))
+
+    st.caption(
+        f"Each bar is at least the volunteer's hours and at most the top of its error bar; "
+        f"volunteers not listed have at most {sketches.unlisted_bound(**volunteer_slice):,.0f} hours."
+    )
 
-fig = px.bar(
-    leaderboard.head(10),
-    x="volunteer_name",
-    y="hours_contributed",
-    title="Top 10 Volunteers",
-    text="hours_contributed"
-)
 
-st.plotly_chart(fig, use_container_width=True)
+with section("Leaderboard"):
+    if approximate:
+        approximate_leaderboard()
+    else:
+        render_chart("top_volunteers", version, leaderboard_figure)
 
 st.markdown("---")
 
@@ -166,28 +222,30 @@ st.markdown("---")
 # ======================
 st.subheader("⏳ Hours Contributed by Region")
 
-hours_region = (
-    df.groupby("region")["hours_contributed"]
-      .sum()
-      .reset_index()
-)
+def hours_region_figure():
+    hours_region = (
+        label_totals("volunteers", "region", "hours_contributed")
+          .rename_axis("region")
+          .reset_index()
+    )
+
+    return px.pie(
+        hours_region,
+        names="region",
+        values="hours_contributed",
+        title="Hours Distribution by Region"
+    )
 
-fig2 = px.pie(
-    hours_region,
-    names="region",
-    values="hours_contributed",
-    title="Hours Distribution by Region"
-)
 
-st.plotly_chart(fig2, use_container_width=True)
+with section("Hours by Region"):
+    render_chart("hours_by_region_pie", version, hours_region_figure)
 
 # --------------------------------------------------------------
 #             LAST DASHBOARD UPDATE
 # --------------------------------------------------------------
-# Get the last modified time of the data file
-file_path = "data/volunteers.csv"
-last_modified_timestamp = os.path.getmtime(file_path)
-last_modified = datetime.datetime.fromtimestamp(last_modified_timestamp)
+# Modification time of the data version being served, which can trail the
+# file on disk while a refresh is in progress
+last_modified = datetime.datetime.fromtimestamp(version.mtime_ns / 1e9)
 
 # Format nicely
 formatted_time = last_modified.strftime('%b %d, %Y, %H:%M:%S')
@@ -205,7 +263,9 @@ st.markdown(
         z-index: 100;
     }}
     </style>
-    <div class="footer">🕒 Data last updated: {formatted_time}</div>
+    <div class="footer">🕒 Data last updated: {formatted_time} · version {version}</div>
     """,
     unsafe_allow_html=True
 )
+
+sidebar_panel()
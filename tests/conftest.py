@@ -0,0 +1,53 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+from benchmarks import synthetic
+from utils import data_loader
+
+SOURCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data")
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    # A private copy of the sample CSVs, without any snapshots built from them
+    for filename in data_loader.DATASETS.values():
+        shutil.copy(os.path.join(SOURCE_DIR, filename), tmp_path / filename)
+    yield str(tmp_path)
+    data_loader.clear_cache()
+
+
+@pytest.fixture
+def synthetic_dir(tmp_path):
+    # Generated data with enough donors, days and buckets to exercise the
+    # aggregates (5,000 donations)
+    synthetic.generate(str(tmp_path), 5_000, seed=0)
+    yield str(tmp_path)
+    data_loader.clear_cache()
+
+
+def append(data_dir, text, name="donations"):
+    with open(os.path.join(data_dir, data_loader.DATASETS[name]), "a") as f:
+        f.write(text)
+
+
+def read_baseline(data_dir, name="donations"):
+    # What the pages computed from before any of the loaders existed
+    path = os.path.join(data_dir, data_loader.DATASETS[name])
+    return pd.read_csv(path, parse_dates=["date"] if name == "donations" else None)
+
+
+def filter_rows(df, start=None, end=None, regions=None, projects=None):
+    # Rows dated start..end (inclusive) in the given regions and projects
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    if regions:
+        mask &= df["region"].isin(regions)
+    if projects:
+        mask &= df["project"].isin(projects)
+    return df[mask]
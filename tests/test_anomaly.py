@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.anomaly import RollingSpikeDetector, detect_spikes
+from utils.rollups import get_donation_rollups
+
+from conftest import append
+
+
+def daily_series(days=200, seed=0):
+    rng = np.random.default_rng(seed)
+    values = rng.normal(1000, 100, days)
+    values[[40, 90, 91, 150]] *= 3
+    return pd.Series(values, index=pd.date_range("2024-01-01", periods=days), name="donation_amount")
+
+
+def expected_spikes(daily, window, threshold, method):
+    # The same baseline from a rolling window, applied to the day after it
+    rolling = daily.rolling(window, min_periods=max(window // 4, 3))
+    if method == "mad":
+        baseline = rolling.median()
+        spread = 1.4826 * rolling.apply(lambda v: np.median(np.abs(v - np.median(v))), raw=True)
+        spread = spread.where(spread != 0, rolling.std())
+    else:
+        baseline, spread = rolling.mean(), rolling.std()
+    baseline, spread = baseline.shift(1), spread.shift(1)
+    return list(daily.index[daily > baseline + threshold * spread])
+
+
+@pytest.mark.parametrize("method", ["std", "mad"])
+def test_spikes_match_a_rolling_window(method):
+    daily = daily_series()
+    spikes = RollingSpikeDetector(30, 2.0, method).update(daily)
+    assert list(spikes["date"]) == expected_spikes(daily, 30, 2.0, method)
+    assert pd.Timestamp("2024-02-10") in set(spikes["date"])
+
+
+def test_incremental_updates_match_one_pass():
+    daily = daily_series()
+    detector = RollingSpikeDetector()
+    detector.update(daily.iloc[:100])
+    # The last seen day grows, and later days arrive
+    grown = daily.copy()
+    grown.iloc[99] *= 4
+    spikes = detector.update(grown, changed_from=grown.index[99])
+    pd.testing.assert_frame_equal(spikes, RollingSpikeDetector().update(grown))
+
+    # A change before the last seen day starts over
+    earlier = grown.copy()
+    earlier.iloc[10] *= 5
+    spikes = detector.update(earlier, changed_from=earlier.index[10])
+    pd.testing.assert_frame_equal(spikes, RollingSpikeDetector().update(earlier))
+
+
+def test_unknown_method():
+    with pytest.raises(ValueError):
+        RollingSpikeDetector(method="iqr")
+
+
+@pytest.mark.parametrize("by", [None, "region"])
+def test_shared_detectors_follow_appended_rows(synthetic_dir, by):
+    def fresh(rollups):
+        if by is None:
+            return RollingSpikeDetector().update(rollups["daily"])
+        wide = rollups[f"daily_by_{by}"]
+        frames = [RollingSpikeDetector().update(wide[group]).assign(**{by: group}) for group in wide.columns]
+        frames = [frame[["date", by, "donation_amount", "baseline", "bound"]] for frame in frames]
+        return pd.concat(frames, ignore_index=True).sort_values("date", ignore_index=True)
+
+    rollups = get_donation_rollups(synthetic_dir)
+    pd.testing.assert_frame_equal(detect_spikes(rollups, by=by, data_dir=synthetic_dir), fresh(rollups))
+
+    append(synthetic_dir, "2025-12-30,New Donor,900000,Health,Riyadh\n")
+    rollups = get_donation_rollups(synthetic_dir)
+    spikes = detect_spikes(rollups, by=by, data_dir=synthetic_dir)
+    pd.testing.assert_frame_equal(spikes, fresh(rollups))
+    assert pd.Timestamp("2025-12-30") in set(spikes["date"])
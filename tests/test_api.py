@@ -0,0 +1,83 @@
+import json
+import socket
+import urllib.error
+import urllib.request
+
+import pytest
+
+from utils import api
+from utils.kpi_calculations import get_kpis
+
+from conftest import append, read_baseline
+
+NEW_ROW = "2025-12-30,New Donor,125,Health,Riyadh\n"
+
+
+@pytest.fixture
+def url(data_dir, monkeypatch):
+    # Files are checked on each request instead of by a refresher
+    monkeypatch.setenv("DASHBOARD_WATCH", "0")
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    assert api.start_api(port, data_dir)
+    return f"http://127.0.0.1:{port}/api/"
+
+
+def get(url, etag=None):
+    # (status, ETag, parsed body or None)
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.headers["ETag"], json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, error.headers["ETag"], None
+
+
+def test_polls_get_304_until_the_data_changes(data_dir, url):
+    status, etag, body = get(url + "kpis/donations")
+    assert status == 200
+    assert body["total_donations"] == pytest.approx(read_baseline(data_dir)["donation_amount"].sum())
+    assert get(url + "kpis/donations", etag)[:2] == (304, etag)
+    # Other queries and endpoints are tagged apart
+    assert get(url + "donations/top_donors?n=5", etag)[0] == 200
+
+    append(data_dir, NEW_ROW)
+    status, new_etag, body = get(url + "kpis/donations", etag)
+    assert status == 200
+    assert new_etag != etag
+    assert body["total_donations"] == pytest.approx(read_baseline(data_dir)["donation_amount"].sum())
+
+
+def test_the_tag_names_the_versions_the_body_was_built_from(data_dir, url, monkeypatch):
+    appended = []
+
+    def build(data_dir, args):
+        # A new version lands while the first build runs
+        if not appended:
+            appended.append(True)
+            append(data_dir, NEW_ROW)
+        return get_kpis("donations", data_dir)._asdict()
+
+    monkeypatch.setitem(api.ENDPOINTS, "test/appending", (("donations",), build))
+    status, etag, body = get(url + "test/appending")
+    assert status == 200
+    assert body["donation_count"] == len(read_baseline(data_dir))
+    assert get(url + "test/appending", etag)[0] == 304
+
+
+def test_bad_requests(url):
+    assert get(url + "nope")[0] == 404
+    assert get(url + "donations/top_donors?n=0")[0] == 400
+
+
+def test_binds_only_this_machine_by_default(data_dir, monkeypatch):
+    monkeypatch.setenv("DASHBOARD_WATCH", "0")
+    calls = []
+    monkeypatch.setattr(api, "_serve", lambda app, port, address, started, result: (calls.append(address), started.set()))
+    assert api.start_api(1, data_dir)
+    monkeypatch.setenv(api.API_HOST_ENV, "0.0.0.0")
+    assert api.start_api(2, data_dir)
+    assert calls == ["127.0.0.1", "0.0.0.0"]
+    for port in (1, 2):
+        api._servers.pop(port)
@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.charts import downsample, lttb_indices
+
+
+def reference_lttb(x, y, threshold):
+    # Steinarsson's Largest-Triangle-Three-Buckets, point by point
+    n = len(x)
+    every = (n - 2) / (threshold - 2)
+    selected, a = [0], 0
+    for i in range(threshold - 2):
+        avg_start, avg_end = math.floor((i + 1) * every) + 1, min(math.floor((i + 2) * every) + 1, n)
+        avg_x = sum(x[avg_start:avg_end]) / (avg_end - avg_start)
+        avg_y = sum(y[avg_start:avg_end]) / (avg_end - avg_start)
+        best, best_area = None, -1.0
+        for j in range(math.floor(i * every) + 1, math.floor((i + 1) * every) + 1):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best, best_area = j, area
+        selected.append(best)
+        a = best
+    return selected + [n - 1]
+
+
+@pytest.mark.parametrize("n, threshold", [(1000, 100), (1000, 3), (257, 50), (10, 9)])
+def test_lttb_matches_the_reference(n, threshold):
+    rng = np.random.default_rng(n)
+    x = np.sort(rng.uniform(0, 100, n))
+    y = rng.normal(0, 1, n).cumsum()
+    assert list(lttb_indices(x, y, threshold)) == reference_lttb(list(x), list(y), threshold)
+
+
+def test_lttb_keeps_peaks_and_short_series():
+    y = np.zeros(10_000)
+    y[4321] = 50
+    indices = lttb_indices(np.arange(10_000), y, 200)
+    assert len(indices) == 200
+    assert indices[0] == 0 and indices[-1] == 9_999
+    assert np.all(np.diff(indices) > 0)
+    assert 4321 in indices
+    assert list(lttb_indices(np.arange(5), np.arange(5), 10)) == list(range(5))
+
+
+def test_downsample_dates():
+    df = pd.DataFrame({
+        "date": pd.date_range("2020-01-01", periods=5_000),
+        "donation_amount": np.sin(np.arange(5_000) / 50),
+    })
+    assert downsample(df, "date", "donation_amount", max_points=5_000) is df
+    sampled = downsample(df, "date", "donation_amount", max_points=500)
+    assert len(sampled) == 500
+    assert sampled["date"].is_monotonic_increasing
+    assert sampled["donation_amount"].max() == pytest.approx(df["donation_amount"].max(), abs=1e-3)
@@ -0,0 +1,36 @@
+import pytest
+
+from utils.data_loader import load_dataset
+from utils.rollups import filter_rollups, get_donation_rollups
+
+from conftest import append, filter_rows, read_baseline
+from test_rollups import assert_tables_match
+
+FILTERS = [
+    {},
+    {"start": "2023-03-01", "end": "2023-09-30"},
+    {"regions": ["Riyadh", "Mecca"]},
+    {"start": "2024-01-15", "end": "2024-02-15", "projects": ["Education"]},
+    {"start": "2025-06-01", "end": "2025-05-01"},
+]
+
+
+@pytest.mark.parametrize("where", FILTERS)
+def test_cube_filters_match_pandas(synthetic_dir, where):
+    rollups = get_donation_rollups(synthetic_dir)
+    rows = filter_rows(read_baseline(synthetic_dir), **where)
+    assert_tables_match(filter_rollups(rollups, **where), rows)
+
+    amount, count = rollups["cube"].totals(**where)
+    assert amount == pytest.approx(rows["donation_amount"].sum())
+    assert count == len(rows)
+
+
+def test_cube_covers_appended_rows(synthetic_dir):
+    get_donation_rollups(synthetic_dir)
+    load_dataset("donations", synthetic_dir)
+    append(synthetic_dir, "2025-12-30,New Donor,125,Health,Riyadh\n2025-12-31,New Donor,75,Food,Tabuk\n")
+
+    rollups = get_donation_rollups(synthetic_dir)
+    where = {"start": "2025-12-01", "projects": ["Food", "Health"]}
+    assert_tables_match(filter_rollups(rollups, **where), filter_rows(read_baseline(synthetic_dir), **where))
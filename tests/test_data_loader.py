@@ -0,0 +1,59 @@
+import pandas as pd
+import pytest
+
+from utils import data_loader, sqlite_backend
+
+from conftest import append, read_baseline
+
+NEW_ROW = "2025-08-02,Late Donor,75,Health,Riyadh\n"
+
+
+def _sqlite_frame(data_dir):
+    version = sqlite_backend.sync("donations", data_dir)
+    columns = ["date", "donor_name", "donation_amount", "project", "region"]
+    return pd.concat(sqlite_backend.dataset_rows(data_dir, "donations", version, columns), ignore_index=True)
+
+
+def _pandas_frame(data_dir):
+    return data_loader.load_dataset("donations", data_dir)
+
+
+@pytest.fixture(params=["pandas", "sqlite"])
+def load(request):
+    return {"pandas": _pandas_frame, "sqlite": _sqlite_frame}[request.param]
+
+
+def _assert_matches_baseline(df, data_dir):
+    baseline = read_baseline(data_dir)
+    pd.testing.assert_frame_equal(
+        df.astype({column: object for column in ("donor_name", "project", "region")}).reset_index(drop=True),
+        baseline.astype({column: object for column in ("donor_name", "project", "region")}),
+        check_dtype=False,
+    )
+
+
+def test_appended_rows_match_a_full_read(data_dir, load):
+    load(data_dir)
+    append(data_dir, NEW_ROW)
+    _assert_matches_baseline(load(data_dir), data_dir)
+
+
+def test_partial_line_is_read_once_complete(data_dir, load):
+    rows = len(load(data_dir))
+
+    append(data_dir, NEW_ROW[:20])
+    assert len(load(data_dir)) == rows
+
+    append(data_dir, NEW_ROW[20:])
+    df = load(data_dir)
+    assert len(df) == rows + 1
+    _assert_matches_baseline(df, data_dir)
+
+
+def test_full_load_stops_at_last_newline(data_dir, load):
+    baseline = read_baseline(data_dir)
+    append(data_dir, NEW_ROW[:20])
+    assert len(load(data_dir)) == len(baseline)
+
+    append(data_dir, NEW_ROW[20:])
+    assert len(load(data_dir)) == len(baseline) + 1
@@ -0,0 +1,62 @@
+import pandas as pd
+import pytest
+
+from utils import data_loader, impact, retention, rollups
+
+from conftest import append, read_baseline
+
+
+@pytest.fixture(params=["pandas", "sqlite"])
+def backend(request, monkeypatch):
+    for module in (data_loader, impact, retention, rollups):
+        monkeypatch.setattr(module, "BACKEND", request.param)
+    yield request.param
+    for module in (impact, retention, rollups):
+        module._cache.clear()
+
+
+def pair_totals(df, project, value):
+    return df.groupby([project, "region"])[value].sum().rename_axis(["project", "region"])
+
+
+def expected_pairs(data_dir):
+    # The three CSVs merged on their (project, region) labels
+    projects = pair_totals(read_baseline(data_dir, "projects"), "project_name", "beneficiaries")
+    donations = pair_totals(read_baseline(data_dir), "project", "donation_amount")
+    hours = pair_totals(read_baseline(data_dir, "volunteers"), "project", "hours_contributed")
+    table = (
+        projects.rename("beneficiaries").to_frame()
+        .join(donations.rename("donations"))
+        .join(hours.rename("volunteer_hours"))
+        .fillna(0.0)
+    )
+    return table, donations.sum() - table["donations"].sum()
+
+
+def assert_matches(data_dir):
+    result = impact.get_impact(data_dir)
+    table, unmatched = expected_pairs(data_dir)
+    assert table["donations"].sum() > 0 and table["volunteer_hours"].sum() > 0
+    pairs = result["by_pair"].set_index(["project", "region"])[table.columns]
+    pd.testing.assert_frame_equal(pairs, table, check_dtype=False)
+
+    by_project = table.groupby(level="project").sum()
+    got = result["by_project"].set_index("project")
+    pd.testing.assert_series_equal(
+        got["donations_per_beneficiary"], by_project["donations"] / by_project["beneficiaries"], check_names=False
+    )
+    by_region = table.groupby(level="region").sum()
+    got = result["by_region"].set_index("region")
+    pd.testing.assert_frame_equal(got[table.columns], by_region, check_dtype=False)
+    assert result["unmatched_donations"] == pytest.approx(unmatched)
+
+
+def test_impact_matches_label_joins(synthetic_dir, backend):
+    assert_matches(synthetic_dir)
+
+
+def test_donations_without_a_project_row_are_unmatched(synthetic_dir, backend):
+    before = impact.get_impact(synthetic_dir)["unmatched_donations"]
+    append(synthetic_dir, "2025-12-30,New Donor,125,Nowhere Project,Riyadh\n")
+    assert impact.get_impact(synthetic_dir)["unmatched_donations"] == pytest.approx(before + 125)
+    assert_matches(synthetic_dir)
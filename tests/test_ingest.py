@@ -0,0 +1,66 @@
+import functools
+import os
+
+import pandas as pd
+import pytest
+
+from utils import data_loader, ingest, rollups, storage
+
+from conftest import append, read_baseline
+
+
+def source(data_dir, name="donations"):
+    path = os.path.join(data_dir, data_loader.DATASETS[name])
+    stat = os.stat(path)
+    return path, (stat.st_mtime_ns, stat.st_size)
+
+
+@pytest.mark.parametrize("chunks", [1, 3, 64])
+def test_chunks_cover_the_body_at_line_ends(synthetic_dir, chunks):
+    path, (_, size) = source(synthetic_dir)
+    ranges = ingest.split_lines(path, size, chunks)
+    with open(path, "rb") as f:
+        data = f.read()
+    assert ranges[0][0] == ingest.read_header(path)[1]
+    assert ranges[-1][1] == size
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start and data[end - 1:end] == b"\n"
+
+
+def test_parallel_parse_matches_a_serial_one(synthetic_dir):
+    path, key = source(synthetic_dir)
+    table = ingest.read_csv_table("donations", path, key, processes=2, min_bytes=0)
+    serial = storage.read_csv_table("donations", path, size=key[1])
+    assert table.schema == serial.schema
+    pd.testing.assert_frame_equal(table.to_pandas(), serial.to_pandas())
+
+    # The workers' rollup partials merge to the rollups of the whole file
+    assert ingest.take_chunk_aggregates(path, (key[0], key[1] + 1)) is None
+    chunks = ingest.take_chunk_aggregates(path, key)
+    assert len(chunks) >= 2
+    assert ingest.take_chunk_aggregates(path, key) is None
+    merged = functools.reduce(rollups.merge_rollups, chunks)
+    full = rollups._aggregate(serial.to_pandas())
+    assert merged["total"] == pytest.approx(full["total"])
+    assert merged["count"] == full["count"]
+    for part in ("daily", "by_region", "by_project", "cells"):
+        pd.testing.assert_frame_equal(
+            pd.DataFrame(merged[part]).sort_index(), pd.DataFrame(full[part]).sort_index(), check_dtype=False
+        )
+
+
+def test_loads_use_the_pool_above_the_threshold(synthetic_dir, monkeypatch):
+    monkeypatch.setattr(ingest, "PARALLEL_MIN_BYTES", 0)
+    monkeypatch.setenv(ingest.WORKERS_ENV, "2")
+    baseline = read_baseline(synthetic_dir)
+    result = rollups.get_donation_rollups(synthetic_dir)
+    assert result["total"] == pytest.approx(baseline["donation_amount"].sum())
+    pd.testing.assert_series_equal(
+        result["by_region"], baseline.groupby("region")["donation_amount"].sum(),
+        check_names=False, check_dtype=False, check_index_type=False,
+    )
+    # The chunk aggregates were used up by the build
+    assert ingest.take_chunk_aggregates(*source(synthetic_dir)) is None
+
+    append(synthetic_dir, "2025-12-30,New Donor,125,Health,Riyadh\n")
+    assert rollups.get_donation_rollups(synthetic_dir)["total"] == pytest.approx(baseline["donation_amount"].sum() + 125)
@@ -0,0 +1,35 @@
+import pytest
+
+from utils import sqlite_backend
+from utils.data_loader import load_data
+from utils.kpi_calculations import calculate_kpis, get_kpis
+
+from conftest import read_baseline
+
+
+def expected_kpis(donations, projects, volunteers):
+    return {
+        "total_donations": donations["donation_amount"].sum(),
+        "total_volunteers": volunteers["volunteer_name"].nunique(),
+        "total_hours": volunteers["hours_contributed"].sum(),
+        "total_beneficiaries": projects["beneficiaries"].sum(),
+    }
+
+
+def test_calculate_kpis_on_csv_and_coded_frames(data_dir):
+    frames = [read_baseline(data_dir, name) for name in ("donations", "projects", "volunteers")]
+    expected = expected_kpis(*frames)
+    assert calculate_kpis(*frames) == pytest.approx(expected)
+    assert calculate_kpis(*load_data(data_dir)) == pytest.approx(expected)
+
+
+def test_fractional_hours_are_kept(data_dir):
+    volunteers = read_baseline(data_dir, "volunteers")
+    volunteers["hours_contributed"] = volunteers["hours_contributed"] + 0.25
+    volunteers.to_csv(f"{data_dir}/volunteers.csv", index=False)
+    expected = volunteers["hours_contributed"].sum()
+    assert expected % 1
+    assert get_kpis("volunteers", data_dir).total_hours == pytest.approx(expected)
+    version = sqlite_backend.sync("volunteers", data_dir)
+    assert sqlite_backend.volunteer_kpis(data_dir, version)["total_hours"] == pytest.approx(expected)
+    assert calculate_kpis(*load_data(data_dir))["total_hours"] == pytest.approx(expected)
@@ -0,0 +1,78 @@
+import json
+import os
+
+import pytest
+
+from utils import data_loader, precompute, rollups
+from utils.data_loader import CACHES
+from utils.kpi_calculations import get_kpis
+
+from conftest import append
+
+
+@pytest.fixture
+def snapshot(data_dir, tmp_path_factory, monkeypatch):
+    out_dir = str(tmp_path_factory.mktemp("snapshots"))
+    manifest = precompute.precompute(data_dir, out_dir)
+    # A fresh server process: nothing loaded or built yet
+    expected = {name: get_kpis(name, data_dir) for name in data_loader.DATASETS}
+    for cache in CACHES.values():
+        cache.clear()
+    data_loader.clear_cache()
+    monkeypatch.setenv(precompute.SNAPSHOT_DIR_ENV, out_dir)
+    monkeypatch.setattr(precompute, "_manifests", {})
+    monkeypatch.setattr(precompute, "_serving", {})
+    yield out_dir, manifest, expected
+    data_loader.unpublish(data_dir)
+
+
+def rewrite_manifest(out_dir, **changes):
+    path = os.path.join(out_dir, precompute.MANIFEST)
+    with open(path) as f:
+        manifest = json.load(f)
+    manifest.update(changes)
+    with open(path, "w") as f:
+        json.dump(manifest, f)
+
+
+def test_fresh_snapshot_is_served_without_building(data_dir, snapshot, monkeypatch):
+    out_dir, manifest, expected = snapshot
+
+    def build(*args):
+        raise AssertionError("built from the data files")
+
+    monkeypatch.setattr(rollups, "_build", build)
+    assert precompute.serve_snapshot(data_dir)
+    served = data_loader.served_versions(data_dir)
+    assert {name: version.rows for name, version in served.items()} == {
+        name: record["rows"] for name, record in manifest["datasets"].items()
+    }
+    assert {name: get_kpis(name, data_dir) for name in data_loader.DATASETS} == expected
+    rollups.get_donation_rollups(data_dir)
+    assert data_loader.cache_stats()["misses"] == 0
+
+
+def test_changed_files_retire_the_snapshot(data_dir, snapshot):
+    assert precompute.serve_snapshot(data_dir)
+    append(data_dir, "2025-12-30,New Donor,125,Health,Riyadh\n")
+    assert not precompute.serve_snapshot(data_dir)
+    assert data_loader.served_versions(data_dir) == {}
+
+
+@pytest.mark.parametrize("changes", [{"format": precompute.FORMAT + 1}, {"code": "0" * 16}])
+def test_other_formats_and_code_versions_are_not_served(data_dir, snapshot, changes):
+    rewrite_manifest(snapshot[0], **changes)
+    assert not precompute.serve_snapshot(data_dir)
+    assert data_loader.served_versions(data_dir) == {}
+
+
+def test_pickles_others_can_write_are_not_loaded(data_dir, snapshot):
+    out_dir, manifest, _ = snapshot
+    path = os.path.join(out_dir, next(iter(manifest["caches"].values())))
+    os.chmod(path, 0o666)
+    assert not precompute.serve_snapshot(data_dir)
+    os.chmod(path, 0o644)
+    os.chmod(out_dir, 0o777)
+    assert not precompute.serve_snapshot(data_dir)
+    os.chmod(out_dir, 0o755)
+    assert precompute.serve_snapshot(data_dir)
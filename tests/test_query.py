@@ -0,0 +1,78 @@
+import pandas as pd
+import pytest
+
+from utils import query
+from utils.data_loader import load_dataset
+from utils.interning import intern_column
+from utils.profiling import frame_bytes
+
+from conftest import read_baseline
+
+
+def test_page_ships_only_the_categories_it_shows(data_dir):
+    # Names other datasets in the process have interned
+    intern_column(pd.Series([f"Volunteer {i}" for i in range(20_000)]), "volunteer")
+    index = query.get_filter_index("volunteers", data_dir)
+    rows = index.page(None, None, 0, 25)
+
+    df = load_dataset("volunteers", data_dir).iloc[:25]
+    plain = df.astype({column: object for column in query.INDEXED_COLUMNS["volunteers"]})
+    pd.testing.assert_frame_equal(rows.astype(object), plain.astype(object))
+    for column in query.INDEXED_COLUMNS["volunteers"]:
+        assert set(rows[column].cat.categories) == set(rows[column].dropna())
+    # About the size of the same rows as plain strings, not of the vocabulary
+    assert frame_bytes(rows) < 2 * frame_bytes(plain)
+    assert frame_bytes(df) > 10 * frame_bytes(plain)
+
+
+@pytest.mark.parametrize("filters, search", [
+    ({"region": "Riyadh"}, None),
+    ({"region": "Riyadh", "project": "Health"}, None),
+    ({"project": "Health"}, ("volunteer_name", "NOURA")),
+    ({}, ("volunteer_name", "al")),
+    ({"region": "All", "project": None}, None),
+    ({"region": "Nowhere"}, None),
+    ({"region": "Riyadh"}, ("volunteer_name", "zzz")),
+])
+def test_positions_match_pandas_masks(synthetic_dir, filters, search):
+    index = query.get_filter_index("volunteers", synthetic_dir)
+    df = read_baseline(synthetic_dir, "volunteers")
+    mask = pd.Series(True, index=df.index)
+    for column, label in filters.items():
+        if label not in (None, "All"):
+            mask &= df[column] == label
+    if search:
+        column, keyword = search
+        mask &= df[column].str.lower().str.contains(keyword.lower(), regex=False)
+
+    rows = index.positions(filters, search)
+    # None: nothing narrows the table
+    assert list(df.index if rows is None else rows) == list(df.index[mask])
+    assert index.count(rows) == mask.sum()
+
+
+def test_sorted_pages_match_pandas(synthetic_dir):
+    index = query.get_filter_index("volunteers", synthetic_dir)
+    df = read_baseline(synthetic_dir, "volunteers")
+    rows = index.positions({"region": "Riyadh"})
+    expected = df[df["region"] == "Riyadh"].sort_values("hours_contributed", ascending=False, kind="stable")
+    page = index.page(rows, ("hours_contributed", False), 10, 25)
+    assert list(page.index) == list(expected.index[10:35])
+    page = index.page(rows, ("volunteer_name", True), 0, 25)
+    expected = df[df["region"] == "Riyadh"].sort_values("volunteer_name", kind="stable")
+    assert list(page.index) == list(expected.index[:25])
+
+
+def test_label_summaries_match_pandas(synthetic_dir):
+    df = read_baseline(synthetic_dir, "projects")
+    assert query.labels("projects", "status", synthetic_dir) == sorted(df["status"].unique())
+    counts = query.label_counts("projects", "region", synthetic_dir)
+    expected = df["region"].value_counts().sort_index().sort_values(ascending=False, kind="stable")
+    pd.testing.assert_series_equal(counts, expected, check_names=False, check_index_type=False)
+
+    df = read_baseline(synthetic_dir, "volunteers")
+    hours = df.groupby("volunteer_name")["hours_contributed"].sum()
+    totals = query.label_totals("volunteers", "volunteer_name", "hours_contributed", top=5, data_dir=synthetic_dir)
+    pd.testing.assert_series_equal(
+        totals, hours.sort_values(ascending=False, kind="stable").head(5), check_names=False, check_dtype=False
+    )
@@ -0,0 +1,51 @@
+import time
+
+import pytest
+
+from utils import data_loader, sketches
+from utils.kpi_calculations import get_kpis
+from utils.refresher import Refresher
+
+from conftest import append, read_baseline
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def refresher(data_dir):
+    refresher = Refresher(data_dir, debounce=0.05).start()
+    assert refresher.ready.wait(30)
+    yield refresher
+    refresher.stop()
+
+
+def test_initial_snapshot_is_published_with_sketches(data_dir, refresher):
+    served = data_loader.served_versions(data_dir)
+    assert set(served) == set(data_loader.DATASETS)
+    assert served["donations"].rows == len(read_baseline(data_dir))
+    for name in sketches.SKETCHED:
+        assert sketches._cache.get((name, data_dir), served[name]) is not None
+
+
+def test_appended_rows_are_published_after_a_rebuild(data_dir, refresher):
+    before = data_loader.served_versions(data_dir)["donations"]
+    total = get_kpis("donations", data_dir).total_donations
+    append(data_dir, "2025-12-30,New Donor,125,Health,Riyadh\n")
+
+    wait_for(lambda: data_loader.served_versions(data_dir)["donations"].rows == before.rows + 1)
+    version = data_loader.served_versions(data_dir)["donations"]
+    assert get_kpis("donations", data_dir).total_donations == pytest.approx(total + 125)
+    assert sketches._cache.get(("donations", data_dir), version) is not None
+    assert refresher.last_error is None
+
+
+def test_stop_stops_serving(data_dir):
+    refresher = Refresher(data_dir, debounce=0.05).start()
+    assert refresher.ready.wait(30)
+    refresher.stop()
+    assert data_loader.served_versions(data_dir) == {}
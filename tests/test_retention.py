@@ -0,0 +1,74 @@
+import pandas as pd
+import pytest
+
+from utils import data_loader, retention
+
+from conftest import append, read_baseline
+
+# A new donor giving twice on one day and in a new month, a day that an
+# earlier donor already gave on, and a row without a date
+NEW_ROWS = (
+    "2025-12-30,New Donor,125,Health,Riyadh\n"
+    "2025-12-30,New Donor,75,Food,Tabuk\n"
+    "2026-01-02,New Donor,50,Food,Tabuk\n"
+    "{repeat},{donor},40,Food,Tabuk\n"
+    ",Undated Donor,20,Food,Tabuk\n"
+)
+
+
+@pytest.fixture(params=["pandas", "sqlite"])
+def backend(request, monkeypatch):
+    for module in (data_loader, retention):
+        monkeypatch.setattr(module, "BACKEND", request.param)
+    yield request.param
+    retention._cache.clear()
+
+
+def expected_frame(df):
+    by_donor = df.groupby("donor_name")
+    return pd.DataFrame({
+        "donation_amount": by_donor["donation_amount"].sum(),
+        "first_date": by_donor["date"].min(),
+        "last_date": by_donor["date"].max(),
+        "donation_days": by_donor["date"].nunique(),
+        "donation_count": by_donor.size(),
+    })
+
+
+def expected_cohorts(df):
+    dated = df.dropna(subset=["date"])
+    month = dated["date"].dt.to_period("M")
+    first = month.groupby(dated["donor_name"]).transform("min")
+    active = pd.DataFrame({
+        "donor": dated["donor_name"],
+        "cohort": first.astype(str),
+        "months_since_first": (month - first).apply(lambda offset: offset.n),
+    }).drop_duplicates()
+    return active.groupby(["cohort", "months_since_first"]).size().unstack(fill_value=0)
+
+
+def assert_matches(table, df):
+    frame = table.frame()[["donation_amount", "first_date", "last_date", "donation_days", "donation_count"]]
+    pd.testing.assert_frame_equal(
+        frame, expected_frame(df), check_dtype=False, check_names=False, check_index_type=False
+    )
+    assert table.unique_donors == df["donor_name"].nunique()
+    assert table.repeat_donors == int((df.groupby("donor_name")["date"].nunique() > 1).sum())
+    pd.testing.assert_frame_equal(
+        table.cohorts(), expected_cohorts(df), check_dtype=False, check_names=False, check_column_type=False
+    )
+
+
+def test_donor_table_matches_pandas(synthetic_dir, backend):
+    assert_matches(retention.get_donor_table(synthetic_dir), read_baseline(synthetic_dir))
+
+
+def test_appended_rows_extend_the_table(synthetic_dir, backend):
+    before = retention.get_donor_table(synthetic_dir)
+    first = read_baseline(synthetic_dir).iloc[0]
+    append(synthetic_dir, NEW_ROWS.format(repeat=first["date"].date(), donor=first["donor_name"]))
+    after = retention.get_donor_table(synthetic_dir)
+    assert after is not before
+    assert after.count.sum() == before.count.sum() + 5
+    assert len(after.labels) == len(before.labels) + 2
+    assert_matches(after, read_baseline(synthetic_dir))
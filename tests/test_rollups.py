@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from utils.data_loader import cache_stats, load_dataset
+from utils.rollups import get_donation_rollups
+
+from conftest import append, read_baseline
+
+
+def assert_tables_match(rollups, df):
+    # Rollup tables vs. the groupbys the page ran over the rows
+    amount = df["donation_amount"]
+    assert rollups["total"] == pytest.approx(amount.sum())
+    assert rollups["count"] == len(df)
+    for table, column in (("by_region", "region"), ("by_project", "project"), ("daily", "date")):
+        expected = amount.groupby(df[column]).sum()
+        pd.testing.assert_series_equal(
+            rollups[table], expected, check_names=False, check_dtype=False, check_index_type=False
+        )
+
+
+def test_rollups_match_pandas(synthetic_dir):
+    assert_tables_match(get_donation_rollups(synthetic_dir), read_baseline(synthetic_dir))
+
+
+def test_appended_rows_are_folded_in(synthetic_dir):
+    before = get_donation_rollups(synthetic_dir)
+    load_dataset("donations", synthetic_dir)
+    append(synthetic_dir, "2025-12-30,New Donor,125,Health,Riyadh\n2025-12-31,New Donor,75,Food,Tabuk\n")
+
+    after = get_donation_rollups(synthetic_dir)
+    assert cache_stats()["appends"] == 1
+    assert after["count"] == before["count"] + 2
+    assert_tables_match(after, read_baseline(synthetic_dir))
@@ -0,0 +1,34 @@
+import pandas as pd
+import pytest
+
+from utils.data_loader import load_dataset
+from utils.interning import intern_column
+from utils.search import SearchIndex, matching_labels
+
+NAMES = ["Mohammed Alotaibi", "Sara", "Al", "ab", "Élodie Ünal", "Fatima Alzahrani", None, "Sara"]
+
+
+def expected(names, keyword):
+    return sorted({name for name in names if name is not None and keyword.lower() in name.lower()})
+
+
+@pytest.mark.parametrize("keyword", ["", "a", "AL", "ab", "sar", "alotaibi", "ünal", "l u", "zz", "Mohammed Alotaibi"])
+def test_substring_matches_a_scan(keyword):
+    values = intern_column(pd.Series(NAMES), "volunteer")
+    index = SearchIndex(values)
+    labels = values.cat.categories[index.substring(keyword)]
+    assert sorted(labels) == expected(NAMES, keyword)
+
+
+def test_only_names_in_the_column_are_indexed():
+    # Another frame's names share the dictionary but are never returned
+    intern_column(pd.Series(["Salem Other Frame"]), "volunteer")
+    values = intern_column(pd.Series(["Sara Alassiri", "Omar"]), "volunteer")
+    labels = values.cat.categories[SearchIndex(values).substring("sa")]
+    assert list(labels) == ["Sara Alassiri"]
+
+
+def test_matching_labels_on_a_dataset(synthetic_dir):
+    names = load_dataset("volunteers", synthetic_dir)["volunteer_name"].astype(object).tolist()
+    for keyword in ("noura", "ad 1", "7"):
+        assert sorted(matching_labels("volunteers", "volunteer_name", keyword, synthetic_dir)) == expected(names, keyword)
@@ -0,0 +1,77 @@
+import os
+import subprocess
+import sys
+
+import pandas as pd
+import pytest
+
+from utils import data_loader, shared
+
+from conftest import append
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def shared_backend(data_dir, tmp_path_factory, monkeypatch):
+    monkeypatch.setenv(shared.SHARED_DIR_ENV, str(tmp_path_factory.mktemp("shm")))
+    monkeypatch.setattr(data_loader, "BACKEND", "shared")
+    monkeypatch.setattr(shared, "_manifests", {})
+    monkeypatch.setattr(shared, "_attached", {})
+    yield data_dir
+    data_loader.unpublish(data_dir)
+
+
+def publish_latest(data_dir):
+    # What the publisher's refresher does after loading the files
+    with data_loader.latest_view():
+        frames = {name: data_loader.load_versioned(name, data_dir) for name in data_loader.DATASETS}
+    data_loader.publish(data_dir)
+    data_loader.unpublish(data_dir)
+    return frames
+
+
+def arrow_files(data_dir):
+    return sorted(f for f in os.listdir(shared.shared_dir(data_dir)) if f.endswith(".arrow"))
+
+
+def test_workers_attach_the_published_versions(shared_backend):
+    data_dir = shared_backend
+    published = publish_latest(data_dir)
+    for name, (df, version) in published.items():
+        attached, attached_version = data_loader.load_versioned(name, data_dir)
+        assert attached_version == version
+        pd.testing.assert_frame_equal(attached.astype(object), df.astype(object))
+    assert data_loader.load_versioned("donations", data_dir)[0] is shared.attach("donations", data_dir)[0]
+
+    append(data_dir, "2025-12-30,New Donor,125,Health,Riyadh\n")
+    first = arrow_files(data_dir)
+    publish_latest(data_dir)
+    df, version = data_loader.load_versioned("donations", data_dir)
+    assert version.rows == published["donations"][1].rows + 1
+    assert df["donor_name"].iloc[-1] == "New Donor"
+    # Only the changed dataset is written; the previous version stays for
+    # workers that have not mapped it yet, older ones go
+    second = arrow_files(data_dir)
+    assert len(second) == len(first) + 1
+    append(data_dir, "2025-12-31,New Donor,75,Health,Riyadh\n")
+    publish_latest(data_dir)
+    third = arrow_files(data_dir)
+    assert len(third) == len(second)
+    assert set(first) - set(third) == {f for f in first if f.startswith("donations")}
+
+
+def test_one_publisher_per_data_dir(shared_backend):
+    data_dir = shared_backend
+    assert shared.claim_publisher(data_dir)
+    other = subprocess.run(
+        [sys.executable, "-c", f"from utils import shared; print(shared.claim_publisher({data_dir!r}))"],
+        cwd=ROOT, env=dict(os.environ), capture_output=True, text=True, check=True,
+    )
+    assert other.stdout.strip() == "False"
+
+
+def test_workers_without_a_publisher_fail_clearly(shared_backend):
+    with pytest.raises(FileNotFoundError, match="No shared datasets published"):
+        data_loader.load_versioned("donations", shared_backend)
+    assert not shared.wait_for_manifest(shared_backend, timeout=0)
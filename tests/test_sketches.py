@@ -0,0 +1,56 @@
+import pandas as pd
+import pytest
+
+from utils.data_loader import load_dataset
+from utils.sketches import SKETCHED, Sketches
+
+from conftest import filter_rows, read_baseline
+
+SLICES = [
+    {},
+    {"start": "2024-01-01", "end": "2024-06-30"},
+    {"regions": ["Riyadh", "Jeddah"], "projects": ["Education", "Health"]},
+]
+
+
+@pytest.fixture
+def donations(synthetic_dir):
+    return load_dataset("donations", synthetic_dir), read_baseline(synthetic_dir)
+
+
+@pytest.mark.parametrize("where", SLICES)
+def test_distinct_count_is_within_its_error(donations, where):
+    df, baseline = donations
+    sketches = Sketches(**SKETCHED["donations"]).extend(df)
+    estimate = sketches.distinct(**where)
+    exact = filter_rows(baseline, **where)["donor_name"].nunique()
+    assert abs(estimate.value - exact) <= estimate.error
+
+
+@pytest.mark.parametrize("where", [{}, {"regions": ["Riyadh", "Jeddah"], "projects": ["Education", "Health"]}])
+def test_item_totals_are_bounded(donations, where):
+    df, baseline = donations
+    # Few, large buckets with short summaries, so items get evicted
+    sketches = Sketches("donor_name", "donation_amount", ("region", "project"), top_k=4).extend(df)
+    assert sketches.unlisted_bound(**where) > 0
+    exact = filter_rows(baseline, **where).groupby("donor_name")["donation_amount"].sum()
+
+    # Space-Saving: each listed item's total is its lower bound plus at most
+    # its error; an item no summary lists has at most the unlisted bound
+    listed = sketches.top(len(sketches.items), **where).set_index("donor_name")
+    assert len(sketches.top(10, **where)) == 10
+    assert (listed["donation_amount"] <= exact[listed.index] + 1e-9).all()
+    assert (exact[listed.index] <= listed["donation_amount"] + listed["error"] + 1e-9).all()
+    assert (exact.drop(listed.index) <= sketches.unlisted_bound(**where) + 1e-9).all()
+
+
+def test_extending_in_batches_matches_one_build(donations):
+    df, _ = donations
+    whole = Sketches(**SKETCHED["donations"]).extend(df)
+    batched = Sketches(**SKETCHED["donations"])
+    for start in range(0, len(df), 1_500):
+        batched = batched.extend(df.iloc[start:start + 1_500])
+
+    for where in SLICES:
+        assert batched.distinct(**where) == whole.distinct(**where)
+    pd.testing.assert_frame_equal(batched.top(10), whole.top(10))
@@ -0,0 +1,108 @@
+import threading
+
+from utils.data_loader import CACHES, DataVersion, VersionCache
+
+
+def _version(rows):
+    return DataVersion(1, rows, 0, 0)
+
+
+def test_builds_once_per_key_and_version():
+    cache = VersionCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return len(builds)
+
+    assert cache.get_or_build("a", _version(1), build) == 1
+    assert cache.get_or_build("a", _version(1), build) == 1
+    assert cache.get_or_build("a", _version(2), build) == 2
+    assert cache.get_or_build("b", _version(2), build) == 3
+    assert len(builds) == 3
+
+
+def test_keeps_the_newest_versions_per_key():
+    cache = VersionCache(keep=2)
+    for rows in (1, 2, 3):
+        cache.put("a", _version(rows), rows)
+
+    assert cache.get("a", _version(1)) is None
+    assert cache.get("a", _version(2)) == 2
+    assert cache.latest("a") == (_version(3), 3)
+    assert cache.latest("missing") is None
+    assert cache.latest_entries() == [("a", _version(3), 3)]
+
+
+def test_named_caches_are_registered():
+    cache = VersionCache(name="tests.example")
+    try:
+        assert CACHES["tests.example"] is cache
+    finally:
+        del CACHES["tests.example"]
+
+
+def test_unrelated_keys_build_concurrently():
+    cache = VersionCache()
+    started = threading.Event()
+
+    def slow():
+        started.set()
+        # Finishes only once the other key's build has run meanwhile
+        assert built.wait(5)
+        return "a"
+
+    built = threading.Event()
+    thread = threading.Thread(target=lambda: cache.get_or_build("a", _version(1), slow))
+    thread.start()
+    assert started.wait(5)
+    assert cache.get_or_build("b", _version(1), lambda: "b") == "b"
+    built.set()
+    thread.join(5)
+    assert cache.get("a", _version(1)) == "a"
+
+
+def test_concurrent_callers_share_one_build():
+    cache = VersionCache()
+    builds = []
+    release = threading.Event()
+
+    def build():
+        builds.append(1)
+        release.wait(5)
+        return "value"
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(cache.get_or_build("a", _version(1), build)))
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join(5)
+    assert results == ["value"] * 4
+    assert len(builds) == 1
+
+
+def test_readers_see_consistent_entries_while_versions_are_put():
+    cache = VersionCache(keep=2)
+    stop = threading.Event()
+
+    def writer():
+        rows = 0
+        while not stop.is_set():
+            rows += 1
+            cache.put(f"k{rows % 50}", _version(rows), rows)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        for _ in range(2_000):
+            for key, version, value in cache.latest_entries():
+                assert version.rows == value
+            cache.latest("k1")
+    finally:
+        stop.set()
+        thread.join(5)
@@ -0,0 +1,151 @@
+import threading
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+from utils.data_loader import DATA_DIR
+
+WINDOW = 30
+THRESHOLD = 2.0
+METHODS = ("std", "mad")
+
+# Scales the median absolute deviation to a standard deviation for normal data
+_MAD_SCALE = 1.4826
+
+
+# ----------------------------
+# ROLLING SPIKE DETECTOR
+# ----------------------------
+# A day is a spike when it exceeds the baseline of the `window` days (with
+# donations) before it by `threshold` spreads: mean + k·std, or median + k·MAD
+# for a baseline that earlier spikes do not inflate. State is kept between
+# reruns, so an update only looks at days it has not seen yet (plus the last
+# one, whose total can still grow while rows for it are being appended).
+class RollingSpikeDetector:
+    def __init__(self, window=WINDOW, threshold=THRESHOLD, method="std", min_periods=None):
+        if method not in METHODS:
+            raise ValueError(f"method must be one of {METHODS}, got {method!r}")
+        self.window = window
+        self.threshold = threshold
+        self.method = method
+        self.min_periods = min_periods or max(window // 4, 3)
+        self.reset()
+
+    def reset(self):
+        # One extra slot so the last (still open) day can be taken back out
+        self._history = deque(maxlen=self.window + 1)
+        self._spikes = {}
+        self.last_date = None
+
+    def _bound(self):
+        values = np.fromiter(self._history, dtype=float)[-self.window:]
+        if len(values) < self.min_periods:
+            return np.nan, np.nan
+        if self.method == "mad":
+            baseline = np.median(values)
+            spread = _MAD_SCALE * np.median(np.abs(values - baseline))
+            if spread == 0:
+                # Over half the window is one value (typically 0 on a sparse
+                # per-group series): MAD is degenerate, use the std instead
+                spread = values.std(ddof=1)
+        else:
+            baseline = values.mean()
+            spread = values.std(ddof=1)
+        return baseline, baseline + self.threshold * spread
+
+    def update(self, daily, changed_from=None):
+        # `daily` is a date-indexed, date-sorted series of totals.
+        # `changed_from` is the earliest date whose total changed since the
+        # last update; a change before the last seen day forces a rebuild.
+        if self.last_date is not None and changed_from is not None and changed_from < self.last_date:
+            self.reset()
+
+        start = 0
+        if self.last_date is not None:
+            start = daily.index.searchsorted(self.last_date)
+            if start < len(daily) and daily.index[start] == self.last_date:
+                # Re-evaluate the last day with its (possibly grown) total
+                self._history.pop()
+                self._spikes.pop(self.last_date, None)
+
+        for date, value in daily.iloc[start:].items():
+            baseline, bound = self._bound()
+            if value > bound:
+                self._spikes[date] = (value, baseline, bound)
+            self._history.append(value)
+            self.last_date = date
+        return self.spikes()
+
+    def spikes(self):
+        rows = [(date, *values) for date, values in sorted(self._spikes.items())]
+        return pd.DataFrame(rows, columns=["date", "donation_amount", "baseline", "bound"])
+
+
+# ----------------------------
+# SHARED DETECTOR STATE
+# ----------------------------
+# One set of detectors per (data dir, settings, breakdown), kept for the life
+# of the process and fed only the days added since the previous rerun.
+_detectors = {}
+_lock = threading.Lock()
+
+# Distinct settings combinations kept; the least recently created go first
+MAX_DETECTOR_SETS = 32
+
+
+def _series_for(rollups, by):
+    if by is None:
+        return {None: rollups["daily"]}
+    wide = rollups[f"daily_by_{by}"]
+    return {group: wide[group] for group in wide.columns}
+
+
+def detect_spikes(rollups, window=WINDOW, threshold=THRESHOLD, method="std", by=None, data_dir=DATA_DIR):
+    if "version" not in rollups:
+        # A filtered view (utils.rollups.filter_rollups): short series with no
+        # history across reruns, scanned from scratch
+        detectors = {}
+        for group, daily in _series_for(rollups, by).items():
+            detectors[group] = RollingSpikeDetector(window, threshold, method)
+            detectors[group].update(daily)
+        return _collect(detectors, by)
+
+    version = rollups["version"]
+    key = (data_dir, window, threshold, method, by)
+
+    with _lock:
+        state = _detectors.get(key)
+        if state is None or state["generation"] != version.generation:
+            state = {"generation": version.generation, "version": None, "detectors": {}}
+            _detectors.pop(key, None)
+            _detectors[key] = state
+            while len(_detectors) > MAX_DETECTOR_SETS:
+                _detectors.pop(next(iter(_detectors)))
+
+        if state["version"] != version:
+            seen_rows = state["version"].rows if state["version"] else 0
+            changed = [date for rows, date in rollups["append_log"] if rows > seen_rows]
+            changed_from = min(changed) if changed else None
+            for group, daily in _series_for(rollups, by).items():
+                detector = state["detectors"].get(group)
+                if detector is None:
+                    detector = RollingSpikeDetector(window, threshold, method)
+                    state["detectors"][group] = detector
+                detector.update(daily, changed_from)
+            state["version"] = version
+
+        return _collect(state["detectors"], by)
+
+
+def _collect(detectors, by):
+    frames = []
+    for group, detector in detectors.items():
+        spikes = detector.spikes()
+        if by is not None:
+            spikes.insert(1, by, group)
+        frames.append(spikes)
+
+    if not frames:
+        return RollingSpikeDetector().spikes()
+    return pd.concat(frames, ignore_index=True).sort_values("date", ignore_index=True)
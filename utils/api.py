@@ -0,0 +1,231 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+import tornado.web
+
+from utils.data_loader import DATA_DIR, DATASETS, dataset_version
+from utils.impact import get_impact
+from utils.kpi_calculations import get_kpis
+from utils.query import label_counts, label_totals
+from utils.refresher import ensure_refresher
+from utils.retention import get_donor_table
+from utils.rollups import get_donation_rollups
+
+logger = logging.getLogger(__name__)
+
+# Port the JSON API listens on alongside the app (unset: no API)
+API_PORT_ENV = "DASHBOARD_API_PORT"
+
+# Interface it binds; only this machine unless set (0.0.0.0: every interface)
+API_HOST_ENV = "DASHBOARD_API_HOST"
+DEFAULT_HOST = "127.0.0.1"
+
+# Builds retried when a new version is published while one runs
+BUILD_ATTEMPTS = 3
+
+# Largest ?n= a top-N endpoint answers
+MAX_TOP = 1000
+
+
+# ----------------------------
+# ENDPOINTS
+# ----------------------------
+# Each endpoint names the datasets it is built from and reads the same
+# process-wide caches the pages do. A response's ETag is derived from those
+# datasets' versions (and the query), so a poll with a matching
+# If-None-Match gets a 304 without touching the caches. A body is tagged
+# with the versions read after its build, and built again if they moved
+# meanwhile, so a tag never names data other than what was sent.
+def _top(args):
+    n = args.get("n", "10")
+    if not n.isdigit() or not 0 < int(n) <= MAX_TOP:
+        raise tornado.web.HTTPError(400, f"n must be between 1 and {MAX_TOP}")
+    return int(n)
+
+
+def _donations(table):
+    return lambda data_dir, args: get_donation_rollups(data_dir)[table]
+
+
+def _kpis(name):
+    return lambda data_dir, args: get_kpis(name, data_dir)._asdict()
+
+
+def _project_summary(data_dir, args):
+    return {
+        "kpis": get_kpis("projects", data_dir)._asdict(),
+        "by_status": label_counts("projects", "status", data_dir).rename_axis("status").reset_index(name="count"),
+        "by_region": label_counts("projects", "region", data_dir).rename_axis("region").reset_index(name="count"),
+        "impact": get_impact(data_dir)["by_project"],
+    }
+
+
+def _volunteer_summary(data_dir, args):
+    hours = "hours_contributed"
+    return {
+        "kpis": get_kpis("volunteers", data_dir)._asdict(),
+        "hours_by_region": label_totals("volunteers", "region", hours, data_dir=data_dir).reset_index(),
+        "top_volunteers": label_totals("volunteers", "volunteer_name", hours, top=_top(args), data_dir=data_dir).reset_index(),
+    }
+
+
+ENDPOINTS = {
+    "kpis": (tuple(DATASETS), lambda data_dir, args: {name: get_kpis(name, data_dir)._asdict() for name in DATASETS}),
+    **{f"kpis/{name}": ((name,), _kpis(name)) for name in DATASETS},
+    "donations/daily": (("donations",), _donations("daily_df")),
+    "donations/monthly": (("donations",), _donations("monthly_df")),
+    "donations/by_region": (("donations",), _donations("region_df")),
+    "donations/by_project": (("donations",), _donations("project_df")),
+    "donations/top_days": (("donations",), _donations("top_days_df")),
+    "donations/top_donors": (("donations",), lambda data_dir, args: get_donor_table(data_dir).top_donors(_top(args))),
+    "projects/summary": (tuple(DATASETS), _project_summary),
+    "volunteers/summary": (("volunteers",), _volunteer_summary),
+}
+
+
+def _plain(value):
+    # Frames as lists of records; numpy scalars, timestamps and NaN as JSON
+    if isinstance(value, pd.DataFrame):
+        return [_plain(record) for record in value.to_dict("records")]
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, (pd.Timestamp, np.datetime64)):
+        return None if pd.isna(value) else pd.Timestamp(value).isoformat()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+# ----------------------------
+# HANDLER
+# ----------------------------
+class ApiHandler(tornado.web.RequestHandler):
+    def initialize(self, data_dir):
+        self.data_dir = data_dir
+
+    def compute_etag(self):
+        return self._etag
+
+    def _tag(self, path, args, datasets):
+        # The datasets' current versions, and the ETag they give the request
+        versions = [str(dataset_version(name, self.data_dir)) for name in datasets]
+        tag = hashlib.sha1(json.dumps([path, args, versions]).encode()).hexdigest()[:20]
+        return versions, f'"{tag}"'
+
+    def get(self, path):
+        endpoint = ENDPOINTS.get(path.strip("/"))
+        if endpoint is None:
+            raise tornado.web.HTTPError(404)
+        datasets, build = endpoint
+
+        args = {name: self.get_argument(name) for name in sorted(self.request.arguments)}
+        versions, self._etag = self._tag(path, args, datasets)
+        self.set_header("Cache-Control", "no-cache")
+        self.set_etag_header()
+        if self.check_etag_header():
+            self.set_status(304)
+            return
+
+        for _ in range(BUILD_ATTEMPTS):
+            body = build(self.data_dir, args)
+            built, self._etag = self._tag(path, args, datasets)
+            if built == versions:
+                break
+            versions = built
+        self.set_etag_header()
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps(_plain(body)))
+
+    def write_error(self, status_code, **kwargs):
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps({"error": self._reason}))
+
+
+def make_app(data_dir=DATA_DIR):
+    return tornado.web.Application(
+        [(r"/api/(.+)", ApiHandler, {"data_dir": data_dir})],
+        compress_response=True,
+    )
+
+
+# ----------------------------
+# SERVING
+# ----------------------------
+# The API runs on its own thread and event loop inside the app process, so a
+# build on a cache miss never stalls the Streamlit server, and both share
+# one set of caches. The launcher (utils/startup) starts it when
+# DASHBOARD_API_PORT is set, on this machine's loopback interface unless
+# DASHBOARD_API_HOST says otherwise; `python -m utils.api [port]` serves it
+# alone.
+_servers = {}
+_lock = threading.Lock()
+
+
+def _serve(app, port, address, started, result):
+    async def main():
+        try:
+            result["server"] = app.listen(port, address=address)
+        except OSError as exc:
+            result["error"] = exc
+            return
+        finally:
+            started.set()
+        await asyncio.Event().wait()
+
+    asyncio.run(main())
+
+
+def start_api(port, data_dir=DATA_DIR, address=None):
+    # Listening once per process and port; False if the port is taken (say,
+    # by another worker process that already serves it)
+    address = address or os.environ.get(API_HOST_ENV, DEFAULT_HOST)
+    # Keeps the served versions fresh, as it does for the pages; started
+    # here rather than on the event loop, whose requests it would block
+    ensure_refresher(data_dir)
+    with _lock:
+        if port in _servers:
+            return True
+        started, result = threading.Event(), {}
+        thread = threading.Thread(
+            target=_serve, args=(make_app(data_dir), port, address, started, result), name=f"api:{port}",
+            daemon=True,
+        )
+        thread.start()
+        started.wait()
+        if "error" in result:
+            logger.warning("JSON API not started on port %s: %s", port, result["error"])
+            return False
+        _servers[port] = thread
+        return True
+
+
+def ensure_api(data_dir=DATA_DIR):
+    port = os.environ.get(API_PORT_ENV)
+    return start_api(int(port), data_dir) if port else False
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    port = int(argv[0]) if argv else int(os.environ.get(API_PORT_ENV, 8502))
+    data_dir = argv[1] if len(argv) > 1 else DATA_DIR
+    if not start_api(port, data_dir):
+        raise SystemExit(f"Port {port} is not available")
+    host = os.environ.get(API_HOST_ENV, DEFAULT_HOST)
+    print(f"Serving {data_dir} as JSON on http://{host}:{port}/api/ ({', '.join(ENDPOINTS)})", flush=True)
+    threading.Event().wait()
+
+
+if __name__ == "__main__":
+    main()
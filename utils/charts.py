@@ -1,12 +1,120 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
 import streamlit as st
-import plotly.express as px
 
-def donations_over_time_chart(donations):
-    df = donations.groupby('date')['donation_amount'].sum().reset_index()
-    fig = px.line(df, x='date', y='donation_amount', title="Donations Over Time")
-    st.plotly_chart(fig, use_container_width=True)
+from utils import profiling
+from utils.startup import lazy_import
+
+# Imported when the first figure is rendered, not at page import
+go = lazy_import("plotly.graph_objects")
+
+# Longest series a time-series chart ships to the browser
+MAX_POINTS = int(os.environ.get("DASHBOARD_MAX_CHART_POINTS", 2000))
+
+# Serialized figures kept per process (least recently used are dropped)
+FIGURE_CACHE_SIZE = int(os.environ.get("DASHBOARD_FIGURE_CACHE_SIZE", 256))
+
+
+# ----------------------------
+# DOWNSAMPLING (LTTB)
+# ----------------------------
+# Largest-Triangle-Three-Buckets: keeps the first and last point and, from each
+# bucket in between, the point forming the largest triangle with the point
+# kept before it and the average of the next bucket. Peaks survive.
+def lttb_indices(x, y, threshold):
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = (np.arange(threshold - 1) * (n - 2) / (threshold - 2)).astype(int) + 1
+    edges[-1] = n - 1
+
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        area = np.abs(
+            (x[a] - avg_x) * (y[start:end] - y[a])
+            - (x[a] - x[start:end]) * (avg_y - y[a])
+        )
+        a = start + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def downsample(df, x, y, max_points=None):
+    max_points = MAX_POINTS if max_points is None else max_points
+    if len(df) <= max_points:
+        return df
+    xs = df[x].to_numpy()
+    if np.issubdtype(xs.dtype, np.datetime64):
+        xs = xs.astype("datetime64[ns]").astype(np.int64)
+    return df.iloc[lttb_indices(xs, df[y].to_numpy(), max_points)]
+
+
+# ----------------------------
+# FIGURE CACHE
+# ----------------------------
+# Figures are cached as serialized JSON per (chart, data version, filter
+# state), so a rerun with unchanged inputs skips the build entirely and every
+# session gets its own Figure object to render.
+_figures = OrderedDict()
+_figures_lock = threading.Lock()
+
+
+def cached_figure_json(chart, version, build, state=None):
+    key = (chart, str(version), state)
+    with _figures_lock:
+        payload = _figures.get(key)
+        if payload is not None:
+            _figures.move_to_end(key)
+            return payload
+
+    payload = build().to_json()
+    with _figures_lock:
+        _figures[key] = payload
+        while len(_figures) > FIGURE_CACHE_SIZE:
+            _figures.popitem(last=False)
+    return payload
+
+
+def render_chart(chart, version, build, state=None):
+    payload = cached_figure_json(chart, version, build, state)
+    profiling.add_payload(len(payload))
+    st.plotly_chart(go.Figure(json.loads(payload)), use_container_width=True)
+
+
+# ----------------------------
+# LAZY SECTIONS
+# ----------------------------
+# A section behind a toggle, run as a fragment: nothing in it is aggregated,
+# built or sent until it is opened, and its own widgets (the toggle included)
+# rerun only the section instead of the whole page. A full rerun still
+# renders every open section.
+def lazy_section(name, render, label="Show"):
+    @st.fragment
+    def fragment():
+        if not st.toggle(label, key=f"lazy:{name}"):
+            return
+        # Outside a page run this is a rerun of the section alone, profiled
+        # as a run of its own
+        alone = not profiling.active()
+        if alone:
+            profiling.start_run(name)
+        try:
+            render()
+        finally:
+            if alone:
+                profiling.finish_run()
 
-def top_donors_chart(donations, top_n=10):
-    df = donations.groupby('donor_name')['donation_amount'].sum().sort_values(ascending=False).head(top_n).reset_index()
-    fig = px.bar(df, x='donor_name', y='donation_amount', title=f"Top {top_n} Donors")
-    st.plotly_chart(fig, use_container_width=True)
+    fragment()
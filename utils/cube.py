@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+# ----------------------------
+# DAY x REGION x PROJECT CUBE
+# ----------------------------
+# Donation amounts and counts bucketed by day, region and project, held only
+# as running sums over the days that have donations. Any date range's
+# region/project totals are two lookups, so a filter never goes back to the
+# donation rows; the per-day cells a filter's series need are differences of
+# consecutive running sums over the (small) cube slice.
+class DonationCube:
+    def __init__(self, cells):
+        # cells: donation_amount and count indexed by (date, region, project)
+        index = cells.index
+        self.dates = pd.DatetimeIndex(_labels(index, 0), name="date")
+        self.regions = pd.Index(_labels(index, 1), dtype=object)
+        self.projects = pd.Index(_labels(index, 2), dtype=object)
+
+        shape = (len(self.dates), len(self.regions), len(self.projects))
+        slots = (
+            self.dates.get_indexer(index.get_level_values(0)),
+            self.regions.get_indexer(index.get_level_values(1)),
+            self.projects.get_indexer(index.get_level_values(2)),
+        )
+        # Row i holds the totals of days [0, i): cells are scattered into the
+        # rows after their day and summed in place, with no dense cell copy
+        amount = cells["donation_amount"].to_numpy()
+        self.amount_prefix = _prefix(shape, slots, amount, amount.dtype)
+        self.count_prefix = _prefix(shape, slots, cells["count"].to_numpy(), np.int64)
+
+    def _slice(self, start, end, regions, projects):
+        # Day bounds [lo, hi) for start..end inclusive, and the selected slots
+        lo = 0 if start is None else self.dates.searchsorted(pd.Timestamp(start), side="left")
+        hi = len(self.dates) if end is None else self.dates.searchsorted(pd.Timestamp(end), side="right")
+        r = np.arange(len(self.regions)) if not regions else np.flatnonzero(self.regions.isin(regions))
+        p = np.arange(len(self.projects)) if not projects else np.flatnonzero(self.projects.isin(projects))
+        return lo, max(hi, lo), r, p
+
+    def totals(self, start=None, end=None, regions=None, projects=None):
+        # (amount, count) for the range, from the running sums alone
+        lo, hi, r, p = self._slice(start, end, regions, projects)
+        amount = (self.amount_prefix[hi] - self.amount_prefix[lo])[np.ix_(r, p)].sum()
+        count = (self.count_prefix[hi] - self.count_prefix[lo])[np.ix_(r, p)].sum()
+        return amount, int(count)
+
+    def partials(self, start=None, end=None, regions=None, projects=None):
+        # The rollup partials of the donations inside the filter, shaped as
+        # if the filtered rows had been aggregated directly
+        lo, hi, r, p = self._slice(start, end, regions, projects)
+        amount = np.diff(self.amount_prefix[lo:hi + 1][:, r][:, :, p], axis=0)
+        count = np.diff(self.count_prefix[lo:hi + 1][:, r][:, :, p], axis=0)
+        dates, regions, projects = self.dates[lo:hi], self.regions[r], self.projects[p]
+
+        region_totals = (self.amount_prefix[hi] - self.amount_prefix[lo])[np.ix_(r, p)]
+        region_counts = (self.count_prefix[hi] - self.count_prefix[lo])[np.ix_(r, p)]
+
+        months = dates.to_period("M").astype(str)
+        month_starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(months) else np.array([], int)
+        by_day_region = amount.sum(axis=2)
+        by_day_region_count = count.sum(axis=2)
+
+        return {
+            "total": region_totals.sum(),
+            "count": int(region_counts.sum()),
+            "daily": _series(amount.sum(axis=(1, 2)), count.sum(axis=(1, 2)), dates),
+            "by_region": _series(region_totals.sum(axis=1), region_counts.sum(axis=1), regions.rename("region")),
+            "by_project": _series(region_totals.sum(axis=0), region_counts.sum(axis=0), projects.rename("project")),
+            "month_region": _grid(
+                np.add.reduceat(by_day_region, month_starts, axis=0).T if len(months) else by_day_region.T,
+                np.add.reduceat(by_day_region_count, month_starts, axis=0).T if len(months) else by_day_region_count.T,
+                regions.rename("region"), pd.Index(months[month_starts], name="month"),
+            ),
+            "daily_region": _grid(by_day_region, by_day_region_count, dates, regions.rename("region")),
+            "daily_project": _grid(amount.sum(axis=1), count.sum(axis=1), dates, projects.rename("project")),
+        }
+
+
+def _labels(index, level):
+    return index.get_level_values(level).unique().sort_values()
+
+
+def _prefix(shape, slots, values, dtype):
+    prefix = np.zeros((shape[0] + 1, *shape[1:]), dtype=dtype)
+    prefix[(slots[0] + 1, *slots[1:])] = values
+    np.cumsum(prefix, axis=0, out=prefix)
+    return prefix
+
+
+def _series(amount, count, index):
+    # Groups that have donations, as in a groupby over the rows
+    present = count > 0
+    return pd.Series(amount[present], index=index[present], name="donation_amount")
+
+
+def _grid(amount, count, rows, columns):
+    index = pd.MultiIndex.from_product([rows, columns])
+    return _series(amount.ravel(), count.ravel(), index)
@@ -1,7 +1,317 @@
+import itertools
+import os
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import NamedTuple
+
 import pandas as pd
 
-def load_data():
-    donations = pd.read_csv("data/donations.csv", parse_dates=['date'])
-    projects = pd.read_csv("data/projects.csv")
-    volunteers = pd.read_csv("data/volunteers.csv")
+from utils import interning, storage
+
+DATA_DIR = "data"
+
+DATASETS = {
+    "donations": "donations.csv",
+    "projects": "projects.csv",
+    "volunteers": "volunteers.csv",
+}
+
+# Files that only ever grow by appended rows: a change is first tried as an
+# append (parse just the new tail) before falling back to a full reload.
+APPEND_ONLY = {"donations"}
+
+# Where datasets live between requests: "pandas" keeps a DataFrame per dataset
+# in this process; "sqlite" keeps them in an indexed SQLite database and
+# pushes aggregations and filters down to it (utils/sqlite_backend);
+# "shared" has one process load and publish memory-mapped Arrow files that
+# every worker process attaches to (utils/shared).
+BACKEND = os.environ.get("DASHBOARD_BACKEND", "pandas")
+BACKENDS = ("pandas", "sqlite", "shared")
+if BACKEND not in BACKENDS:
+    raise ValueError(f"DASHBOARD_BACKEND must be one of {BACKENDS}, got {BACKEND!r}")
+
+# Bytes just before the consumed offset that must be unchanged for a grown
+# file to count as an append rather than a rewrite.
+_FINGERPRINT_BYTES = 4096
+
+
+class DataVersion(NamedTuple):
+    # generation changes on every full (re)load; within one generation the
+    # frame only ever grows, so rows [0, rows) of an older version are still
+    # the same rows in a newer one.
+    generation: int
+    rows: int
+    mtime_ns: int
+    size: int
+
+    def __str__(self):
+        return f"{self.generation}.{self.rows}.{self.mtime_ns}"
+
+
+class _Entry(NamedTuple):
+    key: tuple
+    df: pd.DataFrame
+    version: DataVersion
+    offset: int
+    fingerprint: bytes
+
+
+# ----------------------------
+# PROCESS-WIDE DATASET CACHE
+# ----------------------------
+# One parsed frame per source file, shared by every session in this process.
+# Entries are keyed on (mtime, size) so a file is parsed once per change.
+# The frames are shared: callers must treat them as read-only.
+_cache = {}
+_cache_lock = threading.Lock()
+_path_locks = {}
+_generations = itertools.count(1)
+_stats = {"hits": 0, "misses": 0, "appends": 0}
+
+# Data dirs kept fresh by a background refresher (utils/refresher): reruns
+# get the entries last published for the dir and never stat or parse files.
+# The refresher itself loads through latest_view().
+_served = {}
+_view = threading.local()
+
+
+def _file_key(path):
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _path_lock(path):
+    with _cache_lock:
+        return _path_locks.setdefault(path, threading.Lock())
+
+
+def _fingerprint(path, offset):
+    with open(path, "rb") as f:
+        f.seek(max(offset - _FINGERPRINT_BYTES, 0))
+        return f.read(min(offset, _FINGERPRINT_BYTES))
+
+
+def _full_load(name, path, key):
+    # Typed columnar snapshot; the CSV is only re-parsed when it changed
+    df = interning.intern_frame(name, storage.load_frame(name, path, key))
+    offset = storage.complete_size(path, key[1])
+    version = DataVersion(next(_generations), len(df), *key)
+    return _Entry(key, df, version, offset, _fingerprint(path, offset))
+
+
+def _append_load(name, path, key, entry):
+    if key[1] <= entry.offset or _fingerprint(path, entry.offset) != entry.fingerprint:
+        return None
+
+    with open(path, "rb") as f:
+        f.seek(entry.offset)
+        tail = f.read(key[1] - entry.offset)
+
+    # A writer may still be mid-line: only consume up to the last newline
+    end = tail.rfind(b"\n") + 1
+    if end == 0:
+        # Nothing new but the start of a line: keep the rows until it ends
+        return entry._replace(key=key)
+    tail = tail[:end]
+
+    new_rows = storage.read_csv_tail(name, tail, list(entry.df.columns))
+    new_rows = interning.intern_frame(name, new_rows)
+    df = storage.concat_frames(entry.df, new_rows)
+    offset = entry.offset + end
+    version = entry.version._replace(rows=len(df), mtime_ns=key[0], size=key[1])
+    return _Entry(key, df, version, offset, _fingerprint(path, offset))
+
+
+def load_versioned(name, data_dir=DATA_DIR):
+    served = _served.get(data_dir)
+    if served is not None and name in served and not getattr(_view, "latest", False):
+        entry = served[name]
+        _stats["hits"] += 1
+        return entry.df, entry.version
+    if BACKEND == "shared" and not getattr(_view, "latest", False):
+        from utils import shared
+        return shared.attach(name, data_dir)
+
+    path = os.path.join(data_dir, DATASETS[name])
+    key = _file_key(path)
+
+    entry = _cache.get(path)
+    if entry is not None and entry.key == key:
+        _stats["hits"] += 1
+        return entry.df, entry.version
+
+    # Only one session parses a given file; the others wait and reuse it.
+    with _path_lock(path):
+        key = _file_key(path)
+        entry = _cache.get(path)
+        if entry is not None and entry.key == key:
+            _stats["hits"] += 1
+            return entry.df, entry.version
+
+        new_entry = None
+        if entry is not None and name in APPEND_ONLY:
+            new_entry = _append_load(name, path, key, entry)
+        if new_entry is not None:
+            _stats["appends"] += 1
+        else:
+            _stats["misses"] += 1
+            new_entry = _full_load(name, path, key)
+
+        _cache[path] = new_entry
+        return new_entry.df, new_entry.version
+
+
+def dataset_version(name, data_dir=DATA_DIR):
+    # Current version of a dataset on the configured backend, without
+    # materialising a DataFrame when the backend is SQLite
+    served = _served.get(data_dir)
+    if served is not None and name in served and not getattr(_view, "latest", False):
+        return served[name].version
+    if BACKEND == "sqlite":
+        from utils import sqlite_backend
+        return sqlite_backend.sync(name, data_dir)
+    return load_versioned(name, data_dir)[1]
+
+
+def load_dataset(name, data_dir=DATA_DIR):
+    return load_versioned(name, data_dir)[0]
+
+
+def load_data(data_dir=DATA_DIR):
+    donations = load_dataset("donations", data_dir)
+    projects = load_dataset("projects", data_dir)
+    volunteers = load_dataset("volunteers", data_dir)
     return donations, projects, volunteers
+
+
+@contextmanager
+def latest_view():
+    # Loads on this thread check the files instead of reading what is served
+    _view.latest = True
+    try:
+        yield
+    finally:
+        _view.latest = False
+
+
+def publish(data_dir=DATA_DIR):
+    # Serve the latest loaded entries of every dataset in data_dir, all at once
+    if BACKEND == "sqlite":
+        from utils import sqlite_backend
+        entries = sqlite_backend.entries(data_dir)
+    else:
+        entries = {}
+        for name, filename in DATASETS.items():
+            entry = _cache.get(os.path.join(data_dir, filename))
+            if entry is not None:
+                entries[name] = entry
+        if BACKEND == "shared":
+            from utils import shared
+            shared.publish(data_dir, entries)
+    _served[data_dir] = entries
+    return {name: entry.version for name, entry in entries.items()}
+
+
+def serve_frames(data_dir, frames):
+    # Serve frames loaded from elsewhere ({name: (df, version)}), such as a
+    # precomputed snapshot (utils/precompute), in place of the data dir's files
+    _served[data_dir] = {
+        name: _Entry((version.mtime_ns, version.size), df, version, version.size, b"")
+        for name, (df, version) in frames.items()
+    }
+
+
+def unpublish(data_dir=DATA_DIR):
+    _served.pop(data_dir, None)
+
+
+def served_versions(data_dir=DATA_DIR):
+    return {name: entry.version for name, entry in _served.get(data_dir, {}).items()}
+
+
+def skip_generations(past):
+    # Later full loads are numbered above `past`, e.g. the generations another
+    # process already published (utils/shared)
+    global _generations
+    with _cache_lock:
+        _generations = itertools.count(max(next(_generations), past + 1))
+
+
+def cache_stats():
+    return {**_stats, "entries": len(_cache)}
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _served.clear()
+        for counter in _stats:
+            _stats[counter] = 0
+
+
+# ----------------------------
+# DERIVED-VALUE CACHE
+# ----------------------------
+# Values built from a dataset version (aggregates, indexes), keyed by
+# (key, version). The newest `keep` versions per key are kept, so the version
+# being served and the one a background refresh is preparing never evict
+# each other. Caches created with a name (their module's) are listed in
+# CACHES, and a precomputed snapshot saves and restores their entries.
+CACHES = {}
+
+
+class VersionCache:
+    def __init__(self, keep=2, name=None):
+        self.keep = keep
+        # Guards the entries only; builds run outside it, one at a time per
+        # (key, version), so unrelated keys build concurrently
+        self.lock = threading.Lock()
+        self._entries = {}
+        self._builds = {}
+        if name is not None:
+            CACHES[name] = self
+
+    def get(self, key, version):
+        with self.lock:
+            versions = self._entries.get(key)
+            return None if versions is None else versions.get(version)
+
+    def latest(self, key):
+        # (version, value) most recently stored for key, or None
+        with self.lock:
+            versions = self._entries.get(key)
+            return next(reversed(versions.items())) if versions else None
+
+    def latest_entries(self):
+        # (key, version, value) of the newest version of every key
+        with self.lock:
+            return [(key, *next(reversed(versions.items()))) for key, versions in self._entries.items() if versions]
+
+    def put(self, key, version, value):
+        with self.lock:
+            versions = self._entries.setdefault(key, OrderedDict())
+            versions[version] = value
+            versions.move_to_end(version)
+            while len(versions) > self.keep:
+                versions.popitem(last=False)
+
+    def get_or_build(self, key, version, build):
+        value = self.get(key, version)
+        if value is not None:
+            return value
+        # One build per (key, version); concurrent callers wait and reuse it
+        with self.lock:
+            build_lock = self._builds.setdefault((key, version), threading.Lock())
+        with build_lock:
+            value = self.get(key, version)
+            if value is None:
+                value = build()
+                self.put(key, version, value)
+        with self.lock:
+            self._builds.pop((key, version), None)
+        return value
+
+    def clear(self):
+        with self.lock:
+            self._entries.clear()
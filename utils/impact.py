@@ -0,0 +1,149 @@
+import numpy as np
+import pandas as pd
+
+from utils import sqlite_backend
+from utils.data_loader import BACKEND, DATA_DIR, VersionCache, dataset_version, load_versioned
+from utils.interning import vocabulary
+from utils.rollups import get_donation_rollups
+
+# Pair keys pack (project code, region code) into one int64
+_SHIFT = 32
+_LOW = (1 << _SHIFT) - 1
+
+
+# ----------------------------
+# PER-PROJECT SUMS
+# ----------------------------
+# Each dataset is reduced to one small sum per (project, region) before
+# anything is joined. Project and region codes mean the same thing in every
+# dataset (utils/interning), so a pair is one integer key: the reduction is a
+# single bincount over the rows, and the joins below compare integers.
+def _keys(projects, regions):
+    return (projects.astype(np.int64) << _SHIFT) | regions.astype(np.int64)
+
+
+def _keyed(sums, projects, regions, name):
+    return pd.Series(sums, index=pd.Index(_keys(projects, regions), name="pair"), name=name)
+
+
+def pair_sums(df, project, value):
+    projects, regions = df[project], df["region"]
+    p = projects.cat.codes.to_numpy().astype(np.int64)
+    r = regions.cat.codes.to_numpy().astype(np.int64)
+    values = df[value].to_numpy(dtype=float, na_value=0.0)
+    valid = (p >= 0) & (r >= 0)
+    width = len(regions.cat.categories)
+    pair = p[valid] * width + r[valid]
+
+    size = len(projects.cat.categories) * width
+    sums = np.bincount(pair, weights=values[valid], minlength=size)
+    seen = np.flatnonzero(np.bincount(pair, minlength=size))
+    return _keyed(sums[seen], seen // width, seen % width, value)
+
+
+def label_pair_sums(sums):
+    # A sum per (project, region) label pair, as the SQLite backend returns
+    # them, keyed by the pair's codes
+    projects = vocabulary("project").encode(sums.index.get_level_values(0))
+    regions = vocabulary("region").encode(sums.index.get_level_values(1))
+    return _keyed(sums.to_numpy(), projects, regions, sums.name)
+
+
+def donation_pair_sums(rollups):
+    # Read off the day x region x project cube: totals over all days
+    cube = rollups["cube"]
+    amount, count = cube.amount_prefix[-1], cube.count_prefix[-1]
+    r, p = np.nonzero(count)
+    projects = vocabulary("project").encode(cube.projects)
+    regions = vocabulary("region").encode(cube.regions)
+    return _keyed(amount[r, p].astype(float), projects[p], regions[r], "donation_amount")
+
+
+# ----------------------------
+# IMPACT TABLES
+# ----------------------------
+# Donations and volunteer hours joined onto projects.csv by (project,
+# region), then rolled up by project and by region. Ratios are taken of the
+# summed columns, so a group's figure weighs its projects by size. Donations
+# and hours for pairs with no project row cannot be attributed and are
+# reported apart.
+def _ratios(table):
+    beneficiaries = table["beneficiaries"].where(table["beneficiaries"] > 0)
+    hours = table["volunteer_hours"].where(table["volunteer_hours"] > 0)
+    return table.assign(
+        donations_per_beneficiary=table["donations"] / beneficiaries,
+        hours_per_beneficiary=table["volunteer_hours"] / beneficiaries,
+        sar_per_volunteer_hour=table["donations"] / hours,
+    )
+
+
+def _decoded(table, level):
+    # Pair keys (level None), or project or region codes, -> labels, sorted
+    keys = table.index.to_numpy()
+    projects = vocabulary("project").categories
+    regions = vocabulary("region").categories
+    if level is None:
+        index = pd.MultiIndex.from_arrays(
+            [projects[keys >> _SHIFT].astype(object), regions[keys & _LOW].astype(object)],
+            names=["project", "region"],
+        )
+    else:
+        labels = projects if level == "project" else regions
+        index = pd.Index(labels[keys].astype(object), name=level)
+    return table.set_axis(index).sort_index()
+
+
+def build_impact(beneficiaries, donations, hours):
+    # Each argument: a sum per (project, region) pair key
+    table = (
+        beneficiaries.rename("beneficiaries").to_frame()
+        .join(donations.rename("donations"))
+        .join(hours.rename("volunteer_hours"))
+        .fillna(0.0)
+    )
+    keys = table.index.to_numpy()
+    sums = table.sum()
+    return {
+        "by_pair": _ratios(_decoded(table, None)).reset_index(),
+        "by_project": _ratios(_decoded(table.groupby(keys >> _SHIFT).sum(), "project")).reset_index(),
+        "by_region": _ratios(_decoded(table.groupby(keys & _LOW).sum(), "region")).reset_index(),
+        "overall": _ratios(sums.to_frame().T).iloc[0],
+        "unmatched_donations": float(donations.sum() - sums["donations"]),
+        "unmatched_hours": float(hours.sum() - sums["volunteer_hours"]),
+    }
+
+
+_cache = VersionCache(name=__name__)
+
+
+def get_impact(data_dir=DATA_DIR):
+    # Built once per combination of dataset versions; donations come from the
+    # rollups, which are already kept current incrementally
+    rollups = get_donation_rollups(data_dir)
+    if BACKEND == "sqlite":
+        projects_version = dataset_version("projects", data_dir)
+        volunteers_version = dataset_version("volunteers", data_dir)
+
+        def build():
+            return build_impact(
+                label_pair_sums(
+                    sqlite_backend.pair_totals(data_dir, "projects", projects_version, "project_name", "beneficiaries")
+                ),
+                donation_pair_sums(rollups),
+                label_pair_sums(
+                    sqlite_backend.pair_totals(data_dir, "volunteers", volunteers_version, "project", "hours_contributed")
+                ),
+            )
+    else:
+        projects, projects_version = load_versioned("projects", data_dir)
+        volunteers, volunteers_version = load_versioned("volunteers", data_dir)
+
+        def build():
+            return build_impact(
+                pair_sums(projects, "project_name", "beneficiaries"),
+                donation_pair_sums(rollups),
+                pair_sums(volunteers, "project", "hours_contributed"),
+            )
+
+    versions = (rollups["version"], projects_version, volunteers_version)
+    return _cache.get_or_build(data_dir, versions, lambda: {**build(), "versions": versions})
@@ -0,0 +1,114 @@
+import csv
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import pyarrow as pa
+
+from utils import storage
+
+# Files smaller than this are parsed in-process: pyarrow's reader already
+# spreads one file over threads, and starting a pool costs more than it saves
+PARALLEL_MIN_BYTES = 256 << 20
+
+# Target size of one parse task
+CHUNK_BYTES = 64 << 20
+
+# Worker processes for large files (default: one per core; 1 disables the pool)
+WORKERS_ENV = "DASHBOARD_INGEST_WORKERS"
+
+# name -> function(frame) returning aggregates that can be merged across
+# chunks. Registered by the modules that own them (utils/rollups) and run on
+# every chunk in the workers, next to the parse.
+CHUNK_AGGREGATES = {}
+
+
+# ----------------------------
+# LINE-ALIGNED CHUNKS
+# ----------------------------
+# Records never span lines in these exports (no quoted newlines), so a file
+# can be cut at any newline and each piece parsed on its own.
+def read_header(path):
+    with open(path, "rb") as f:
+        line = f.readline()
+    return next(csv.reader([line.decode("utf-8-sig")])), len(line)
+
+
+def split_lines(path, size, chunks):
+    # [start, end) byte ranges after the header, each ending just past a newline
+    # (the last one at `size`)
+    _, start = read_header(path)
+    step = max((size - start) // max(chunks, 1), 1)
+    ranges = []
+    with open(path, "rb") as f:
+        while start < size:
+            end = min(start + step, size)
+            if end < size:
+                f.seek(end)
+                end = min(end + len(f.readline()), size)
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def _parse_chunk(task):
+    # Runs in a worker process
+    name, path, start, end, column_names, aggregate = task
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(end - start)
+    table = storage.read_csv_table(name, pa.BufferReader(data), column_names=column_names)
+    partial = aggregate(table.to_pandas(split_blocks=True)) if aggregate is not None else None
+    return table, partial
+
+
+# ----------------------------
+# PARALLEL PARSE
+# ----------------------------
+# Chunks are parsed with the typed schemas in a pool of spawned processes
+# (forking a server full of threads is not safe), concatenated, and their
+# per-chunk dictionaries unified into one sorted dictionary per column. The
+# registered chunk aggregates are kept for the caller that owns them.
+_chunk_results = {}
+_results_lock = threading.Lock()
+
+
+def workers():
+    return int(os.environ.get(WORKERS_ENV, 0)) or os.cpu_count() or 1
+
+
+def read_csv_table(name, path, source_key, processes=None, min_bytes=None):
+    size = storage.complete_size(path, source_key[1])
+    processes = processes or workers()
+    min_bytes = PARALLEL_MIN_BYTES if min_bytes is None else min_bytes
+    if processes < 2 or size < min_bytes:
+        return storage.read_csv_table(name, path, size=size)
+
+    column_names, _ = read_header(path)
+    aggregate = CHUNK_AGGREGATES.get(name)
+    chunks = max(processes, -(-size // CHUNK_BYTES))
+    tasks = [
+        (name, path, start, end, column_names, aggregate)
+        for start, end in split_lines(path, size, chunks)
+    ]
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(processes, mp_context=context) as pool:
+        results = list(pool.map(_parse_chunk, tasks))
+
+    table = storage.encode_categorical(name, pa.concat_tables([table for table, _ in results]))
+    if aggregate is not None:
+        with _results_lock:
+            _chunk_results[path] = (tuple(source_key), [partial for _, partial in results])
+    return table
+
+
+def take_chunk_aggregates(path, source_key):
+    # Per-chunk aggregates of the last parallel parse of `path`, if it parsed
+    # exactly this version of the file; handed out once
+    with _results_lock:
+        key, partials = _chunk_results.get(path, (None, None))
+        if key != tuple(source_key):
+            return None
+        del _chunk_results[path]
+        return partials
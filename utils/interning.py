@@ -0,0 +1,152 @@
+import threading
+
+import numpy as np
+import pandas as pd
+
+# ----------------------------
+# SHARED STRING DICTIONARIES
+# ----------------------------
+# Name-like columns are held as integer codes into one process-wide,
+# append-only dictionary per domain. Project/region codes mean the same thing
+# in all three datasets, so frames can be grouped, counted and joined on
+# codes alone. Donor and volunteer names are never joined, so each has its
+# own domain and neither frame carries the other's names as categories.
+COLUMNS = {
+    "donations": {"donor_name": "donor", "project": "project", "region": "region"},
+    "projects": {"project_name": "project", "status": "status", "region": "region"},
+    "volunteers": {"volunteer_name": "volunteer", "project": "project", "region": "region"},
+}
+
+
+class Vocabulary:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.categories = pd.Index([], dtype=object)
+
+    def __len__(self):
+        return len(self.categories)
+
+    def encode(self, values):
+        values = pd.Index(values, dtype=object)
+        codes = self.categories.get_indexer(values)
+        missing = codes == -1
+        if missing.any():
+            with self._lock:
+                codes = self.categories.get_indexer(values)
+                missing = codes == -1
+                # Codes are never reassigned: frames encoded earlier stay valid
+                # and their categories are always a prefix of the current ones
+                new = values[missing].unique()
+                self.categories = self.categories.append(new)
+                codes[missing] = self.categories.get_indexer(values[missing])
+        return codes.astype(np.int32)
+
+
+_vocabularies = {}
+_vocabularies_lock = threading.Lock()
+
+
+def vocabulary(domain):
+    with _vocabularies_lock:
+        return _vocabularies.setdefault(domain, Vocabulary())
+
+
+def intern_column(values, domain):
+    vocab = vocabulary(domain)
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+    else:
+        codes, uniques = pd.factorize(values)
+
+    mapping = vocab.encode(uniques)
+    # Missing values keep code -1
+    coded = np.where(codes >= 0, mapping[codes], -1).astype(np.int32)
+    categorical = pd.Categorical.from_codes(coded, categories=vocab.categories, validate=False)
+    return pd.Series(categorical, index=values.index, name=values.name)
+
+
+def intern_frame(name, df):
+    columns = {
+        column: intern_column(df[column], domain)
+        for column, domain in COLUMNS.get(name, {}).items()
+        if column in df.columns
+    }
+    return df.assign(**columns) if columns else df
+
+
+# ----------------------------
+# CODE-LEVEL HELPERS
+# ----------------------------
+def _counts(values):
+    codes = values.cat.codes.to_numpy()
+    return np.bincount(codes[codes >= 0], minlength=len(values.cat.categories))
+
+
+def observed_codes(values):
+    # Sorted dictionary codes that occur in the column
+    return np.flatnonzero(_counts(values)).astype(np.int32)
+
+
+def count_distinct(values):
+    return int(np.count_nonzero(_counts(values)))
+
+
+def observed_labels(values):
+    categories = values.cat.categories
+    return sorted(categories[_counts(values) > 0].tolist())
+
+
+def value_counts(values):
+    # Like Series.value_counts, with ties broken alphabetically
+    counts = _counts(values)
+    present = np.flatnonzero(counts)
+    result = pd.Series(counts[present], index=values.cat.categories[present], name="count")
+    result = result.sort_index().sort_values(ascending=False, kind="stable")
+    return result.rename_axis(values.name)
+
+
+def plain_index(series):
+    # Group results keyed by coded columns, relabelled with plain strings and
+    # sorted alphabetically (dictionary order is first-seen order)
+    def plain(level):
+        return level.astype(object) if isinstance(level, pd.CategoricalIndex) else level
+
+    index = series.index
+    if isinstance(index, pd.MultiIndex):
+        series = series.set_axis(index.set_levels([plain(level) for level in index.levels]))
+    else:
+        series = series.set_axis(plain(index))
+    return series.sort_index()
+
+
+# ----------------------------
+# MEMORY REPORT
+# ----------------------------
+# Bytes per dataset with the name columns as object strings vs. interned codes
+def memory_report(frames):
+    rows = []
+    seen_domains = set()
+    for name, df in frames.items():
+        coded = [c for c in COLUMNS.get(name, {}) if c in df.columns]
+        as_objects = df.astype({c: object for c in coded})
+        object_bytes = int(as_objects.memory_usage(deep=True, index=False).sum())
+
+        other = [c for c in df.columns if c not in coded]
+        interned_bytes = int(df[other].memory_usage(deep=True, index=False).sum())
+        interned_bytes += sum(df[c].cat.codes.nbytes for c in coded)
+
+        # Each shared dictionary is charged once, to the first dataset using it
+        for c in coded:
+            domain = COLUMNS[name][c]
+            if domain not in seen_domains:
+                seen_domains.add(domain)
+                interned_bytes += int(vocabulary(domain).categories.memory_usage(deep=True))
+
+        rows.append({
+            "dataset": name,
+            "rows": len(df),
+            "object_bytes": object_bytes,
+            "interned_bytes": interned_bytes,
+            "ratio": object_bytes / max(interned_bytes, 1),
+        })
+    return pd.DataFrame(rows)
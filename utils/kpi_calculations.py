@@ -1,12 +1,175 @@
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils import interning, sqlite_backend
+from utils.data_loader import BACKEND, DATA_DIR, VersionCache, dataset_version, load_versioned
+from utils.retention import get_donor_table
+
+
+class DonationKPIs(NamedTuple):
+    total_donations: float
+    donation_count: int
+    unique_donors: int
+    repeat_donors: int
+    retention_rate: float
+    avg_donation: float
+    top_region: str
+    top_project: str
+
+
+class ProjectKPIs(NamedTuple):
+    total_projects: int
+    active_projects: int
+    total_beneficiaries: int
+
+
+class VolunteerKPIs(NamedTuple):
+    total_volunteers: int
+    total_hours: float
+    avg_hours: float
+
+
+# ----------------------------
+# COLUMNAR REDUCTIONS
+# ----------------------------
+# Every KPI is a whole-column sum or a bincount over a coded column's
+# dictionary codes; no groupby, nunique or per-card pass over the rows. Donor
+# counts are read off the donor state table (utils/retention), which is kept
+# per version and extended with appended rows rather than rebuilt here.
+def _codes(values):
+    codes = values.cat.codes.to_numpy()
+    valid = codes >= 0
+    return codes, valid
+
+
+def _top_labels(first, second, weights):
+    # Label with the largest summed weight in each of two coded columns, among
+    # the labels observed in it; ties go to the alphabetically first, like
+    # idxmax over an alphabetical index. One bincount over the combined codes
+    # (code 0 is a missing value) serves both columns.
+    width = len(second.cat.categories) + 1
+    cells = (first.cat.codes.to_numpy().astype(np.int64) + 1) * width + second.cat.codes.to_numpy() + 1
+    size = (len(first.cat.categories) + 1) * width
+    sums = np.bincount(cells, weights=weights, minlength=size).astype(float, copy=False).reshape(-1, width)
+
+    counts = None
+    labels = []
+    for axis, values in ((1, first), (0, second)):
+        totals = sums.sum(axis=axis)[1:]
+        if not (len(totals) and totals.max() > 0):
+            # Labels without rows sum to 0 as well, which only matters when
+            # no label sums to more
+            if counts is None:
+                counts = np.bincount(cells, minlength=size).reshape(-1, width)
+            totals[counts.sum(axis=axis)[1:] == 0] = -np.inf
+        if not len(totals) or totals.max() == -np.inf:
+            labels.append("-")
+            continue
+        best = np.flatnonzero(totals == totals.max())
+        labels.append(min(values.cat.categories[best]))
+    return labels
+
+
+def _donor_figures(donors):
+    return {
+        "unique_donors": donors.unique_donors,
+        "repeat_donors": donors.repeat_donors,
+        "retention_rate": donors.retention_rate,
+    }
+
+
+def donation_kpis(df, donors):
+    # `donors` is the DonorTable of the same rows
+    amount = df["donation_amount"].to_numpy(dtype=float, na_value=0.0)
+    total = float(amount.sum())
+    count = len(df)
+    top_region, top_project = _top_labels(df["region"], df["project"], amount)
+    return DonationKPIs(
+        total_donations=total,
+        donation_count=count,
+        **_donor_figures(donors),
+        avg_donation=total / count if count else 0.0,
+        top_region=top_region,
+        top_project=top_project,
+    )
+
+
+def project_kpis(df):
+    codes, valid = _codes(df["status"])
+    counts = np.bincount(codes[valid], minlength=len(df["status"].cat.categories))
+    ongoing = df["status"].cat.categories.get_indexer(["Ongoing"])[0]
+    return ProjectKPIs(
+        total_projects=len(df),
+        active_projects=int(counts[ongoing]) if ongoing >= 0 else 0,
+        total_beneficiaries=int(df["beneficiaries"].sum()),
+    )
+
+
+def volunteer_kpis(df):
+    codes, valid = _codes(df["volunteer_name"])
+    hours = df["hours_contributed"]
+    return VolunteerKPIs(
+        total_volunteers=int(np.count_nonzero(np.bincount(codes[valid]))) if valid.any() else 0,
+        total_hours=hours.sum().item(),
+        avg_hours=float(hours.mean()) if len(hours) else 0.0,
+    )
+
+
+_KPI_FUNCTIONS = {
+    "donations": donation_kpis,
+    "projects": project_kpis,
+    "volunteers": volunteer_kpis,
+}
+
+# The same KPIs as aggregate queries, for the SQLite backend
+_SQL_KPIS = {
+    "donations": (DonationKPIs, sqlite_backend.donation_kpis),
+    "projects": (ProjectKPIs, sqlite_backend.project_kpis),
+    "volunteers": (VolunteerKPIs, sqlite_backend.volunteer_kpis),
+}
+
+
 def calculate_kpis(donations, projects, volunteers):
-    total_donations = donations['donation_amount'].sum()
-    total_volunteers = volunteers['volunteer_name'].nunique()
-    total_hours = volunteers['hours_contributed'].sum()
-    total_beneficiaries = projects['beneficiaries'].sum()
-    
+    # Headline figures over any three frames, coded or as read from the CSVs
+    def coded(name, df):
+        columns = interning.COLUMNS[name]
+        if all(isinstance(df[column].dtype, pd.CategoricalDtype) for column in columns if column in df.columns):
+            return df
+        return interning.intern_frame(name, df)
+
+    volunteer = volunteer_kpis(coded("volunteers", volunteers))
     return {
-        "total_donations": total_donations,
-        "total_volunteers": total_volunteers,
-        "total_hours": total_hours,
-        "total_beneficiaries": total_beneficiaries
+        "total_donations": float(donations["donation_amount"].sum()),
+        "total_volunteers": volunteer.total_volunteers,
+        "total_hours": volunteer.total_hours,
+        "total_beneficiaries": project_kpis(coded("projects", projects)).total_beneficiaries,
     }
+
+
+# ----------------------------
+# PER-VERSION KPI CACHE
+# ----------------------------
+# One scan per dataset version, shared by every session and rerun.
+_cache = VersionCache(name=__name__)
+
+
+def get_kpis(name, data_dir=DATA_DIR):
+    if BACKEND == "sqlite":
+        version = dataset_version(name, data_dir)
+        result, query = _SQL_KPIS[name]
+
+        def build():
+            values = query(data_dir, version)
+            if name == "donations":
+                values.update(_donor_figures(get_donor_table(data_dir)))
+            return result(**values)
+
+        return _cache.get_or_build((name, data_dir), version, build)
+    df, version = load_versioned(name, data_dir)
+    if name == "donations":
+        return _cache.get_or_build(
+            (name, data_dir), version, lambda: donation_kpis(df, get_donor_table(data_dir))
+        )
+    return _cache.get_or_build((name, data_dir), version, lambda: _KPI_FUNCTIONS[name](df))
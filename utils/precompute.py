@@ -0,0 +1,275 @@
+import hashlib
+import importlib
+import json
+import logging
+import os
+import pickle
+import sys
+import threading
+import time
+
+from utils import data_loader, shared
+from utils.data_loader import BACKEND, CACHES, DATA_DIR, DATASETS, DataVersion
+
+logger = logging.getLogger(__name__)
+
+# Snapshot directory the app serves from while it matches the data files
+# (unset: always load the data files)
+SNAPSHOT_DIR_ENV = "DASHBOARD_SNAPSHOT_DIR"
+
+MANIFEST = "manifest.json"
+
+# Full builds attempted before giving up on files that keep changing
+ATTEMPTS = 3
+
+# Bumped whenever the snapshot layout changes. A snapshot is only served by
+# the same format and the same code that wrote it: its cache entries are
+# pickled instances of this package's classes.
+FORMAT = 1
+
+
+# ----------------------------
+# HEADLESS PRECOMPUTE
+# ----------------------------
+# Loads the three datasets and builds every aggregate and index the pages
+# read, exactly as the refresher would, then writes them out:
+#   <name>-<stamp>.arrow      each dataset, uncompressed Arrow IPC
+#   <module>-<stamp>.pickle   the newest entries of each named VersionCache
+#   manifest.json             the files, the source file versions they
+#                             were built from and the format and code
+#                             version that wrote them; swapped in last
+# Run from cron to keep interactive servers from ever aggregating:
+#   python -m utils.precompute data/ snapshots/
+_code_version = None
+
+
+def code_version():
+    # Digest of this package's sources, so a deploy retires older snapshots
+    global _code_version
+    if _code_version is None:
+        digest = hashlib.sha1()
+        directory = os.path.dirname(os.path.abspath(__file__))
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(".py"):
+                with open(os.path.join(directory, filename), "rb") as f:
+                    digest.update(filename.encode() + b"\0" + f.read())
+        _code_version = digest.hexdigest()[:16]
+    return _code_version
+
+
+def _for_dir(key, data_dir):
+    return key == data_dir or (isinstance(key, tuple) and data_dir in key)
+
+
+def _build(data_dir):
+    from utils.refresher import warm
+
+    for _ in range(ATTEMPTS):
+        with data_loader.latest_view():
+            frames = {name: data_loader.load_versioned(name, data_dir) for name in DATASETS}
+            warm(data_dir)
+            # A file written to mid-build would mix versions
+            versions = {name: data_loader.load_versioned(name, data_dir)[1] for name in DATASETS}
+        if versions == {name: version for name, (_, version) in frames.items()}:
+            return frames
+    raise RuntimeError(f"Files in {data_dir!r} kept changing; no snapshot written")
+
+
+def precompute(data_dir=DATA_DIR, out_dir="snapshots"):
+    # Generations are numbered from the clock, past the previous snapshot's:
+    # a server's own loads count up from 1, and a generation must never name
+    # two different sets of rows
+    previous = _read_manifest(out_dir)
+    published = [r["generation"] for r in (previous or {"datasets": {}})["datasets"].values()]
+    data_loader.skip_generations(max(published + [time.time_ns() // 1_000_000]))
+
+    frames = _build(data_dir)
+    os.makedirs(out_dir, exist_ok=True)
+    stamp = f"{time.time_ns():x}"
+    manifest = {
+        "format": FORMAT,
+        "code": code_version(),
+        "created": time.time(),
+        "data_dir": data_dir,
+        "datasets": {},
+        "caches": {},
+    }
+
+    for name, (df, version) in frames.items():
+        filename = f"{name}-{stamp}.arrow"
+        shared.write_table(os.path.join(out_dir, filename), df)
+        manifest["datasets"][name] = {"file": filename, **version._asdict()}
+
+    for module, cache in CACHES.items():
+        entries = [entry for entry in cache.latest_entries() if _for_dir(entry[0], data_dir)]
+        if not entries:
+            continue
+        filename = f"{module}-{stamp}.pickle"
+
+        def write(tmp_path):
+            with open(tmp_path, "wb") as f:
+                pickle.dump(entries, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        shared.write_atomic(os.path.join(out_dir, filename), write)
+        manifest["caches"][module] = filename
+
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f, indent=1)
+
+    shared.write_atomic(os.path.join(out_dir, MANIFEST), write)
+    _prune(out_dir, previous, manifest)
+    return manifest
+
+
+def _files(manifest):
+    if manifest is None:
+        return set()
+    return {r["file"] for r in manifest["datasets"].values()} | set(manifest["caches"].values())
+
+
+def _prune(directory, previous, manifest):
+    # The previous snapshot's files stay for servers that read its manifest
+    # and have not loaded them yet
+    keep = _files(previous) | _files(manifest)
+    for filename in os.listdir(directory):
+        if filename.endswith((".arrow", ".pickle")) and filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+# ----------------------------
+# SERVING A SNAPSHOT
+# ----------------------------
+# While the snapshot was built from the data files as they are now (same
+# mtime and size), a page is served its memory-mapped frames and every cache
+# is seeded with its prebuilt entries: nothing is parsed or aggregated. Once
+# a file changes the snapshot is dropped and the data is loaded as usual;
+# so is a snapshot written by another format or version of the code.
+# Not used on the SQLite backend, whose database already is the precomputed
+# store.
+_manifests = {}
+_serving = {}
+_lock = threading.Lock()
+
+
+def _trusted(path):
+    # Pickles are code: only loaded from files and directories that nobody
+    # but their owner (this user or root) can write to
+    stat = os.stat(path)
+    return stat.st_uid in (os.getuid(), 0) and not stat.st_mode & 0o022
+
+
+def _usable(directory, manifest):
+    if (manifest.get("format"), manifest.get("code")) != (FORMAT, code_version()):
+        return False
+    paths = [directory] + [os.path.join(directory, f) for f in manifest["caches"].values()]
+    untrusted = [path for path in paths if not _trusted(path)]
+    if untrusted:
+        logger.warning("Not serving the snapshot in %s: writable by other users: %s", directory, untrusted)
+        return False
+    return True
+
+
+def _fresh(manifest, data_dir):
+    for name, record in manifest["datasets"].items():
+        try:
+            stat = os.stat(os.path.join(data_dir, DATASETS[name]))
+        except FileNotFoundError:
+            return False
+        if (stat.st_mtime_ns, stat.st_size) != (record["mtime_ns"], record["size"]):
+            return False
+    return True
+
+
+def _current_manifest(directory):
+    try:
+        stat = os.stat(os.path.join(directory, MANIFEST))
+    except FileNotFoundError:
+        return None, None
+    key = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+    cached = _manifests.get(directory)
+    if cached is None or cached[0] != key:
+        cached = (key, _read_manifest(directory))
+        _manifests[directory] = cached
+    return cached
+
+
+def _rekey(key, old, new):
+    if key == old:
+        return new
+    if isinstance(key, tuple):
+        return tuple(new if part == old else part for part in key)
+    return key
+
+
+def _load(directory, manifest, data_dir):
+    frames = {}
+    for name, record in manifest["datasets"].items():
+        version = DataVersion(*(record[field] for field in DataVersion._fields))
+        frames[name] = (shared.map_frame(os.path.join(directory, record["file"])), version)
+
+    for module, filename in manifest["caches"].items():
+        importlib.import_module(module)
+        with open(os.path.join(directory, filename), "rb") as f:
+            entries = pickle.load(f)
+        cache = CACHES[module]
+        for key, version, value in entries:
+            cache.put(_rekey(key, manifest["data_dir"], data_dir), version, value)
+
+    data_loader.skip_generations(max(version.generation for _, version in frames.values()))
+    data_loader.serve_frames(data_dir, frames)
+
+
+def serve_snapshot(data_dir=DATA_DIR):
+    # True if data_dir is (now) served from a fresh snapshot
+    directory = os.environ.get(SNAPSHOT_DIR_ENV)
+    if not directory or BACKEND == "sqlite":
+        return False
+    with _lock:
+        for _ in range(2):
+            key, manifest = _current_manifest(directory)
+            if manifest is not None and _fresh(manifest, data_dir):
+                if _serving.get(data_dir) != key:
+                    try:
+                        if not _usable(directory, manifest):
+                            break
+                        _load(directory, manifest, data_dir)
+                    except FileNotFoundError:
+                        # Pruned by a newer run between manifest and files
+                        _manifests.pop(directory, None)
+                        continue
+                    _serving[data_dir] = key
+                return True
+            break
+        if _serving.pop(data_dir, None) is not None:
+            data_loader.unpublish(data_dir)
+        return False
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    data_dir = argv[0] if argv else DATA_DIR
+    out_dir = argv[1] if len(argv) > 1 else os.environ.get(SNAPSHOT_DIR_ENV, "snapshots")
+    started = time.perf_counter()
+    manifest = precompute(data_dir, out_dir)
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in _files(manifest))
+    rows = ", ".join(f"{name} {r['rows']:,}" for name, r in manifest["datasets"].items())
+    print(
+        f"Snapshot of {data_dir} ({rows} rows) written to {out_dir}: "
+        f"{len(_files(manifest))} files, {size / 1e6:.1f} MB, {time.perf_counter() - started:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+import itertools
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import streamlit as st
+
+from utils import startup
+
+# Profiling is on for every session with DASHBOARD_PROFILE=1, or for one
+# session by opening a page with ?profile=1
+PROFILE_ENV = "DASHBOARD_PROFILE"
+
+# Every recorded section is also appended here as one JSON line, if set
+LOG_PATH = os.environ.get("DASHBOARD_PROFILE_LOG")
+
+# Reruns kept per session for the sidebar panel and its download
+MAX_RUNS = 50
+
+
+# ----------------------------
+# SECTION TIMING
+# ----------------------------
+# A page calls start_run() once at the top, wraps each section in
+# `with section(...)`, and calls sidebar_panel() at the bottom. Sections record
+# wall time, rows processed and bytes sent to the browser; render_chart and
+# paginated_table report their payloads to the innermost open section. With
+# profiling off, start_run() leaves no run open and sections record nothing.
+_local = threading.local()
+_run_ids = itertools.count(1)
+_log_lock = threading.Lock()
+
+
+class Section:
+    __slots__ = ("name", "depth", "rows", "payload_bytes", "seconds")
+
+    def __init__(self, name, depth, rows=None):
+        self.name = name
+        self.depth = depth
+        self.rows = rows
+        self.payload_bytes = 0
+        self.seconds = 0.0
+
+
+def enabled():
+    if os.environ.get(PROFILE_ENV, "").lower() in ("1", "true", "yes"):
+        return True
+    return st.query_params.get("profile") == "1"
+
+
+def active():
+    return getattr(_local, "run", None) is not None
+
+
+def start_run(page):
+    _local.run = None
+    _local.stack = []
+    if not enabled():
+        return
+    rerun = st.session_state.get("_profile_rerun", 0) + 1
+    st.session_state["_profile_rerun"] = rerun
+    _local.run = {
+        "run_id": next(_run_ids),
+        "page": page,
+        "rerun": rerun,
+        "started": time.time(),
+        "clock": time.perf_counter(),
+        "sections": [],
+    }
+
+
+@contextmanager
+def section(name, rows=None):
+    run = getattr(_local, "run", None)
+    stack = getattr(_local, "stack", [])
+    current = Section(name, len(stack), rows)
+    if run is None:
+        yield current
+        return
+
+    stack.append(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    finally:
+        current.seconds = time.perf_counter() - start
+        stack.pop()
+        run["sections"].append(current)
+
+
+def add_rows(rows):
+    stack = getattr(_local, "stack", None)
+    if stack and active():
+        stack[-1].rows = (stack[-1].rows or 0) + int(rows)
+
+
+def add_payload(nbytes):
+    stack = getattr(_local, "stack", None)
+    if stack and active():
+        stack[-1].payload_bytes += int(nbytes)
+
+
+def frame_bytes(df):
+    # Streamlit ships dataframes to the browser as Arrow IPC
+    return pa.Table.from_pandas(df, preserve_index=True).nbytes
+
+
+# ----------------------------
+# RECORDS AND EXPORT
+# ----------------------------
+def _records(run):
+    base = {
+        "run_id": run["run_id"],
+        "page": run["page"],
+        "rerun": run["rerun"],
+        "started": run["started"],
+    }
+    records = [
+        {
+            **base,
+            "section": s.name,
+            "depth": s.depth,
+            "seconds": s.seconds,
+            "rows": s.rows,
+            "payload_bytes": s.payload_bytes,
+        }
+        for s in run["sections"]
+    ]
+    # Whole rerun, including whatever ran outside a section
+    records.append({
+        **base,
+        "section": "(rerun total)",
+        "depth": 0,
+        "seconds": run["seconds"],
+        "rows": None,
+        "payload_bytes": sum(s.payload_bytes for s in run["sections"] if s.depth == 0),
+    })
+    return records
+
+
+def to_jsonl(records):
+    return "".join(json.dumps(record) + "\n" for record in records)
+
+
+def finish_run():
+    run = getattr(_local, "run", None)
+    if run is None:
+        return None
+    _local.run = None
+    run["seconds"] = time.perf_counter() - run["clock"]
+    records = _records(run)
+
+    runs = st.session_state.setdefault("_profile_runs", deque(maxlen=MAX_RUNS))
+    runs.append(records)
+
+    if LOG_PATH:
+        with _log_lock, open(LOG_PATH, "a") as f:
+            f.write(to_jsonl(records))
+    return records
+
+
+def sidebar_panel():
+    records = finish_run()
+    if records is None:
+        return
+
+    with st.sidebar.expander("⏱️ Profiling", expanded=True):
+        table = pd.DataFrame(records)
+        table["section"] = table["depth"].map(lambda d: "  " * d) + table["section"]
+        table["ms"] = table["seconds"] * 1000
+        table["payload_kb"] = table["payload_bytes"] / 1024
+        st.caption(f"{records[0]['page']} · rerun {records[0]['rerun']}")
+        st.dataframe(
+            table[["section", "ms", "rows", "payload_kb"]],
+            hide_index=True,
+            column_config={
+                "ms": st.column_config.NumberColumn(format="%.1f"),
+                "payload_kb": st.column_config.NumberColumn("payload KB", format="%.1f"),
+            },
+        )
+        runs = st.session_state["_profile_runs"]
+        st.download_button(
+            f"Download {len(runs)} reruns (JSON lines)",
+            to_jsonl(record for run in runs for record in run),
+            file_name="profile.jsonl",
+            mime="application/json",
+        )
+        # Start-up breakdown, when this server was started by utils/startup
+        steps = startup.report()
+        if steps:
+            warm = pd.DataFrame(steps, columns=["step", "seconds"])
+            warm["ms"] = warm["seconds"] * 1000
+            st.caption(f"Server start · {warm['ms'].sum():.0f} ms")
+            st.dataframe(
+                warm[["step", "ms"]],
+                hide_index=True,
+                column_config={"ms": st.column_config.NumberColumn(format="%.1f")},
+            )
@@ -0,0 +1,189 @@
+import numpy as np
+import pandas as pd
+
+from utils import sqlite_backend
+from utils.data_loader import BACKEND, DATA_DIR, VersionCache, dataset_version, load_versioned
+from utils.interning import observed_labels, plain_index, value_counts
+from utils.search import SearchIndex
+
+# Columns each filter panel can narrow on, including its name search column
+INDEXED_COLUMNS = {
+    "projects": ["region", "status", "project_name"],
+    "volunteers": ["region", "project", "volunteer_name"],
+}
+
+
+# ----------------------------
+# INVERTED-INDEX FILTERING
+# ----------------------------
+def _dense_codes(values):
+    # Dictionaries are shared across frames (utils/interning): each row's
+    # position among the codes this frame uses, with missing values after
+    # them, so nothing built from them grows with codes only other frames use
+    codes = values.cat.codes.to_numpy()
+    observed = np.unique(codes[codes >= 0])
+    return np.where(codes >= 0, np.searchsorted(observed, codes), len(observed)), observed
+
+
+class FilterIndex:
+    def __init__(self, df, columns):
+        self.df = df
+        self._codes = {}
+        self._postings = {}
+        self._labels = {}
+        self._observed = {}
+        self._orders = {}
+        self._search = {}
+        for column in columns:
+            values = df[column]
+            dense, observed = _dense_codes(values)
+            # Row positions grouped by code; each group stays in row order
+            order = np.argsort(dense, kind="stable")
+            bounds = np.searchsorted(dense[order], np.arange(len(observed) + 1))
+            self._codes[column] = dense
+            self._postings[column] = (order, bounds)
+            self._observed[column] = observed
+            self._labels[column] = values.cat.categories[observed]
+
+    def __len__(self):
+        return len(self.df)
+
+    def _dense(self, column, codes):
+        # Dictionary codes -> positions among the observed ones, dropping
+        # codes this frame does not use
+        observed = self._observed[column]
+        at = np.minimum(np.searchsorted(observed, codes), max(len(observed) - 1, 0))
+        return at[observed[at] == codes] if len(observed) else at[:0]
+
+    def _code_mask(self, column, codes):
+        # One flag per observed code, plus a trailing False for missing values
+        mask = np.zeros(len(self._observed[column]) + 1, dtype=bool)
+        mask[codes] = True
+        return mask
+
+    def _rows_with(self, column, codes):
+        order, bounds = self._postings[column]
+        if len(codes) == 1:
+            return order[bounds[codes[0]]:bounds[codes[0] + 1]]
+        return np.sort(np.concatenate([order[bounds[c]:bounds[c + 1]] for c in codes]))
+
+    def _row_count(self, column, codes):
+        _, bounds = self._postings[column]
+        return int((bounds[np.asarray(codes) + 1] - bounds[np.asarray(codes)]).sum())
+
+    def search_index(self, column):
+        if column not in self._search:
+            self._search[column] = SearchIndex(self.df[column])
+        return self._search[column]
+
+    def positions(self, filters, search=None):
+        # `filters` maps column -> label ("All"/None means no filter); `search`
+        # is a (column, keyword) substring search. Returns sorted row
+        # positions, or None when nothing narrows the table.
+        conditions = []
+        for column, label in filters.items():
+            if label in (None, "All"):
+                continue
+            code = self._labels[column].get_indexer([label])[0]
+            conditions.append((column, [code] if code >= 0 else []))
+        if search and search[1]:
+            column, keyword = search
+            conditions.append((column, self._dense(column, self.search_index(column).substring(keyword))))
+
+        if not conditions:
+            return None
+        if any(len(codes) == 0 for _, codes in conditions):
+            return np.empty(0, dtype=np.intp)
+
+        # Materialise the condition matching the fewest rows, then check the
+        # others' codes on just those rows
+        conditions.sort(key=lambda c: self._row_count(*c))
+        rows = self._rows_with(*conditions[0])
+        for column, codes in conditions[1:]:
+            rows = rows[self._code_mask(column, codes)[self._codes[column][rows]]]
+        return rows
+
+    def order(self, column, ascending=True):
+        key = (column, ascending)
+        if key not in self._orders:
+            values = self.df[column]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Alphabetical rank of each observed label, then per row;
+                # missing values sort last either way, as NaN does below
+                dense, observed = _dense_codes(values)
+                label_rank = np.argsort(np.argsort(values.cat.categories[observed].to_numpy(dtype=str)))
+                if not ascending:
+                    label_rank = len(label_rank) - 1 - label_rank
+                order = np.argsort(np.append(label_rank, len(label_rank))[dense], kind="stable")
+            else:
+                sort_key = values.to_numpy()
+                order = np.argsort(sort_key if ascending else -sort_key, kind="stable")
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            self._orders[key] = (order, rank)
+        return self._orders[key]
+
+    def count(self, rows):
+        return len(self.df) if rows is None else len(rows)
+
+    def page(self, rows, sort=None, offset=0, limit=None):
+        # `rows` as returned by positions(); yields the sorted slice
+        # [offset, offset + limit) of the matching rows
+        total = self.count(rows)
+        stop = total if limit is None else min(offset + limit, total)
+
+        if sort is None:
+            page = np.arange(offset, stop) if rows is None else rows[offset:stop]
+        else:
+            order, rank = self.order(*sort)
+            if rows is None:
+                page = order[offset:stop]
+            else:
+                page = rows[np.argsort(rank[rows], kind="stable")][offset:stop]
+        # The shared dictionaries would otherwise ship whole with every page
+        rows = self.df.iloc[page]
+        coded = [column for column in rows.columns if isinstance(rows[column].dtype, pd.CategoricalDtype)]
+        return rows.assign(**{column: rows[column].cat.remove_unused_categories() for column in coded})
+
+
+_cache = VersionCache()
+
+
+def get_filter_index(name, data_dir=DATA_DIR):
+    if BACKEND == "sqlite":
+        version = dataset_version(name, data_dir)
+        return _cache.get_or_build(
+            (name, data_dir), version, lambda: sqlite_backend.SqlTable(data_dir, name, version)
+        )
+    df, version = load_versioned(name, data_dir)
+    return _cache.get_or_build((name, data_dir), version, lambda: FilterIndex(df, INDEXED_COLUMNS[name]))
+
+
+# ----------------------------
+# COLUMN SUMMARIES
+# ----------------------------
+# Filter options and chart inputs for the Projects and Volunteers pages, on
+# whichever backend holds the data.
+def labels(name, column, data_dir=DATA_DIR):
+    # Sorted distinct labels present in the column
+    if BACKEND == "sqlite":
+        return sqlite_backend.labels(data_dir, name, dataset_version(name, data_dir), column)
+    return observed_labels(load_versioned(name, data_dir)[0][column])
+
+
+def label_counts(name, column, data_dir=DATA_DIR):
+    # Rows per label, most frequent first (ties alphabetically)
+    if BACKEND == "sqlite":
+        return sqlite_backend.label_counts(data_dir, name, dataset_version(name, data_dir), column)
+    return value_counts(load_versioned(name, data_dir)[0][column])
+
+
+def label_totals(name, column, value, top=None, data_dir=DATA_DIR):
+    # Sum of `value` per label, alphabetically; or the `top` largest, largest first
+    if BACKEND == "sqlite":
+        return sqlite_backend.label_totals(data_dir, name, dataset_version(name, data_dir), column, value, top)
+    df = load_versioned(name, data_dir)[0]
+    totals = plain_index(df.groupby(column, observed=True)[value].sum())
+    if top:
+        totals = totals.sort_values(ascending=False, kind="stable").head(top)
+    return totals
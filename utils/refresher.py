@@ -0,0 +1,167 @@
+import logging
+import os
+import threading
+import time
+
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from utils import data_loader, precompute
+from utils.data_loader import DATA_DIR, DATASETS
+from utils.impact import get_impact
+from utils.kpi_calculations import get_kpis
+from utils.query import INDEXED_COLUMNS, get_filter_index
+from utils.retention import get_donor_table
+from utils.rollups import get_donation_rollups
+from utils.search import get_search_index
+from utils.sketches import SKETCHED, get_sketches
+
+logger = logging.getLogger(__name__)
+
+# Set to 0 to load on the request path instead (files are checked every rerun)
+WATCH_ENV = "DASHBOARD_WATCH"
+
+# Quiet period after the last file event before a rebuild starts, so a burst
+# of writes to one file is picked up as a single new version
+DEBOUNCE_SECONDS = 0.5
+
+# Event types that can change a file's contents
+_WRITE_EVENTS = {"created", "modified", "moved", "deleted", "closed"}
+
+
+# ----------------------------
+# BACKGROUND REFRESH
+# ----------------------------
+# A watchdog observer on the data dir wakes a worker thread, which reloads the
+# changed files, rebuilds every derived aggregate and index for the new
+# versions, and only then publishes them. Until the swap, reruns keep being
+# served the previous versions from memory; they never parse or aggregate.
+def warm(data_dir):
+    # Every aggregate and index the pages read (utils/precompute saves them)
+    get_donation_rollups(data_dir)
+    get_donor_table(data_dir)
+    if data_loader.BACKEND != "sqlite":
+        get_search_index("donations", "donor_name", data_dir)
+    for name in DATASETS:
+        get_kpis(name, data_dir)
+    for name in INDEXED_COLUMNS:
+        get_filter_index(name, data_dir)
+    for name in SKETCHED:
+        get_sketches(name, data_dir)
+    get_impact(data_dir)
+
+
+class _DataDirHandler(FileSystemEventHandler):
+    def __init__(self, refresher):
+        self.refresher = refresher
+        self.filenames = set(DATASETS.values())
+
+    def on_any_event(self, event):
+        # Reads (including the refresher's own) raise opened/closed_no_write
+        # events; only writes count
+        if event.is_directory or event.event_type not in _WRITE_EVENTS:
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if any(os.path.basename(path) in self.filenames for path in paths if path):
+            self.refresher.notify()
+
+
+class Refresher:
+    def __init__(self, data_dir=DATA_DIR, debounce=DEBOUNCE_SECONDS):
+        self.data_dir = data_dir
+        self.debounce = debounce
+        self.ready = threading.Event()
+        self.last_error = None
+        self.refreshes = 0
+        self._changed = threading.Event()
+        self._stopped = threading.Event()
+        self._last_event = 0.0
+        self._observer = Observer()
+        self._observer.schedule(_DataDirHandler(self), data_dir, recursive=False)
+        self._thread = threading.Thread(target=self._run, name=f"refresher:{data_dir}", daemon=True)
+
+    def start(self):
+        self._observer.start()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._changed.set()
+        self._observer.stop()
+        self._observer.join()
+        self._thread.join()
+        data_loader.unpublish(self.data_dir)
+
+    def notify(self):
+        self._last_event = time.monotonic()
+        self._changed.set()
+
+    def refresh(self):
+        # Load whatever changed, build everything derived from it, then swap
+        with data_loader.latest_view():
+            for name in DATASETS:
+                data_loader.dataset_version(name, self.data_dir)
+            warm(self.data_dir)
+        versions = data_loader.publish(self.data_dir)
+        self.refreshes += 1
+        return versions
+
+    def _run(self):
+        # Initial snapshot, then one refresh per settled burst of file events
+        pending = True
+        while not self._stopped.is_set():
+            if pending:
+                wait = self._last_event + self.debounce - time.monotonic()
+                if wait > 0:
+                    self._stopped.wait(wait)
+                    continue
+                self._changed.clear()
+                try:
+                    self.refresh()
+                    self.last_error = None
+                except Exception as exc:
+                    # A half-written file, say: keep serving the last good
+                    # versions and retry on the next event
+                    self.last_error = exc
+                    logger.exception("Refreshing %s failed", self.data_dir)
+                self.ready.set()
+            self._changed.wait()
+            pending = not self._stopped.is_set()
+
+
+_refreshers = {}
+_lock = threading.Lock()
+
+
+def ensure_refresher(data_dir=DATA_DIR, timeout=None):
+    # Started once per process and data dir; the first caller waits for the
+    # initial snapshot so there is always a version to serve. With the shared
+    # backend only the elected publisher process runs one. None runs while a
+    # precomputed snapshot of the current files is served instead.
+    with _lock:
+        running = data_dir in _refreshers
+    if not running and precompute.serve_snapshot(data_dir):
+        return None
+    if os.environ.get(WATCH_ENV, "1") == "0":
+        return None
+    if data_loader.BACKEND == "shared":
+        # One process per data dir loads and publishes; the rest only attach
+        from utils import shared
+        if not shared.claim_publisher(data_dir):
+            shared.wait_for_manifest(data_dir, timeout)
+            return None
+    with _lock:
+        refresher = _refreshers.get(data_dir)
+        if refresher is None:
+            refresher = Refresher(data_dir).start()
+            _refreshers[data_dir] = refresher
+    refresher.ready.wait(timeout)
+    return refresher
+
+
+def stop_refreshers():
+    with _lock:
+        for refresher in _refreshers.values():
+            refresher.stop()
+        _refreshers.clear()
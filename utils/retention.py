@@ -0,0 +1,256 @@
+import numpy as np
+import pandas as pd
+
+from utils import sqlite_backend
+from utils.data_loader import BACKEND, DATA_DIR, VersionCache, dataset_version, load_versioned
+
+# Pair keys pack (donor slot, day or month number) into one int64; the
+# offset keeps dates before 1970 positive
+_SHIFT = 32
+_OFFSET = 1 << 31
+_LOW = (1 << _SHIFT) - 1
+
+_NO_DAY = np.iinfo(np.int64).max
+_NO_LAST = np.iinfo(np.int64).min
+
+
+# ----------------------------
+# DONOR STATE TABLE
+# ----------------------------
+# One slot per donor with first/last donation day, distinct donation days,
+# donation count and lifetime amount, plus the sorted (donor, day) and
+# (donor, month) pairs seen so far. extend() folds in a batch of appended
+# donations and returns a new table; a table is never modified once built,
+# so the version being served and the one being built can share it.
+class DonorTable:
+    def __init__(self, labels=None, first=None, last=None, days=None, count=None, amount=None,
+                 day_keys=None, month_keys=None):
+        empty = np.zeros(0, dtype=np.int64)
+        self.labels = labels if labels is not None else pd.Index([], dtype=object)
+        self.first = first if first is not None else empty
+        self.last = last if last is not None else empty
+        self.days = days if days is not None else empty
+        self.count = count if count is not None else empty
+        self.amount = amount if amount is not None else empty
+        self.day_keys = day_keys if day_keys is not None else empty
+        self.month_keys = month_keys if month_keys is not None else empty
+        self._frame = None
+        self._cohorts = None
+
+    def __len__(self):
+        return int(np.count_nonzero(self.count))
+
+    def _slots(self, names):
+        # Labels with the batch's new names appended, and the slot of each
+        # named row (`valid` flags them)
+        codes, uniques = _factorize(names)
+        mapping = self.labels.get_indexer(uniques)
+        new = mapping == -1
+        labels = self.labels.append(uniques[new]) if new.any() else self.labels
+        mapping[new] = np.arange(len(self.labels), len(labels))
+        valid = codes >= 0
+        return labels, mapping[codes[valid]], valid
+
+    def extend(self, names, dates, amounts):
+        labels, donor, valid = self._slots(names)
+        stamps = dates.to_numpy()[valid]
+        amount = amounts.to_numpy()[valid]
+        if amount.dtype.kind == "f":
+            amount = np.nan_to_num(amount)
+        dated = ~np.isnat(stamps)
+        day = stamps[dated].astype("datetime64[D]").astype(np.int64)
+        month = stamps[dated].astype("datetime64[M]").astype(np.int64)
+        dated_donor = donor[dated]
+
+        size = len(labels)
+        first = _grow(self.first, size, _NO_DAY)
+        last = _grow(self.last, size, _NO_LAST)
+        np.minimum.at(first, dated_donor, day)
+        np.maximum.at(last, dated_donor, day)
+        count = _grow(self.count, size, 0) + np.bincount(donor, minlength=size)
+        totals = _grow(self.amount.astype(np.result_type(self.amount, amount)), size, 0)
+        np.add.at(totals, donor, amount)
+
+        day_keys, new_days = _merge_keys(self.day_keys, dated_donor, day)
+        month_keys, _ = _merge_keys(self.month_keys, dated_donor, month)
+        days = _grow(self.days, size, 0) + np.bincount(new_days >> _SHIFT, minlength=size)
+        return DonorTable(labels, first, last, days, count, totals, day_keys, month_keys)
+
+    def extend_grouped(self, groups):
+        # Like extend(), from appended rows already grouped per donor and
+        # month (sqlite_backend.donor_months), which also counts the days new
+        # to each donor; day pairs are not kept, so such a table is only ever
+        # extended this way
+        labels, donor, valid = self._slots(groups["donor_name"])
+        groups = groups[valid]
+        first_day = _day_numbers(groups["first_date"])
+        last_day = _day_numbers(groups["last_date"])
+        month = groups["month"].to_numpy(dtype="datetime64[M]").astype(np.int64)
+        dated = first_day != _NO_DAY
+        amount = groups["donation_amount"].to_numpy()
+
+        size = len(labels)
+        first = _grow(self.first, size, _NO_DAY)
+        last = _grow(self.last, size, _NO_LAST)
+        np.minimum.at(first, donor[dated], first_day[dated])
+        np.maximum.at(last, donor[dated], last_day[dated])
+        count = _grow(self.count, size, 0)
+        np.add.at(count, donor, groups["donation_count"].to_numpy(dtype=np.int64))
+        days = _grow(self.days, size, 0)
+        np.add.at(days, donor, groups["new_days"].to_numpy(dtype=np.int64))
+        totals = _grow(self.amount.astype(np.result_type(self.amount, amount)), size, 0)
+        np.add.at(totals, donor, amount)
+
+        month_keys, _ = _merge_keys(self.month_keys, donor[dated], month[dated])
+        return DonorTable(labels, first, last, days, count, totals, self.day_keys, month_keys)
+
+    # ----- per-donor figures -----
+    @property
+    def unique_donors(self):
+        return len(self)
+
+    @property
+    def repeat_donors(self):
+        # Gave on more than one distinct day
+        return int(np.count_nonzero(self.days > 1))
+
+    @property
+    def retention_rate(self):
+        return self.repeat_donors / max(self.unique_donors, 1) * 100
+
+    def frame(self):
+        # One row per donor, alphabetical by name
+        if self._frame is None:
+            seen = np.flatnonzero(self.count)
+            first = _to_dates(self.first[seen], _NO_DAY)
+            frame = pd.DataFrame({
+                "donation_amount": self.amount[seen],
+                "first_date": first,
+                "last_date": _to_dates(self.last[seen], _NO_LAST),
+                "donation_days": self.days[seen],
+                "donation_count": self.count[seen],
+                "cohort": first.to_period("M").astype(str).where(first.notna()),
+            }, index=pd.Index(self.labels[seen], dtype=object, name="donor_name"))
+            self._frame = frame.sort_index()
+        return self._frame
+
+    def top_donors(self, n=10):
+        # Ties go to the alphabetically first name
+        return self.frame()["donation_amount"].nlargest(n).reset_index()
+
+    def lookup(self, names, limit=50):
+        columns = ["donation_amount", "first_date", "last_date"]
+        return (
+            self.frame()[columns]
+            .reindex(names)
+            .dropna(subset=["donation_amount"])
+            .nlargest(limit, "donation_amount")
+            .rename_axis("donor_name")
+            .reset_index()
+        )
+
+    # ----- cohorts -----
+    def cohorts(self):
+        # (cohort month x months since first donation) -> donors active in
+        # that month, for donors grouped by the month of their first donation
+        if self._cohorts is None:
+            donor = self.month_keys >> _SHIFT
+            month = (self.month_keys & _LOW) - _OFFSET
+            first = self.first[donor]
+            dated = first != _NO_DAY
+            donor, month, first = donor[dated], month[dated], first[dated]
+            cohort = first.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+            active = pd.Series(1, index=pd.MultiIndex.from_arrays(
+                [cohort, month - cohort], names=["cohort", "months_since_first"]
+            ))
+            table = active.groupby(level=[0, 1]).sum().unstack(fill_value=0)
+            table = table.reindex(columns=range(int(table.columns.max()) + 1 if len(table.columns) else 0), fill_value=0)
+            table.index = pd.PeriodIndex.from_ordinals(table.index, freq="M").astype(str)
+            table.index.name = "cohort"
+            self._cohorts = table
+        return self._cohorts
+
+    def retention_curves(self):
+        # Share of each cohort (%) still giving N months after its first month
+        cohorts = self.cohorts()
+        if cohorts.empty:
+            return cohorts.astype(float)
+        return cohorts.div(cohorts[0], axis=0) * 100
+
+
+def _factorize(names):
+    # Codes into the labels present in `names` (-1 for missing)
+    if isinstance(names.dtype, pd.CategoricalDtype):
+        codes = names.cat.codes.to_numpy()
+        present = np.zeros(len(names.cat.categories), dtype=bool)
+        present[codes[codes >= 0]] = True
+        used = np.flatnonzero(present)
+        local = np.full(len(present), -1, dtype=np.int64)
+        local[used] = np.arange(len(used))
+        codes = np.where(codes >= 0, local[codes], -1)
+        return codes, pd.Index(names.cat.categories[used], dtype=object)
+    codes, uniques = pd.factorize(names)
+    return codes, pd.Index(uniques, dtype=object)
+
+
+def _grow(values, size, fill):
+    grown = np.full(size, fill, dtype=values.dtype)
+    grown[:len(values)] = values
+    return grown
+
+
+def _merge_keys(keys, donor, number):
+    # Sorted union of existing pair keys with the batch's; also returns the
+    # pairs the batch added
+    batch = np.unique((donor.astype(np.int64) << _SHIFT) | (number + _OFFSET))
+    position = np.searchsorted(keys, batch)
+    seen = position < len(keys)
+    seen[seen] = keys[position[seen]] == batch[seen]
+    new = batch[~seen]
+    return np.insert(keys, position[~seen], new), new
+
+
+def _day_numbers(dates):
+    # "YYYY-MM-DD" strings (None when missing) -> day numbers, _NO_DAY when missing
+    days = dates.to_numpy(dtype="datetime64[D]")
+    return np.where(np.isnat(days), _NO_DAY, days.astype(np.int64))
+
+
+def _to_dates(days, missing):
+    dates = days.astype("datetime64[D]")
+    dates[days == missing] = np.datetime64("NaT")
+    return pd.DatetimeIndex(dates.astype("datetime64[ns]"))
+
+
+# ----------------------------
+# PER-VERSION TABLES
+# ----------------------------
+# Built once per generation, then extended with only the appended rows of
+# each new version, on either backend.
+_cache = VersionCache(name=__name__)
+
+
+def _build(version, latest, extend):
+    old_version, table = latest if latest is not None else (None, None)
+    if table is None or old_version.generation != version.generation or old_version.rows > version.rows:
+        table, start = DonorTable(), 0
+    else:
+        start = old_version.rows
+    return extend(table, start)
+
+
+def get_donor_table(data_dir=DATA_DIR):
+    if BACKEND == "sqlite":
+        # Grouped in SQLite: only one row per donor and month comes back
+        version = dataset_version("donations", data_dir)
+
+        def extend(table, start):
+            return table.extend_grouped(sqlite_backend.donor_months(data_dir, version, start))
+    else:
+        df, version = load_versioned("donations", data_dir)
+
+        def extend(table, start):
+            batch = df.iloc[start:version.rows]
+            return table.extend(batch["donor_name"], batch["date"], batch["donation_amount"])
+
+    return _cache.get_or_build(data_dir, version, lambda: _build(version, _cache.latest(data_dir), extend))
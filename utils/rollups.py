@@ -0,0 +1,178 @@
+import functools
+import os
+
+import pandas as pd
+
+from utils import ingest, sqlite_backend
+from utils.cube import DonationCube
+from utils.data_loader import BACKEND, DATA_DIR, DATASETS, VersionCache, dataset_version, load_versioned
+from utils.interning import plain_index
+from utils.retention import get_donor_table
+from utils.search import matching_labels
+
+# ----------------------------
+# DONATION ROLLUPS
+# ----------------------------
+# Every date, region and project aggregate the Donations page shows, built
+# once per data version and shared by all sessions (per-donor figures live in
+# utils/retention). Pages render from these small tables only and never
+# group the raw donation rows themselves.
+_cache = VersionCache(name=__name__)
+
+
+# Aggregates that can be summed across row batches; everything else in a
+# rollup is derived from these
+_PARTIALS = ("daily", "by_region", "by_project", "month_region", "daily_region", "daily_project", "cells")
+
+
+def _aggregate(df):
+    amount = df["donation_amount"]
+    month = df["date"].dt.to_period("M").astype(str).rename("month")
+
+    # Grouping on the interned codes; results are relabelled with strings
+    daily = amount.groupby(df["date"]).sum()
+    by_region = plain_index(amount.groupby(df["region"], observed=True).sum())
+    by_project = plain_index(amount.groupby(df["project"], observed=True).sum())
+    month_region = plain_index(amount.groupby([df["region"], month], observed=True).sum())
+    daily_region = plain_index(amount.groupby([df["date"], df["region"]], observed=True).sum())
+    daily_project = plain_index(amount.groupby([df["date"], df["project"]], observed=True).sum())
+    # Amount and row count per (date, region, project): the filter cube
+    cells = plain_index(
+        amount.groupby([df["date"], df["region"], df["project"]], observed=True).agg(["sum", "size"])
+        .set_axis(["donation_amount", "count"], axis=1)
+    )
+    return {
+        "total": amount.sum(),
+        "count": len(df),
+        "daily": daily,
+        "by_region": by_region,
+        "by_project": by_project,
+        "month_region": month_region,
+        "daily_region": daily_region,
+        "daily_project": daily_project,
+        "cells": cells,
+    }
+
+
+# A cold parse of a large file aggregates each chunk in the worker that
+# parsed it; the full build then only merges the chunk results
+ingest.CHUNK_AGGREGATES["donations"] = _aggregate
+
+
+def _combine(a, b):
+    levels = list(range(a.index.nlevels))
+    return pd.concat([a, b]).groupby(level=levels).sum()
+
+
+def merge_rollups(old, new):
+    merged = {
+        "total": old["total"] + new["total"],
+        "count": old["count"] + new["count"],
+    }
+    for key in _PARTIALS:
+        merged[key] = _combine(old[key], new[key])
+    return merged
+
+
+def build_donation_rollups(df):
+    return _derive(_aggregate(df))
+
+
+def _derive(r):
+    daily = r["daily"]
+
+    r["daily_df"] = daily.rename_axis("date").reset_index(name="donation_amount")
+    r["monthly_df"] = (
+        daily.groupby(daily.index.to_period("M").astype(str))
+        .sum()
+        .rename_axis("date")
+        .reset_index(name="donation_amount")
+    )
+    r["month_region_pivot"] = r["month_region"].unstack("month")
+    # Dates x groups, one column per region/project, for per-group spike detection
+    r["daily_by_region"] = r["daily_region"].unstack(fill_value=0)
+    r["daily_by_project"] = r["daily_project"].unstack(fill_value=0)
+    r["region_df"] = r["by_region"].rename_axis("region").reset_index(name="donation_amount")
+    r["project_df"] = r["by_project"].rename_axis("project").reset_index(name="donation_amount")
+    r["top_days_df"] = r["daily_df"].nlargest(10, "donation_amount")
+    r["mean"] = r["total"] / r["count"] if r["count"] else 0.0
+    r["top_region"] = r["by_region"].idxmax() if len(r["by_region"]) else "-"
+    r["top_project"] = r["by_project"].idxmax() if len(r["by_project"]) else "-"
+    if "cells" in r:
+        r["cube"] = DonationCube(r["cells"])
+    return r
+
+
+def filter_rollups(rollups, start=None, end=None, regions=None, projects=None):
+    # The same tables for the donations dated start..end (inclusive) in the
+    # given regions and projects (None or empty: all), read off the cube
+    return _derive(rollups["cube"].partials(start, end, regions, projects))
+
+
+def _build(df, version, latest, path=None):
+    old_version, old = latest if latest is not None else (None, None)
+    if (
+        old is not None
+        and old_version.generation == version.generation
+        and old_version.rows <= version.rows
+    ):
+        # Appended rows only: aggregate the new tail and fold it in
+        tail = df.iloc[old_version.rows:version.rows]
+        rollups = _derive(merge_rollups(old, _aggregate(tail)))
+        # (rows after the append, earliest date it touched), so consumers
+        # that skipped versions know how far back the totals changed
+        rollups["append_log"] = old["append_log"] + ((version.rows, tail["date"].min()),)
+    else:
+        chunks = ingest.take_chunk_aggregates(path, version[2:]) if path is not None else None
+        if chunks:
+            rollups = _derive(functools.reduce(merge_rollups, chunks))
+        else:
+            rollups = build_donation_rollups(df)
+        rollups["append_log"] = ()
+    rollups["version"] = version
+    return rollups
+
+
+def _build_sqlite(data_dir, version, latest):
+    # Same rollups, with the group-bys pushed down to SQLite; appended rows
+    # are aggregated on their own and folded in as in _build
+    old_version, old = latest if latest is not None else (None, None)
+    incremental = (
+        old is not None
+        and old_version.generation == version.generation
+        and old_version.rows <= version.rows
+    )
+    r = sqlite_backend.donation_partials(data_dir, version, old_version.rows if incremental else 0)
+    first_date = r.pop("first_date")
+    if incremental:
+        r["total"] += old["total"]
+        r["count"] += old["count"]
+        for key in _PARTIALS:
+            r[key] = _combine(old[key], r[key])
+        appended = ((version.rows, first_date),) if first_date is not None else ()
+        r["append_log"] = old["append_log"] + appended
+    else:
+        r["append_log"] = ()
+    rollups = _derive(r)
+    rollups["version"] = version
+    return rollups
+
+
+def get_donation_rollups(data_dir=DATA_DIR):
+    if BACKEND == "sqlite":
+        version = dataset_version("donations", data_dir)
+        return _cache.get_or_build(
+            data_dir, version, lambda: _build_sqlite(data_dir, version, _cache.latest(data_dir))
+        )
+    df, version = load_versioned("donations", data_dir)
+    path = os.path.join(data_dir, DATASETS["donations"])
+    return _cache.get_or_build(data_dir, version, lambda: _build(df, version, _cache.latest(data_dir), path))
+
+
+def find_donors(keyword, limit=50, data_dir=DATA_DIR):
+    # Donors whose name contains `keyword`, largest totals first
+    if BACKEND == "sqlite":
+        version = dataset_version("donations", data_dir)
+        return sqlite_backend.find_donors(data_dir, version, keyword, limit)
+    donors = get_donor_table(data_dir)
+    return donors.lookup(matching_labels("donations", "donor_name", keyword, data_dir), limit)
@@ -0,0 +1,121 @@
+import numpy as np
+
+from utils.data_loader import DATA_DIR, VersionCache, load_versioned
+from utils.interning import observed_codes
+
+# Code points fit in 21 bits, so a trigram packs into one uint64
+_BASE = 1 << 21
+
+
+# ----------------------------
+# N-GRAM NAME INDEX
+# ----------------------------
+# Built over the distinct names present in a coded column, not over its rows
+# (nor over dictionary entries only other frames use). Queries return
+# dictionary codes; the row-level inverted index in utils/query turns those
+# into row positions.
+class SearchIndex:
+    def __init__(self, values):
+        self.codes = observed_codes(values)
+        self.labels = [str(label).lower() for label in values.cat.categories[self.codes]]
+        self._build_trigrams()
+
+    def _build_trigrams(self):
+        lengths = np.fromiter(map(len, self.labels), dtype=np.int64, count=len(self.labels))
+        text = np.frombuffer("".join(self.labels).encode("utf-32-le"), dtype=np.uint32)
+        text = text.astype(np.uint64)
+        ends = np.cumsum(lengths)
+        owner = np.repeat(np.arange(len(self.labels), dtype=np.int32), lengths)
+
+        # Trigram starting at each position, kept only if it ends inside its label
+        starts = np.arange(max(len(text) - 2, 0))
+        starts = starts[starts + 3 <= ends[owner[starts]]]
+        keys = (text[starts] * _BASE + text[starts + 1]) * _BASE + text[starts + 2]
+        owners = owner[starts]
+
+        # Posting lists in CSR form: sorted distinct keys, each with the sorted
+        # distinct positions of the labels containing it
+        order = np.lexsort((owners, keys))
+        keys, owners = keys[order], owners[order]
+        distinct = np.ones(len(keys), dtype=bool)
+        distinct[1:] = (keys[1:] != keys[:-1]) | (owners[1:] != owners[:-1])
+        keys, owners = keys[distinct], owners[distinct]
+
+        self._keys, first = np.unique(keys, return_index=True)
+        self._offsets = np.append(first, len(keys))
+        self._owners = owners
+        self._short = np.flatnonzero(lengths < 3).astype(np.int32)
+
+    def _posting(self, i):
+        return self._owners[self._offsets[i]:self._offsets[i + 1]]
+
+    def _union(self, key_positions):
+        if len(key_positions) == 0:
+            return np.empty(0, dtype=np.int32)
+        return np.unique(np.concatenate([self._posting(i) for i in key_positions]))
+
+    def substring(self, keyword):
+        # Sorted codes of the names containing `keyword`, ignoring case
+        return self.codes[self._positions(keyword.lower())]
+
+    def _positions(self, keyword):
+        # Positions into self.labels, in order
+        if not keyword:
+            return np.arange(len(self.labels), dtype=np.int32)
+
+        points = [ord(ch) for ch in keyword]
+        if len(points) >= 3:
+            grams = np.asarray([
+                (points[i] * _BASE + points[i + 1]) * _BASE + points[i + 2]
+                for i in range(len(points) - 2)
+            ], dtype=np.uint64)
+            if len(self._keys) == 0:
+                return np.empty(0, dtype=np.int32)
+            found = np.minimum(np.searchsorted(self._keys, grams), len(self._keys) - 1)
+            if np.any(self._keys[found] != grams):
+                return np.empty(0, dtype=np.int32)
+            postings = sorted((self._posting(i) for i in found), key=len)
+            positions = postings[0]
+            for other in postings[1:]:
+                # Membership by binary search: cost follows the (shrinking)
+                # candidate list, not the longer posting
+                at = np.minimum(np.searchsorted(other, positions), len(other) - 1)
+                positions = positions[other[at] == positions]
+            if len(points) > 3:
+                # Trigrams all present does not mean they are adjacent
+                positions = np.asarray([p for p in positions if keyword in self.labels[p]], dtype=np.int32)
+            return positions
+
+        # One or two characters: every label of length >= 3 containing them has
+        # a trigram that starts or ends with them
+        if len(points) == 2:
+            pair = points[0] * _BASE + points[1]
+            hits = (self._keys // _BASE == pair) | (self._keys % (_BASE * _BASE) == pair)
+        else:
+            c = points[0]
+            hits = (
+                (self._keys // (_BASE * _BASE) == c)
+                | ((self._keys // _BASE) % _BASE == c)
+                | (self._keys % _BASE == c)
+            )
+        positions = self._union(np.flatnonzero(hits))
+        short = [p for p in self._short if keyword in self.labels[p]]
+        if short:
+            positions = np.union1d(positions, np.asarray(short, dtype=np.int32))
+        return positions
+
+
+_cache = VersionCache(name=__name__)
+
+
+def get_search_index(name, column, data_dir=DATA_DIR):
+    df, version = load_versioned(name, data_dir)
+    return _cache.get_or_build(
+        (name, column, data_dir), version, lambda: SearchIndex(df[column])
+    )
+
+
+def matching_labels(name, column, keyword, data_dir=DATA_DIR):
+    df, _ = load_versioned(name, data_dir)
+    codes = get_search_index(name, column, data_dir).substring(keyword)
+    return df[column].cat.categories[codes]
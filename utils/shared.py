@@ -0,0 +1,237 @@
+import fcntl
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+
+import pyarrow as pa
+
+from utils import data_loader
+from utils.data_loader import DATA_DIR, DataVersion
+from utils.storage import SNAPSHOT_DIR
+
+# Where published versions live. Defaults to <data dir>/.snapshots/shared;
+# point it at a tmpfs such as /dev/shm/dashboard to keep them off disk.
+SHARED_DIR_ENV = "DASHBOARD_SHARED_DIR"
+
+MANIFEST = "manifest.json"
+LOCK_FILE = "publisher.lock"
+
+# How long a worker waits for the first manifest before giving up
+WAIT_SECONDS = 60
+
+
+# ----------------------------
+# SHARED DIRECTORY LAYOUT
+# ----------------------------
+# One publisher process per data dir loads the CSVs, writes every new dataset
+# version as an uncompressed Arrow IPC file and then swaps in a manifest
+# naming the current files. Workers memory-map those files: the pages of a
+# version are held once by the OS page cache and shared by every process,
+# and nothing is parsed or copied per worker.
+def shared_dir(data_dir=DATA_DIR):
+    root = os.environ.get(SHARED_DIR_ENV)
+    if not root:
+        return os.path.join(data_dir, SNAPSHOT_DIR, "shared")
+    digest = hashlib.sha1(os.path.abspath(data_dir).encode()).hexdigest()[:12]
+    return os.path.join(root, digest)
+
+
+def _version_file(name, version):
+    return f"{name}-g{version.generation}-r{version.rows}.arrow"
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def write_atomic(path, write):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+# ----------------------------
+# PUBLISHER
+# ----------------------------
+_locks = {}
+_locks_guard = threading.Lock()
+
+
+def claim_publisher(data_dir=DATA_DIR, block=False):
+    # True if this process is (now) the publisher for data_dir. The flock is
+    # held until the process exits, when another process can take over; a
+    # new publisher numbers its loads past every generation already published,
+    # so a version never names two different sets of rows.
+    with _locks_guard:
+        if data_dir not in _locks:
+            directory = shared_dir(data_dir)
+            os.makedirs(directory, exist_ok=True)
+            _locks[data_dir] = [open(os.path.join(directory, LOCK_FILE), "a"), False]
+        lock = _locks[data_dir]
+        if not lock[1]:
+            try:
+                fcntl.flock(lock[0], fcntl.LOCK_EX | (0 if block else fcntl.LOCK_NB))
+            except BlockingIOError:
+                return False
+            lock[1] = True
+            manifest = _read_manifest(shared_dir(data_dir)) or {"datasets": {}}
+            data_loader.skip_generations(max((r["generation"] for r in manifest["datasets"].values()), default=0))
+        return lock[1]
+
+
+def write_table(path, df):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    def write(tmp_path):
+        with pa.OSFile(tmp_path, "wb") as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+
+    write_atomic(path, write)
+
+
+def publish(data_dir, entries):
+    # Write the versions not published yet, then swap the manifest
+    directory = shared_dir(data_dir)
+    os.makedirs(directory, exist_ok=True)
+    previous = _read_manifest(directory) or {"datasets": {}}
+
+    datasets = {}
+    for name, entry in entries.items():
+        record = {"file": _version_file(name, entry.version), **entry.version._asdict()}
+        if previous["datasets"].get(name) != record:
+            write_table(os.path.join(directory, record["file"]), entry.df)
+        datasets[name] = record
+
+    manifest = {"published": time.time(), "datasets": datasets}
+
+    def write(tmp_path):
+        with open(tmp_path, "w") as f:
+            json.dump(manifest, f)
+
+    write_atomic(os.path.join(directory, MANIFEST), write)
+    _prune(directory, previous, manifest)
+    return manifest
+
+
+def _prune(directory, previous, manifest):
+    # Files named by the current or previous manifest stay: a worker may have
+    # read the previous one and not opened its files yet. Workers that already
+    # mapped a pruned file keep reading it until they let go.
+    keep = {r["file"] for m in (previous, manifest) for r in m["datasets"].values()}
+    for filename in os.listdir(directory):
+        if filename.endswith(".arrow") and filename not in keep:
+            try:
+                os.remove(os.path.join(directory, filename))
+            except FileNotFoundError:
+                pass
+
+
+# ----------------------------
+# WORKERS
+# ----------------------------
+# A rerun stats the manifest, and maps a dataset's file the first time its
+# version is seen. The frames' columns point straight into the mapping, so
+# they are read-only like every other served frame.
+_manifests = {}
+_attached = {}
+_attach_lock = threading.Lock()
+
+
+def _manifest_key(directory):
+    stat = os.stat(os.path.join(directory, MANIFEST))
+    return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+
+def _current_manifest(data_dir):
+    directory = shared_dir(data_dir)
+    try:
+        key = _manifest_key(directory)
+    except FileNotFoundError:
+        raise FileNotFoundError(
+            f"No shared datasets published for {data_dir!r} yet; run the app with "
+            f"the refresher on, or `python -m utils.shared {data_dir}`"
+        ) from None
+    cached = _manifests.get(data_dir)
+    if cached is None or cached[0] != key:
+        manifest = _read_manifest(directory)
+        cached = (key, manifest)
+        _manifests[data_dir] = cached
+    return cached[1]
+
+
+def map_frame(path):
+    table = pa.ipc.open_file(pa.memory_map(path, "r")).read_all()
+    # split_blocks keeps each column on its own buffer instead of
+    # consolidating same-typed columns into a freshly allocated block. The
+    # only per-worker copies are the dictionaries' strings, which are unique
+    # already, so they are converted without a deduplication table.
+    return table.to_pandas(split_blocks=True, deduplicate_objects=False)
+
+
+def attach(name, data_dir=DATA_DIR):
+    for attempt in range(2):
+        record = _current_manifest(data_dir)["datasets"][name]
+        version = DataVersion(*(record[field] for field in DataVersion._fields))
+        path = os.path.join(shared_dir(data_dir), record["file"])
+
+        attached = _attached.get((data_dir, name))
+        if attached is not None and attached[1] == version:
+            return attached
+        with _attach_lock:
+            attached = _attached.get((data_dir, name))
+            if attached is not None and attached[1] == version:
+                return attached
+            try:
+                attached = (map_frame(path), version)
+            except FileNotFoundError:
+                # Pruned between reading the manifest and opening the file
+                _manifests.pop(data_dir, None)
+                if attempt:
+                    raise
+                continue
+            _attached[(data_dir, name)] = attached
+            return attached
+
+
+def wait_for_manifest(data_dir=DATA_DIR, timeout=WAIT_SECONDS):
+    deadline = time.monotonic() + (timeout if timeout is not None else WAIT_SECONDS)
+    path = os.path.join(shared_dir(data_dir), MANIFEST)
+    while not os.path.exists(path):
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+# ----------------------------
+# DEDICATED LOADER
+# ----------------------------
+# With DASHBOARD_WATCH=0 no worker elects itself; run the publisher on its own:
+#   DASHBOARD_BACKEND=shared python -m utils.shared data
+def main(argv=None):
+    from utils.refresher import Refresher
+
+    argv = sys.argv[1:] if argv is None else argv
+    data_dir = argv[0] if argv else DATA_DIR
+    print(f"Waiting to become the publisher for {data_dir}...", flush=True)
+    claim_publisher(data_dir, block=True)
+    refresher = Refresher(data_dir).start()
+    refresher.ready.wait()
+    print(f"Publishing {data_dir} to {shared_dir(data_dir)}", flush=True)
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        refresher.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+import copy
+import os
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from utils import sqlite_backend
+from utils.data_loader import BACKEND, DATA_DIR, VersionCache, dataset_version, load_versioned
+
+# HyperLogLog registers per bucket are 2**PRECISION; a distinct count's
+# relative standard error is 1.04 / sqrt(2**PRECISION)
+PRECISION = int(os.environ.get("DASHBOARD_HLL_PRECISION", 12))
+
+# Heaviest items each bucket's Space-Saving summary keeps
+TOP_K = int(os.environ.get("DASHBOARD_SKETCH_TOP_K", 32))
+
+# Per dataset: the item counted and ranked, the value it is ranked by, and
+# the columns a bucket is keyed on
+SKETCHED = {
+    "donations": {"item": "donor_name", "value": "donation_amount", "dims": ("date", "region", "project")},
+    "volunteers": {"item": "volunteer_name", "value": "hours_contributed", "dims": ("region", "project")},
+}
+
+# A bucket key packs one coordinate per dim into an int64; day numbers are
+# offset so dates before 1970 stay positive
+_BITS = 21
+_MASK = (1 << _BITS) - 1
+_DAY_OFFSET = 1 << (_BITS - 1)
+
+
+class Estimate(NamedTuple):
+    value: float
+    # Half-width of the ~95% interval (two standard errors)
+    error: float
+
+
+# ----------------------------
+# BUCKETED SKETCHES
+# ----------------------------
+# Rows are bucketed by their dims (day x region x project for donations).
+# Each bucket holds a HyperLogLog of the items seen in it, kept sparse as
+# (bucket, register) -> rank, and a Space-Saving summary of its TOP_K
+# heaviest items: a lower bound and an error per item, plus a threshold no
+# unlisted item can exceed. Both merge, so any slice of buckets -- a date
+# range, some regions, some projects -- is answered by merging its buckets
+# instead of scanning rows. extend() folds in a batch of appended rows and
+# returns new sketches; sketches are never modified once built.
+class Sketches:
+    def __init__(self, item, value, dims, precision=PRECISION, top_k=TOP_K):
+        empty = np.zeros(0, dtype=np.int64)
+        self.item, self.value, self.dims = item, value, dims
+        self.precision, self.top_k = precision, top_k
+        self.items = pd.Index([], dtype=object)
+        self.labels = {dim: pd.Index([], dtype=object) for dim in dims if dim != "date"}
+        # Register and rank of each item's hash
+        self.item_register, self.item_rank = empty, np.zeros(0, dtype=np.uint8)
+        # Sorted bucket keys; everything below refers to buckets by position
+        self.buckets = empty
+        self.hll_keys, self.hll_ranks = empty, np.zeros(0, dtype=np.uint8)
+        self.ss_bucket, self.ss_item = empty, empty
+        self.ss_value, self.ss_error = np.zeros(0), np.zeros(0)
+        self.threshold = np.zeros(0)
+
+    def extend(self, batch):
+        if not len(batch):
+            return self
+        new = copy.copy(self)
+
+        item, new.items, added = _code(batch[self.item], self.items)
+        register, rank = _hll_slots(added, self.precision)
+        new.item_register = np.concatenate([self.item_register, register])
+        new.item_rank = np.concatenate([self.item_rank, rank])
+
+        valid = item >= 0
+        coords = []
+        new.labels = dict(self.labels)
+        for dim in self.dims:
+            if dim == "date":
+                stamps = batch[dim].to_numpy()
+                valid &= ~np.isnat(stamps)
+                coords.append(np.where(valid, stamps.astype("datetime64[D]").astype(np.int64), 0) + _DAY_OFFSET)
+            else:
+                codes, new.labels[dim], _ = _code(batch[dim], self.labels[dim])
+                valid &= codes >= 0
+                coords.append(codes)
+        keys = _pack([c[valid] for c in coords])
+        item = item[valid]
+        values = batch[self.value].to_numpy(dtype=float, na_value=0.0)[valid]
+
+        # Buckets the batch adds move existing ones to new positions; only the
+        # buckets it touches are merged, the rest carry over as they are
+        batch_buckets, row_bucket = np.unique(keys, return_inverse=True)
+        new.buckets = np.union1d(self.buckets, batch_buckets)
+        moved = np.searchsorted(new.buckets, self.buckets)
+        row_bucket = np.searchsorted(new.buckets, batch_buckets)[row_bucket]
+        touched = np.zeros(len(new.buckets), dtype=bool)
+        touched[row_bucket] = True
+
+        # The batch's exact sums per (bucket, item)
+        n_items = len(new.items)
+        pairs, inverse = np.unique(row_bucket * n_items + item, return_inverse=True)
+        sums = np.bincount(inverse, weights=values, minlength=len(pairs))
+        pair_bucket, pair_item = pairs // n_items, pairs % n_items
+
+        # HyperLogLog: the highest rank per (bucket, register)
+        p = self.precision
+        old_bucket = moved[self.hll_keys >> p]
+        old_keys = (old_bucket << p) | (self.hll_keys & ((1 << p) - 1))
+        hit = touched[old_bucket]
+        keys = np.concatenate([old_keys[hit], (pair_bucket << p) | new.item_register[pair_item]])
+        ranks = np.concatenate([self.hll_ranks[hit], new.item_rank[pair_item]])
+        order = np.lexsort((ranks, keys))
+        keys, ranks = keys[order], ranks[order]
+        last = np.r_[keys[1:] != keys[:-1], True]
+        new.hll_keys = np.concatenate([old_keys[~hit], keys[last]])
+        new.hll_ranks = np.concatenate([self.hll_ranks[~hit], ranks[last]])
+
+        # Space-Saving: the batch's sums merged into the touched summaries
+        old_bucket = moved[self.ss_bucket]
+        hit = touched[old_bucket]
+        old_threshold = np.zeros(len(new.buckets))
+        old_threshold[moved] = self.threshold
+        merged, new.threshold = _merge(
+            [
+                (old_bucket[hit], self.ss_item[hit], self.ss_value[hit], self.ss_error[hit]),
+                (pair_bucket, pair_item, sums, np.zeros(len(pairs))),
+            ],
+            [old_threshold, np.zeros(len(new.buckets))],
+            n_items, self.top_k,
+        )
+        kept = (old_bucket[~hit], self.ss_item[~hit], self.ss_value[~hit], self.ss_error[~hit])
+        new.ss_bucket, new.ss_item, new.ss_value, new.ss_error = (
+            np.concatenate([old, part]) for old, part in zip(kept, merged)
+        )
+        return new
+
+    # ----- slices -----
+    def _selected(self, start=None, end=None, regions=None, projects=None):
+        # Buckets inside the slice (None or empty: no restriction)
+        chosen = {"region": regions, "project": projects}
+        selected = np.ones(len(self.buckets), dtype=bool)
+        for dim, coord in zip(self.dims, _unpack(self.buckets, len(self.dims))):
+            if dim == "date":
+                if start is not None:
+                    selected &= coord >= _day(start) + _DAY_OFFSET
+                if end is not None:
+                    selected &= coord <= _day(end) + _DAY_OFFSET
+            elif chosen.get(dim):
+                codes = self.labels[dim].get_indexer(chosen[dim])
+                selected &= np.isin(coord, codes[codes >= 0])
+        return selected
+
+    def distinct(self, start=None, end=None, regions=None, projects=None):
+        # Distinct items in the slice: the buckets' registers merged by max
+        selected = self._selected(start, end, regions, projects)
+        p = self.precision
+        take = selected[self.hll_keys >> p]
+        registers = np.zeros(1 << p, dtype=np.uint8)
+        np.maximum.at(registers, self.hll_keys[take] & ((1 << p) - 1), self.hll_ranks[take])
+        value = _hll_estimate(registers)
+        return Estimate(float(value), float(value * 2 * 1.04 / np.sqrt(1 << p)))
+
+    def top(self, n=10, start=None, end=None, regions=None, projects=None):
+        # The n heaviest items in the slice, largest lower bound first (ties
+        # alphabetically), with how much more each could have: its errors in
+        # the buckets listing it plus the thresholds of those that do not
+        selected = self._selected(start, end, regions, projects)
+        take = selected[self.ss_bucket]
+        item = self.ss_item[take]
+        size = len(self.items)
+        value = np.bincount(item, self.ss_value[take], size)
+        listed = np.bincount(item, self.threshold[self.ss_bucket[take]], size)
+        error = np.bincount(item, self.ss_error[take], size) + self.threshold[selected].sum() - listed
+        seen = np.flatnonzero(np.bincount(item, minlength=size))
+        if len(seen) > n:
+            # Only candidates that can make the top n (ties included) are sorted
+            cutoff = np.partition(value[seen], len(seen) - n)[len(seen) - n]
+            seen = seen[value[seen] >= cutoff]
+        frame = pd.DataFrame({
+            self.item: self.items[seen],
+            self.value: value[seen],
+            "error": np.maximum(error[seen], 0.0),
+        })
+        return frame.sort_values([self.value, self.item], ascending=[False, True], kind="stable").head(n).reset_index(drop=True)
+
+    def unlisted_bound(self, start=None, end=None, regions=None, projects=None):
+        # Most any item missing from every selected summary can have
+        return float(self.threshold[self._selected(start, end, regions, projects)].sum())
+
+
+def _code(values, labels):
+    # Codes into `labels` grown by the batch's new labels (-1 for missing)
+    codes, uniques = pd.factorize(values)
+    uniques = pd.Index(np.asarray(uniques, dtype=object), dtype=object)
+    mapping = labels.get_indexer(uniques)
+    new = mapping == -1
+    grown = labels.append(uniques[new]) if new.any() else labels
+    mapping[new] = np.arange(len(labels), len(grown))
+    return np.where(codes >= 0, mapping[codes], -1), grown, uniques[new]
+
+
+def _pack(coords):
+    keys = np.zeros(len(coords[0]) if coords else 0, dtype=np.int64)
+    for coord in coords:
+        keys = (keys << _BITS) | coord.astype(np.int64)
+    return keys
+
+
+def _unpack(keys, count):
+    return [(keys >> (_BITS * (count - 1 - i))) & _MASK for i in range(count)]
+
+
+def _day(value):
+    return pd.Timestamp(value).to_datetime64().astype("datetime64[D]").astype(np.int64)
+
+
+# ----------------------------
+# HYPERLOGLOG
+# ----------------------------
+def _bit_length(values):
+    length = np.zeros(len(values), dtype=np.int64)
+    values = values.copy()
+    for shift in (32, 16, 8, 4, 2, 1):
+        big = values >= np.uint64(1 << shift)
+        length[big] += shift
+        values[big] >>= np.uint64(shift)
+    return length + (values > 0)
+
+
+def _hll_slots(labels, precision):
+    # Register (top `precision` bits of the label's hash) and rank (leading
+    # zeros of the remaining bits, plus one)
+    hashes = pd.util.hash_array(labels.to_numpy(dtype=object))
+    rest_bits = 64 - precision
+    register = (hashes >> np.uint64(rest_bits)).astype(np.int64)
+    rank = rest_bits - _bit_length(hashes & np.uint64((1 << rest_bits) - 1)) + 1
+    return register, rank.astype(np.uint8)
+
+
+def _hll_estimate(registers):
+    m = len(registers)
+    alpha = 0.7213 / (1 + 1.079 / m)
+    raw = alpha * m * m / np.ldexp(1.0, -registers.astype(np.int64)).sum()
+    zeros = np.count_nonzero(registers == 0)
+    if raw <= 2.5 * m and zeros:
+        # Small cardinalities: linear counting over the empty registers
+        return m * np.log(m / zeros)
+    return raw
+
+
+# ----------------------------
+# SPACE-SAVING
+# ----------------------------
+def _merge(parts, thresholds, n_items, k):
+    # parts: (bucket, item, lower bound, error) entries; thresholds: each
+    # part's bound per bucket for items it does not list. An item's merged
+    # error gains the threshold of every part that does not list it
+    bucket, item, value, error = (np.concatenate(arrays) for arrays in zip(*parts))
+    side = np.concatenate([t[part[0]] for part, t in zip(parts, thresholds)])
+    pairs, inverse = np.unique(bucket * n_items + item, return_inverse=True)
+    total = np.sum(thresholds, axis=0)
+    bucket, item = pairs // n_items, pairs % n_items
+    value = np.bincount(inverse, value, len(pairs))
+    error = np.bincount(inverse, error, len(pairs)) + total[bucket] - np.bincount(inverse, side, len(pairs))
+
+    # Keep the k largest per bucket; the dropped raise its threshold
+    order = np.lexsort((-value, bucket))
+    bucket, item, value, error = bucket[order], item[order], value[order], error[order]
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]]) if len(bucket) else np.zeros(0, dtype=np.int64)
+    rank = np.arange(len(bucket)) - np.repeat(starts, np.diff(np.r_[starts, len(bucket)]))
+    keep = rank < k
+    threshold = total.copy()
+    np.maximum.at(threshold, bucket[~keep], (value + error)[~keep])
+    return (bucket[keep], item[keep], value[keep], error[keep]), threshold
+
+
+# ----------------------------
+# PER-VERSION SKETCHES
+# ----------------------------
+# Built on first use (approximate mode is optional), then extended with only
+# the appended rows of each new version, on either backend.
+_cache = VersionCache(name=__name__)
+
+
+def _build(name, version, latest, read):
+    old_version, sketches = latest if latest is not None else (None, None)
+    if sketches is None or old_version.generation != version.generation or old_version.rows > version.rows:
+        sketches, start = Sketches(**SKETCHED[name]), 0
+    else:
+        start = old_version.rows
+    for batch in read(start):
+        sketches = sketches.extend(batch)
+    return sketches
+
+
+def get_sketches(name, data_dir=DATA_DIR):
+    spec = SKETCHED[name]
+    if BACKEND == "sqlite":
+        version = dataset_version(name, data_dir)
+        columns = [spec["item"], spec["value"], *spec["dims"]]
+
+        def read(start):
+            return sqlite_backend.dataset_rows(data_dir, name, version, columns, start)
+    else:
+        df, version = load_versioned(name, data_dir)
+
+        def read(start):
+            return [df.iloc[start:version.rows]]
+
+    key = (name, data_dir)
+    return _cache.get_or_build(key, version, lambda: _build(name, version, _cache.latest(key), read))
@@ -0,0 +1,505 @@
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+
+from utils import storage
+from utils.data_loader import (
+    APPEND_ONLY,
+    DATASETS,
+    DataVersion,
+    _Entry,
+    _file_key,
+    _fingerprint,
+)
+
+DATABASE = "dashboard.sqlite"
+
+# CSV bytes parsed and inserted per batch while ingesting
+BLOCK_BYTES = 1 << 22
+
+# Indexes per table; the pages filter, group and sort on these columns
+INDEXES = {
+    "donations": [("date",), ("region", "date"), ("project", "date"), ("donor_name", "date")],
+    "projects": [("region",), ("status",)],
+    "volunteers": [("region",), ("project",), ("volunteer_name",), ("hours_contributed",)],
+}
+
+# Columns substring-searched from the pages; a lowercased copy is stored next
+# to each (SQLite's lower() only folds ASCII)
+SEARCH_COLUMNS = {
+    "donations": ["donor_name"],
+    "projects": ["project_name"],
+    "volunteers": ["volunteer_name"],
+}
+
+
+# ----------------------------
+# EMBEDDED SQLITE STORE
+# ----------------------------
+# The alternative to keeping every dataset as a DataFrame per process: each
+# CSV is ingested, in batches, into a table in data/.snapshots/dashboard.sqlite
+# and the pages' aggregations and filters run as indexed queries, so only
+# their (small) results come back to pandas.
+#
+# Tables follow the DataVersion contract. A full (re)ingest creates a new
+# table per generation ("donations_g7"); appended rows go to the end of the
+# current one. Every query is bounded by `rowid <= version.rows`, so a
+# version reads the same rows however far ingestion has moved on.
+_entries = {}
+_local = threading.local()
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def database_path(data_dir):
+    return os.path.join(data_dir, storage.SNAPSHOT_DIR, DATABASE)
+
+
+def connect(data_dir):
+    # One connection per thread and database
+    connections = getattr(_local, "connections", None)
+    if connections is None:
+        connections = _local.connections = {}
+    path = database_path(data_dir)
+    conn = connections.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, isolation_level=None, timeout=60)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " name TEXT PRIMARY KEY, generation INTEGER, rows INTEGER,"
+            " mtime_ns INTEGER, size INTEGER, offset INTEGER, fingerprint BLOB)"
+        )
+        connections[path] = conn
+    return conn
+
+
+@contextmanager
+def _transaction(conn):
+    # IMMEDIATE takes the write lock up front, so another process ingesting
+    # the same file waits and then sees its result
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    conn.execute("COMMIT")
+
+
+def _dir_lock(data_dir):
+    with _locks_lock:
+        return _locks.setdefault(data_dir, threading.Lock())
+
+
+def table_name(name, version):
+    return f'"{name}_g{version.generation}"'
+
+
+# ----------------------------
+# INGESTION
+# ----------------------------
+def _rows(name, table):
+    # Arrow batch -> row tuples in table-column order, plus lowercased search
+    # columns at the end
+    table = _decoded(table)
+    columns = []
+    for column in table.column_names:
+        values = table[column]
+        if pa.types.is_timestamp(values.type):
+            values = pc.strftime(values, "%Y-%m-%d")
+        columns.append(values.to_pylist())
+    for column in SEARCH_COLUMNS[name]:
+        columns.append(pc.utf8_lower(table[column]).to_pylist())
+    return zip(*columns)
+
+
+def _decoded(table):
+    # Appended tails arrive dictionary-encoded (storage.read_csv_table)
+    for index, field in enumerate(table.schema):
+        if pa.types.is_dictionary(field.type):
+            table = table.set_column(index, field.name, table[field.name].cast(field.type.value_type))
+    return table
+
+
+def _insert(conn, name, generation, table):
+    columns = table.column_names + [f"{c}_lower" for c in SEARCH_COLUMNS[name]]
+    placeholders = ", ".join("?" * len(columns))
+    conn.executemany(
+        f'INSERT INTO "{name}_g{generation}" ({", ".join(columns)}) VALUES ({placeholders})',
+        _rows(name, table),
+    )
+    return table.num_rows
+
+
+def _full_ingest(conn, name, path, key):
+    generation = conn.execute("SELECT COALESCE(MAX(generation), 0) + 1 FROM sources").fetchone()[0]
+    table = f'"{name}_g{generation}"'
+
+    # Stream the file's complete lines in record batches; it is never held
+    # in memory whole
+    offset = storage.complete_size(path, key[1])
+    source = pa.BufferReader(pa.memory_map(path, "r").read_buffer(offset))
+    reader = csv.open_csv(
+        source,
+        read_options=csv.ReadOptions(block_size=BLOCK_BYTES),
+        convert_options=storage.convert_options(name),
+    )
+    columns = reader.schema.names + [f"{c}_lower" for c in SEARCH_COLUMNS[name]]
+    conn.execute(f"CREATE TABLE {table} ({', '.join(columns)})")
+
+    rows = 0
+    for batch in reader:
+        rows += _insert(conn, name, generation, pa.Table.from_batches([batch]))
+
+    # Indexes are built once the rows are in, which is much faster than
+    # maintaining them row by row
+    for index_columns in INDEXES[name]:
+        conn.execute(
+            f'CREATE INDEX "{name}_g{generation}_{"_".join(index_columns)}"'
+            f" ON {table} ({', '.join(index_columns)})"
+        )
+
+    # Keep the previous generation for readers still on it; drop older ones
+    existing = sorted(
+        int(table.rsplit("_g", 1)[1])
+        for (table,) in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (f"{name}_g[0-9]*",)
+        )
+    )
+    for old_generation in existing[:-2]:
+        conn.execute(f'DROP TABLE "{name}_g{old_generation}"')
+
+    return generation, rows, offset
+
+
+def _append_ingest(conn, name, path, key, source):
+    generation, rows, _, _, offset, fingerprint = source
+    if key[1] <= offset or _fingerprint(path, offset) != fingerprint:
+        return None
+
+    with open(path, "rb") as f:
+        f.seek(offset)
+        tail = f.read(key[1] - offset)
+    end = tail.rfind(b"\n") + 1
+    if end == 0:
+        # Nothing new but the start of a line: keep the rows until it ends
+        return generation, rows, offset
+
+    column_names = [
+        row[1] for row in conn.execute(f'PRAGMA table_info("{name}_g{generation}")')
+        if not row[1].endswith("_lower")
+    ]
+    table = storage.read_csv_table(name, pa.BufferReader(tail[:end]), column_names=column_names)
+    rows += _insert(conn, name, generation, table)
+    return generation, rows, offset + end
+
+
+def sync(name, data_dir):
+    # Bring the table up to date with the CSV and return its DataVersion
+    path = os.path.join(data_dir, DATASETS[name])
+    key = _file_key(path)
+    entry = _entries.get((data_dir, name))
+    if entry is not None and entry.key == key:
+        return entry.version
+
+    with _dir_lock(data_dir):
+        conn = connect(data_dir)
+        with _transaction(conn):
+            key = _file_key(path)
+            source = conn.execute(
+                "SELECT generation, rows, mtime_ns, size, offset, fingerprint FROM sources WHERE name = ?",
+                (name,),
+            ).fetchone()
+
+            if source is not None and tuple(source[2:4]) == key:
+                generation, rows, _, _, offset, _ = source
+            else:
+                result = None
+                if source is not None and name in APPEND_ONLY:
+                    result = _append_ingest(conn, name, path, key, source)
+                if result is None:
+                    result = _full_ingest(conn, name, path, key)
+                generation, rows, offset = result
+                conn.execute(
+                    "INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (name, generation, rows, *key, offset, _fingerprint(path, offset)),
+                )
+
+        version = DataVersion(generation, rows, *key)
+        entry = _Entry(key, None, version, offset, None)
+        _entries[(data_dir, name)] = entry
+        return version
+
+
+def entries(data_dir):
+    return {
+        name: entry for (entry_dir, name), entry in _entries.items() if entry_dir == data_dir
+    }
+
+
+# ----------------------------
+# QUERIES
+# ----------------------------
+def read_sql(data_dir, name, version, sql, params=()):
+    # `sql` selects FROM {table} and may add conditions after WHERE {bound}
+    sql = sql.format(table=table_name(name, version), bound="rowid <= ?")
+    return pd.read_sql_query(sql, connect(data_dir), params=(version.rows, *params))
+
+
+def _series(frame, index, value):
+    return frame.set_index(index)[value]
+
+
+def donation_partials(data_dir, version, start=0):
+    # The summable rollup partials over rows (start, version.rows]
+    def query(group, columns=None):
+        # Rows missing a group key are left out, as pandas' groupby drops NaN keys
+        columns = columns or group
+        present = " AND ".join(f"{key.strip()} IS NOT NULL" for key in group.split(","))
+        return read_sql(
+            data_dir, "donations", version,
+            f"SELECT {columns}, SUM(donation_amount) AS donation_amount FROM {{table}}"
+            f" WHERE {{bound}} AND rowid > ? AND {present} GROUP BY {group} ORDER BY {group}",
+            (start,),
+        )
+
+    totals = read_sql(
+        data_dir, "donations", version,
+        "SELECT COALESCE(SUM(donation_amount), 0) AS total, COUNT(*) AS count, MIN(date) AS first_date"
+        " FROM {table} WHERE {bound} AND rowid > ?",
+        (start,),
+    ).iloc[0]
+
+    daily = query("date")
+    daily["date"] = pd.to_datetime(daily["date"])
+    month_region = query("region, month", "region, substr(date, 1, 7) AS month")
+    daily_region = query("date, region")
+    daily_project = query("date, project")
+    cells = query("date, region, project", "date, region, project, COUNT(*) AS count")
+    for frame in (daily_region, daily_project, cells):
+        frame["date"] = pd.to_datetime(frame["date"])
+
+    return {
+        "total": totals["total"],
+        "count": int(totals["count"]),
+        "first_date": pd.Timestamp(totals["first_date"]) if totals["first_date"] else None,
+        "daily": _series(daily, "date", "donation_amount"),
+        "by_region": _series(query("region"), "region", "donation_amount"),
+        "by_project": _series(query("project"), "project", "donation_amount"),
+        "month_region": _series(month_region, ["region", "month"], "donation_amount"),
+        "daily_region": _series(daily_region, ["date", "region"], "donation_amount"),
+        "daily_project": _series(daily_project, ["date", "project"], "donation_amount"),
+        "cells": _series(cells, ["date", "region", "project"], ["donation_amount", "count"]),
+    }
+
+
+def dataset_rows(data_dir, name, version, columns, start=0, block=250_000):
+    # `columns` of rows (start, version.rows], in rowid blocks
+    for low in range(start, version.rows, block):
+        frame = read_sql(
+            data_dir, name, version,
+            f"SELECT {', '.join(columns)} FROM {{table}}"
+            " WHERE {bound} AND rowid > ? AND rowid <= ? ORDER BY rowid",
+            (low, low + block),
+        )
+        if "date" in frame:
+            frame["date"] = pd.to_datetime(frame["date"])
+        yield frame
+
+
+def donor_months(data_dir, version, start=0):
+    # Rows (start, version.rows] grouped per donor and month: first/last date,
+    # donation count and amount, and the dates no earlier row of the donor has
+    # (index on donor_name, date). Rows without a date form a NULL month.
+    new_days = "COUNT(DISTINCT date)"
+    params = (start,)
+    if start:
+        new_days = (
+            "COUNT(DISTINCT CASE WHEN NOT EXISTS (SELECT 1 FROM {table} AS old"
+            " WHERE old.donor_name = batch.donor_name AND old.date = batch.date AND old.rowid <= ?)"
+            " THEN date END)"
+        )
+        params = (start, start)
+    return read_sql(
+        data_dir, "donations", version,
+        "WITH batch AS (SELECT donor_name, date, donation_amount FROM {table}"
+        " WHERE {bound} AND rowid > ? AND donor_name IS NOT NULL)"
+        " SELECT donor_name, substr(date, 1, 7) AS month, MIN(date) AS first_date, MAX(date) AS last_date,"
+        f" {new_days} AS new_days, COUNT(*) AS donation_count,"
+        " COALESCE(SUM(donation_amount), 0) AS donation_amount FROM batch GROUP BY donor_name, month",
+        params,
+    )
+
+
+def find_donors(data_dir, version, keyword, limit=50):
+    frame = read_sql(
+        data_dir, "donations", version,
+        "SELECT donor_name, SUM(donation_amount) AS donation_amount,"
+        " MIN(date) AS first_date, MAX(date) AS last_date FROM {table}"
+        " WHERE {bound} AND instr(donor_name_lower, ?) > 0"
+        " GROUP BY donor_name ORDER BY donation_amount DESC, donor_name LIMIT ?",
+        (keyword.lower(), limit),
+    )
+    for column in ("first_date", "last_date"):
+        frame[column] = pd.to_datetime(frame[column])
+    return frame
+
+
+def _top_label(data_dir, version, column):
+    top = read_sql(
+        data_dir, "donations", version,
+        f"SELECT {column} FROM {{table}} WHERE {{bound}} AND {column} IS NOT NULL GROUP BY {column}"
+        f" ORDER BY SUM(donation_amount) DESC, {column} LIMIT 1",
+    )
+    return top.iloc[0, 0] if len(top) else "-"
+
+
+def donation_kpis(data_dir, version):
+    totals = read_sql(
+        data_dir, "donations", version,
+        "SELECT COALESCE(SUM(donation_amount), 0) AS total, COUNT(*) AS count FROM {table} WHERE {bound}",
+    ).iloc[0]
+    total, count = float(totals["total"]), int(totals["count"])
+    return {
+        "total_donations": total,
+        "donation_count": count,
+        "avg_donation": total / count if count else 0.0,
+        "top_region": _top_label(data_dir, version, "region"),
+        "top_project": _top_label(data_dir, version, "project"),
+    }
+
+
+def project_kpis(data_dir, version):
+    row = read_sql(
+        data_dir, "projects", version,
+        "SELECT COUNT(*) AS total_projects,"
+        " COALESCE(SUM(status = 'Ongoing'), 0) AS active_projects,"
+        " COALESCE(SUM(beneficiaries), 0) AS total_beneficiaries FROM {table} WHERE {bound}",
+    ).iloc[0]
+    return {column: int(value) for column, value in row.items()}
+
+
+def volunteer_kpis(data_dir, version):
+    row = read_sql(
+        data_dir, "volunteers", version,
+        "SELECT COUNT(DISTINCT volunteer_name) AS total_volunteers,"
+        " COALESCE(SUM(hours_contributed), 0) AS total_hours,"
+        " COALESCE(AVG(hours_contributed), 0.0) AS avg_hours FROM {table} WHERE {bound}",
+    )
+    return {
+        "total_volunteers": int(row["total_volunteers"].iloc[0]),
+        # Whole hours stay integers, fractional ones are kept
+        "total_hours": row["total_hours"].iloc[0].item(),
+        "avg_hours": float(row["avg_hours"].iloc[0]),
+    }
+
+
+def labels(data_dir, name, version, column):
+    frame = read_sql(
+        data_dir, name, version,
+        f"SELECT DISTINCT {column} FROM {{table}} WHERE {{bound}} AND {column} IS NOT NULL ORDER BY {column}",
+    )
+    return frame[column].tolist()
+
+
+def label_counts(data_dir, name, version, column):
+    # Like Series.value_counts, with ties broken alphabetically
+    frame = read_sql(
+        data_dir, name, version,
+        f"SELECT {column}, COUNT(*) AS count FROM {{table}} WHERE {{bound}} AND {column} IS NOT NULL"
+        f" GROUP BY {column} ORDER BY count DESC, {column}",
+    )
+    return _series(frame, column, "count")
+
+
+def label_totals(data_dir, name, version, column, value, top=None):
+    # Sum of `value` per label: alphabetical, or the `top` largest
+    order = f"{value} DESC, {column} LIMIT {int(top)}" if top else column
+    frame = read_sql(
+        data_dir, name, version,
+        f"SELECT {column}, SUM({value}) AS {value} FROM {{table}} WHERE {{bound}} AND {column} IS NOT NULL"
+        f" GROUP BY {column} ORDER BY {order}",
+    )
+    return _series(frame, column, value)
+
+
+def pair_totals(data_dir, name, version, project, value):
+    # Sum of `value` per (project, region), alphabetical
+    frame = read_sql(
+        data_dir, name, version,
+        f"SELECT {project} AS project, region, SUM({value}) AS {value} FROM {{table}}"
+        f" WHERE {{bound}} AND {project} IS NOT NULL AND region IS NOT NULL"
+        f" GROUP BY {project}, region ORDER BY {project}, region",
+    )
+    return _series(frame, ["project", "region"], value)
+
+
+# ----------------------------
+# FILTERED, PAGED TABLES
+# ----------------------------
+class SqlTable:
+    # Same interface as utils.query.FilterIndex, answered with indexed SQL:
+    # positions() returns the WHERE clause instead of row positions
+    def __init__(self, data_dir, name, version):
+        self.data_dir = data_dir
+        self.name = name
+        self.version = version
+        self.columns = [
+            row[1] for row in connect(data_dir).execute(f"PRAGMA table_info({table_name(name, version)})")
+            if not row[1].endswith("_lower")
+        ]
+
+    def __len__(self):
+        return self.version.rows
+
+    def positions(self, filters, search=None):
+        clauses, params = [], []
+        for column, label in filters.items():
+            if label in (None, "All"):
+                continue
+            clauses.append(f"{column} = ?")
+            params.append(label)
+        if search and search[1]:
+            column, keyword = search
+            clauses.append(f"instr({column}_lower, ?) > 0")
+            params.append(keyword.lower())
+        if not clauses:
+            return None
+        return " AND ".join(clauses), params
+
+    def _where(self, rows):
+        if rows is None:
+            return "{bound}", []
+        clauses, params = rows
+        return "{bound} AND " + clauses, params
+
+    def count(self, rows):
+        if rows is None:
+            return len(self)
+        where, params = self._where(rows)
+        frame = read_sql(self.data_dir, self.name, self.version, f"SELECT COUNT(*) FROM {{table}} WHERE {where}", params)
+        return int(frame.iloc[0, 0])
+
+    def page(self, rows, sort=None, offset=0, limit=None):
+        # Missing values last and ties in file order, as in FilterIndex
+        where, params = self._where(rows)
+        order = "rowid"
+        if sort is not None:
+            column, ascending = sort
+            order = f"{column} {'ASC' if ascending else 'DESC'} NULLS LAST, rowid"
+        frame = read_sql(
+            self.data_dir, self.name, self.version,
+            f"SELECT rowid - 1 AS row, {', '.join(self.columns)} FROM {{table}}"
+            f" WHERE {where} ORDER BY {order} LIMIT ? OFFSET ?",
+            (*params, -1 if limit is None else limit, offset),
+        )
+        return frame.set_index("row").rename_axis(None)
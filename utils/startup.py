@@ -0,0 +1,143 @@
+import importlib
+import os
+import sys
+import threading
+import time
+
+# The app's entry script, next to the utils package
+HOME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "Home.py")
+
+# Imported up front by the launcher; every page needs them sooner or later
+WARM_IMPORTS = ("pandas", "pyarrow")
+
+# Only needed to draw figures: imported on a background thread while the data
+# is warmed, so they never hold up the server start
+BACKGROUND_IMPORTS = ("plotly.graph_objects", "plotly.express")
+
+# Seconds spent in each first import done through this module, and in each
+# warm-up step, in this process
+IMPORT_TIMES = {}
+STARTUP = []
+
+
+# ----------------------------
+# DEFERRED IMPORTS
+# ----------------------------
+# A module bound with lazy_import is imported on first attribute access, so a
+# page only pays for plotly.express when a section actually builds a figure
+# (a figure cache miss) rather than on every cold start.
+def _timed_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    start = time.perf_counter()
+    module = importlib.import_module(name)
+    IMPORT_TIMES.setdefault(name, time.perf_counter() - start)
+    return module
+
+
+class LazyModule:
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = _timed_import(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        state = "loaded" if self._module is not None else "not loaded"
+        return f"<lazy module {self._name!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+# ----------------------------
+# SERVER-START WARM-UP
+# ----------------------------
+# The launcher imports pandas and pyarrow (plotly on a background thread),
+# loads and aggregates all three datasets (through the refresher, or a fresh
+# precomputed snapshot), including the sketches behind the approximate views,
+# and then starts the Streamlit server in the same process: the first visitor
+# finds every data cache warm and only builds the figures it is shown.
+#   python -m utils.startup [Home.py] [streamlit options]
+def _step(name, run):
+    start = time.perf_counter()
+    result = run()
+    STARTUP.append((name, time.perf_counter() - start))
+    return result
+
+
+def _import_in_background(names):
+    def run():
+        for name in names:
+            _timed_import(name)
+
+    thread = threading.Thread(target=run, name="background-imports", daemon=True)
+    thread.start()
+    return thread
+
+
+def warm_up(data_dir=None):
+    _import_in_background(BACKGROUND_IMPORTS)
+    for name in WARM_IMPORTS:
+        _step(f"import {name}", lambda: _timed_import(name))
+
+    from utils import api, refresher
+    from utils.data_loader import DATA_DIR
+
+    data_dir = data_dir or DATA_DIR
+    # KPIs, rollups (with the cube), donor table, indexes, sketches and
+    # impact; without a running refresher (watching off) they are built here
+    if _step("load + aggregate", lambda: refresher.ensure_refresher(data_dir)) is None:
+        _step("aggregate", lambda: refresher.warm(data_dir))
+
+    # The JSON API, if DASHBOARD_API_PORT is set, answers from the same caches
+    _step("start api", lambda: api.ensure_api(data_dir))
+    return STARTUP
+
+
+def report():
+    # (step, seconds): the warm-up, then the background imports and those
+    # deferred until first use
+    later = [
+        (f"{'background' if name in BACKGROUND_IMPORTS else 'deferred'} import {name}", s)
+        for name, s in IMPORT_TIMES.items()
+        if name not in WARM_IMPORTS
+    ]
+    return STARTUP + later
+
+
+def format_report(steps):
+    width = max((len(name) for name, _ in steps), default=0)
+    lines = [f"  {name:<{width}}  {seconds * 1000:8.1f} ms" for name, seconds in steps]
+    lines.append(f"  {'total':<{width}}  {sum(s for _, s in steps) * 1000:8.1f} ms")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    script, options = (argv[0], argv[1:]) if argv and not argv[0].startswith("-") else (HOME, argv)
+
+    warm_up()
+    print(f"Warm-up before serving {script}:\n{format_report(STARTUP)}", flush=True)
+
+    from utils import profiling
+
+    if profiling.LOG_PATH:
+        records = [
+            {"page": "(startup)", "section": name, "depth": 0, "seconds": seconds, "rows": None, "payload_bytes": 0}
+            for name, seconds in STARTUP
+        ]
+        with open(profiling.LOG_PATH, "a") as f:
+            f.write(profiling.to_jsonl(records))
+
+    from streamlit.web import cli
+
+    cli.main(["run", script, *options], prog_name="streamlit")
+
+
+if __name__ == "__main__":
+    main()
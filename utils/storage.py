@@ -0,0 +1,200 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from pyarrow import csv
+
+SNAPSHOT_DIR = ".snapshots"
+
+# ----------------------------
+# TYPED SCHEMAS
+# ----------------------------
+# Columns not listed are left to pyarrow's type inference (amounts, hours,
+# beneficiaries come out as int64 or double depending on the file).
+SCHEMAS = {
+    "donations": {
+        "date": pa.timestamp("ns"),
+        "donor_name": pa.string(),
+        "project": pa.string(),
+        "region": pa.string(),
+    },
+    "projects": {
+        "project_name": pa.string(),
+        "status": pa.string(),
+        "region": pa.string(),
+    },
+    "volunteers": {
+        "volunteer_name": pa.string(),
+        "project": pa.string(),
+        "region": pa.string(),
+    },
+}
+
+# Columns stored dictionary-encoded (categoricals in pandas). Names repeat
+# across rows too, so they are encoded along with the low-cardinality keys.
+CATEGORICAL = {
+    "donations": ["donor_name", "project", "region"],
+    "projects": ["project_name", "status", "region"],
+    "volunteers": ["volunteer_name", "project", "region"],
+}
+
+
+# Fields read as missing, as pd.read_csv does by default
+NULL_VALUES = [
+    "", "#N/A", "#N/A N/A", "#NA", "-1.#IND", "-1.#QNAN", "-NaN", "-nan", "1.#IND", "1.#QNAN",
+    "<NA>", "N/A", "NA", "NULL", "NaN", "None", "n/a", "nan", "null",
+]
+
+# Bumped whenever parsing changes, so snapshots written before are re-parsed
+SNAPSHOT_FORMAT = 2
+
+
+def convert_options(name):
+    return csv.ConvertOptions(
+        column_types=SCHEMAS[name], null_values=NULL_VALUES, strings_can_be_null=True
+    )
+
+
+def snapshot_path(name, source_path):
+    directory = os.path.join(os.path.dirname(source_path), SNAPSHOT_DIR)
+    return os.path.join(directory, f"{name}.arrow")
+
+
+def complete_size(path, size):
+    # Bytes of the first `size` up to and including the last newline: a
+    # writer may still be mid-line, and a line is only read once it ends
+    with open(path, "rb") as f:
+        end = size
+        while end > 0:
+            start = max(end - (1 << 16), 0)
+            f.seek(start)
+            newline = f.read(end - start).rfind(b"\n")
+            if newline >= 0:
+                return start + newline + 1
+            end = start
+    return 0
+
+
+def read_csv_table(name, source, size=None, column_names=None):
+    if size is not None:
+        # Parse exactly the bytes the caller stat'ed, even if a writer is
+        # appending to the file while we read it
+        source = pa.BufferReader(pa.memory_map(source, "r").read_buffer(size))
+    table = csv.read_csv(
+        source,
+        read_options=csv.ReadOptions(column_names=column_names),
+        convert_options=convert_options(name),
+    )
+    return encode_categorical(name, table)
+
+
+def encode_categorical(name, table):
+    for column in CATEGORICAL[name]:
+        index = table.schema.get_field_index(column)
+        table = table.set_column(index, column, _sorted_dictionary(table[column]))
+    return table
+
+
+def _sorted_dictionary(values):
+    # Sorted categories keep groupby/value_counts output in the same
+    # alphabetical order the pages showed with plain string columns
+    values = values.combine_chunks()
+    if pa.types.is_dictionary(values.type):
+        # Chunks encoded separately (utils/ingest): combine_chunks unified
+        # their dictionaries; sort the union and remap the indices
+        categories = values.dictionary.drop_null().sort()
+        remap = pc.index_in(values.dictionary, value_set=categories).cast(pa.int32())
+        return pa.DictionaryArray.from_arrays(pc.take(remap, values.indices), categories)
+    # Missing values stay null indices, as NaN is never a pandas category
+    categories = pc.unique(values).drop_null().sort()
+    indices = pc.index_in(values, value_set=categories).cast(pa.int32())
+    return pa.DictionaryArray.from_arrays(indices, categories)
+
+
+def write_snapshot(table, path, source_key):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    metadata = {
+        b"source_key": json.dumps(list(source_key)).encode(),
+        b"format": str(SNAPSHOT_FORMAT).encode(),
+    }
+    table = table.replace_schema_metadata(metadata)
+
+    # Uncompressed Arrow IPC so readers can memory-map it; written to a temp
+    # file and swapped in so concurrent readers never see a partial snapshot.
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot(path, source_key):
+    if not os.path.exists(path):
+        return None
+    try:
+        reader = pa.ipc.open_file(pa.memory_map(path, "r"))
+    except (OSError, pa.ArrowInvalid):
+        return None
+
+    metadata = reader.schema.metadata or {}
+    if json.loads(metadata.get(b"source_key", b"null")) != list(source_key):
+        return None
+    if metadata.get(b"format") != str(SNAPSHOT_FORMAT).encode():
+        return None
+    return reader.read_all()
+
+
+def load_table(name, source_path, source_key):
+    path = snapshot_path(name, source_path)
+    table = read_snapshot(path, source_key)
+    if table is None:
+        from utils import ingest
+        table = ingest.read_csv_table(name, source_path, source_key)
+        try:
+            write_snapshot(table, path, source_key)
+        except OSError:
+            # Read-only data directory: serve the parsed table without a snapshot
+            pass
+    return table
+
+
+def load_frame(name, source_path, source_key):
+    return load_table(name, source_path, source_key).to_pandas(split_blocks=True)
+
+
+# ----------------------------
+# APPENDED ROWS
+# ----------------------------
+def read_csv_tail(name, data, column_names):
+    # `data` is a run of complete CSV lines without the header row
+    table = read_csv_table(name, pa.BufferReader(data), column_names=column_names)
+    return table.to_pandas(split_blocks=True)
+
+
+def concat_frames(old, new):
+    columns = {}
+    for column in old.columns:
+        a, b = old[column], new[column]
+        if _extends_categories(a, b):
+            # Same dictionary, grown at the end: the codes can be stacked as-is
+            codes = np.concatenate([a.cat.codes.to_numpy(), b.cat.codes.to_numpy()])
+            columns[column] = pd.Categorical.from_codes(
+                codes, categories=b.cat.categories, validate=False
+            )
+        elif isinstance(a.dtype, pd.CategoricalDtype):
+            columns[column] = pd.api.types.union_categoricals(
+                [a, b.astype("category")], sort_categories=True
+            )
+        else:
+            columns[column] = pd.concat([old[column], new[column]], ignore_index=True)
+    return pd.DataFrame(columns)
+
+
+def _extends_categories(a, b):
+    if not (isinstance(a.dtype, pd.CategoricalDtype) and isinstance(b.dtype, pd.CategoricalDtype)):
+        return False
+    old, new = a.cat.categories, b.cat.categories
+    return len(new) >= len(old) and new[:len(old)].equals(old)
@@ -0,0 +1,44 @@
+import math
+
+import streamlit as st
+
+from utils import profiling
+
+PAGE_SIZES = [25, 50, 100, 250]
+
+
+# ----------------------------
+# SERVER-SIDE PAGINATED TABLE
+# ----------------------------
+# Filtering, sorting and slicing happen on the shared FilterIndex; only the
+# visible page of rows is sent to the browser.
+def paginated_table(index, filters, search=None, sort=None, key="table", height=500):
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+
+    # Match first so the page picker can be bounded before it is drawn
+    matches = index.positions(filters, search)
+    total = index.count(matches)
+    pages = max(math.ceil(total / page_size), 1)
+
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > pages:
+        st.session_state[page_key] = pages
+
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=page_key)
+
+    offset = (page - 1) * page_size
+    rows = index.page(matches, sort, offset, page_size)
+
+    with info_col:
+        first = offset + 1 if total else 0
+        st.caption(f"Rows {first:,}–{offset + len(rows):,} of {total:,} · page {page} of {pages}")
+
+    profiling.add_rows(total)
+    if profiling.active():
+        profiling.add_payload(profiling.frame_bytes(rows))
+    st.dataframe(rows, use_container_width=True, height=height)
+    return total